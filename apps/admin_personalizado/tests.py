@@ -1,3 +1,121 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from apps.agenda.models import Event
+from apps.core.perfilamento import get_buffer
+
+User = get_user_model()
+
+
+@override_settings(PERFILAMENTO_ATIVO=True, PERFILAMENTO_SERVER_TIMING=True)
+class PerfilamentoTest(TestCase):
+    """Testa o PerfilamentoMiddleware e o relatório do painel."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='admin@teste.com', password='senha12345', nome='Admin')
+        cls.user = User.objects.create_user(email='participante@teste.com', password='senha12345', nome='Participante')
+
+    def setUp(self):
+        get_buffer().limpar()
+
+    def test_registra_consultas_e_cabecalho_server_timing(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('home'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+        medicao = get_buffer().medicoes()[-1]
+        self.assertEqual(medicao.view, 'home')
+        self.assertEqual(medicao.status, 200)
+        self.assertGreater(medicao.consultas, 0)
+        self.assertGreater(medicao.tempo_template, 0)
+
+    def test_server_timing_restrito_a_equipe(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('home'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(len(get_buffer().medicoes()), 1)
+
+        self.client.logout()
+        response = self.client.get(reverse('usuarios:login'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_relatorio_json_agrupa_por_view(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse('home'))
+        self.client.get(reverse('home'))
+
+        response = self.client.get(reverse('admin_personalizado:perfilamento'), {'formato': 'json'})
+
+        views = {item['view']: item for item in response.json()['views']}
+        self.assertEqual(views['home']['requisicoes'], 2)
+
+        response = self.client.get(reverse('admin_personalizado:perfilamento'))
+        self.assertContains(response, 'home')
+
+    def test_relatorio_restrito_a_equipe(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin_personalizado:perfilamento'))
+        self.assertRedirects(response, reverse('admin_personalizado:acesso_negado'), fetch_redirect_response=False)
+
+    @override_settings(PERFILAMENTO_ATIVO=False)
+    def test_desativado_por_padrao(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('home'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(get_buffer().medicoes(), [])
+
+
+class ImportarEventosAPITest(TestCase):
+    """Testa o endpoint de importação em massa de eventos."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@teste.com', password='senha12345', nome='Admin')
+        self.url = reverse('admin_personalizado:evento_importar')
+
+    def test_importa_arquivo_enviado(self):
+        self.client.force_login(self.admin)
+        arquivo = SimpleUploadedFile('programacao.csv', (
+            'titulo,local,start_time,end_time\n'
+            'Abertura,Hangar,2030-11-10T09:00:00-03:00,2030-11-10T10:00:00-03:00\n'
+            'Sem horário,Hangar,,\n'
+        ).encode())
+        response = self.client.post(self.url, {'arquivo': arquivo})
+
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        self.assertEqual((dados['criados'], dados['total_erros']), (1, 1))
+        self.assertEqual(dados['erros'][0]['linha'], 3)
+        self.assertEqual(Event.objects.get().created_by, self.admin)
+
+    def test_formato_invalido(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(self.url, {'arquivo': SimpleUploadedFile('programacao.xlsx', b'x')})
+        self.assertEqual(response.status_code, 400)
+
+
+class EnviarNotificacaoTest(TestCase):
+    """Testa o envio de notificações como difusão."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@teste.com', password='senha12345', nome='Admin')
+        User.objects.create_user(email='participante@teste.com', password='senha12345', nome='Participante')
+
+    def test_envio_grava_uma_notificacao(self):
+        from apps.notificacoes.models import Notificacao, NotificacaoUsuario
+
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            reverse('admin_personalizado:enviar_notificacao_ajax'),
+            {'mensagem': 'Portões abertos', 'audiencia': 'todos'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+
+        self.assertEqual(response.json()['total_usuarios'], 2)
+        self.assertEqual(Notificacao.objects.get().audiencia, 'todos')
+        self.assertFalse(NotificacaoUsuario.objects.exists())
@@ -41,6 +41,7 @@ urlpatterns = [
     path('eventos/<int:evento_id>/editar/', views.editar_evento, name='evento_editar'),
     path('eventos/<int:evento_id>/excluir/', views.excluir_evento, name='evento_excluir'),
     path('api/eventos/', views.api_eventos, name='evento_listar'),
+    path('api/eventos/importar/', views.api_importar_eventos, name='evento_importar'),
     path('api/eventos/<int:evento_id>/', views.api_evento_detalhe, name='evento_detalhe'),
 
     # URLs para Avisos
@@ -48,6 +49,9 @@ urlpatterns = [
     path('avisos/<int:aviso_id>/excluir/', views.excluir_aviso, name='excluir_aviso'),
     path('avisos/<int:aviso_id>/fixar/', views.fixar_aviso, name='fixar_aviso'),
     path('api/avisos/', views.avisos_api, name='avisos_api'),
+
+    # Perfilamento das requisições (PerfilamentoMiddleware)
+    path('perfilamento/', views.perfilamento, name='perfilamento'),
     
     # Rota para ativar/desativar usuários
     path('api/usuarios/<int:user_id>/toggle-status/', 
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -6,13 +7,18 @@ from django.utils import timezone
 from django.db.models import Count, Q, OuterRef, Subquery, Prefetch
 from django.http import JsonResponse, Http404, HttpResponse
 from django.views.decorators.http import require_http_methods, require_POST
-from django.db import transaction
 from django.core.serializers.json import DjangoJSONEncoder
 from datetime import timedelta, datetime, date
 import json
 from apps.notificacoes.models import Aviso
+from apps.notificacoes.tempo_real import publicar_notificacao
 from apps.passefacil.models import PasseFacil, ValidacaoQRCode
+from apps.passefacil import contadores as contadores_validacao
+from apps.core.perfilamento import get_buffer as get_buffer_perfilamento
+from apps.core.paginacao import CursorInvalido, contagem_aproximada, paginar, tamanho_pagina
 from apps.agenda.models import Event
+from apps.agenda.busca import buscar as buscar_eventos
+from apps.agenda.importacao import ErroImportacao, detectar_formato, importar as importar_eventos
 from apps.notificacoes.models import Notificacao
 from .models import NotificacaoPersonalizada
 from .decorators import gerente_required, superuser_required, eventos_required, staff_required
@@ -246,21 +252,9 @@ def passefacil_admin(request):
         .order_by('user__first_name', 'user__last_name')
     )
     
-    # Estatísticas
-    agora = timezone.now()
-    hoje = agora.date()
-    inicio_dia = timezone.make_aware(timezone.datetime.combine(hoje, timezone.datetime.min.time()))
-    
-    total_validacoes = ValidacaoQRCode.objects.filter(
-        data_validacao__gte=inicio_dia
-    ).count()
-    
-    validas = ValidacaoQRCode.objects.filter(
-        valido=True,
-        data_validacao__gte=inicio_dia
-    ).count()
-    
-    invalidas = total_validacoes - validas
+    # Estatísticas do dia, lidas dos contadores incrementais
+    hoje = timezone.localdate()
+    resumo = contadores_validacao.resumo_dia(hoje)
     
     # Total de usuários com Passe Fácil ativo
     total_usuarios = PasseFacil.objects.filter(ativo=True).count()
@@ -269,9 +263,8 @@ def passefacil_admin(request):
     period = request.GET.get('period', '7d')
     if period == 'all':
         # Desde sempre: do primeiro registro até hoje (cap em 60 dias para não estourar o gráfico)
-        first = ValidacaoQRCode.objects.order_by('data_validacao').values_list('data_validacao', flat=True).first()
-        if first:
-            first_date = timezone.localdate(first)
+        first_date = contadores_validacao.primeiro_dia()
+        if first_date:
             days_count = (hoje - first_date).days + 1
             days_count = max(1, min(days_count, 60))  # limite de 60 dias
         else:
@@ -284,40 +277,15 @@ def passefacil_admin(request):
         days_count = 7
         period_label = 'Últimos 7 dias'
 
-    # Janela de dias para agregação
+    # Janela de dias para agregação (no máximo 24 linhas de contador por dia)
     data_inicio = hoje - timedelta(days=days_count - 1)
-    validacoes_por_dia = ValidacaoQRCode.objects.filter(
-        data_validacao__date__gte=data_inicio,
-        data_validacao__date__lte=hoje
-    ).values('data_validacao__date').annotate(
-        total=Count('id'),
-        validas=Count('id', filter=Q(valido=True)),
-        invalidas=Count('id', filter=Q(valido=False))
-    ).order_by('data_validacao__date')
+    validacoes_por_dia = contadores_validacao.por_dia(data_inicio, hoje)
     
     # Prepara os dados para o gráfico
-    dias = []
-    totais = []
-    validas_list = []
-    invalidas_list = []
-    
-    for i in range(days_count):
-        data = data_inicio + timedelta(days=i)
-        dia_formatado = data.strftime('%d/%m')
-        dias.append(dia_formatado)
-        
-        # Encontra os dados para este dia
-        dados_dia = next((d for d in validacoes_por_dia 
-                         if d['data_validacao__date'] == data), None)
-        
-        if dados_dia:
-            totais.append(dados_dia['total'])
-            validas_list.append(dados_dia['validas'])
-            invalidas_list.append(dados_dia['invalidas'])
-        else:
-            totais.append(0)
-            validas_list.append(0)
-            invalidas_list.append(0)
+    dias = [d['data'].strftime('%d/%m') for d in validacoes_por_dia]
+    totais = [d['total'] for d in validacoes_por_dia]
+    validas_list = [d['validas'] for d in validacoes_por_dia]
+    invalidas_list = [d['invalidas'] for d in validacoes_por_dia]
     
     from django.core.serializers.json import DjangoJSONEncoder
     import json
@@ -328,9 +296,9 @@ def passefacil_admin(request):
         'active_menu': 'passefacil_admin',
         'validacoes_recentes': validacoes_recentes,
         'passes': passes,
-        'total_validacoes': total_validacoes,
-        'validas': validas,
-        'invalidas': invalidas,
+        'total_validacoes': resumo['total'],
+        'validas': resumo['validas'],
+        'invalidas': resumo['invalidas'],
         'total_usuarios': total_usuarios,
         'dias': json.dumps(dias, cls=DjangoJSONEncoder),
         'totais': json.dumps(totais, cls=DjangoJSONEncoder),
@@ -342,6 +310,13 @@ def passefacil_admin(request):
     
     return render(request, 'admin_personalizado/passefacil/passefacilADM.html', context)
 
+def _audiencia_difusao(valor):
+    """Público de difusão informado no formulário (padrão: todos os usuários)."""
+    from apps.notificacoes.models import AUDIENCIA_TODOS, Notificacao
+    
+    validas = {chave for chave, _ in Notificacao.AUDIENCIA_CHOICES[1:]}
+    return valor if valor in validas else AUDIENCIA_TODOS
+
 @gerente_required
 @require_http_methods(["GET", "POST"])
 def enviar_notificacao(request):
@@ -384,21 +359,19 @@ def enviar_notificacao(request):
                 # Obter o tipo da notificação do formulário
                 tipo = request.POST.get('tipo', 'info')
                 
-                # Obter todos os usuários ativos
-                usuarios = User.objects.filter(is_active=True)
-                
-                # Criar uma única notificação
+                # Criar uma única notificação de difusão (todos ou um papel): os
+                # destinatários não são gravados, a leitura é registrada ao ler
                 notificacao = Notificacao.objects.create(
                     titulo=titulo,
                     mensagem=mensagem,
                     tipo=tipo,
+                    audiencia=_audiencia_difusao(request.POST.get('audiencia')),
                     criado_por=request.user
                 )
                 
-                # Adicionar todos os usuários ativos à notificação
-                notificacao.adicionar_usuarios(usuarios)
+                publicar_notificacao(notificacao)
                 
-                messages.success(request, f'Notificação criada com sucesso para {usuarios.count()} usuários ativos!')
+                messages.success(request, f'Notificação criada com sucesso para {notificacao.publico().count()} usuários ativos!')
                 return redirect('admin_personalizado:enviar_notificacao')
                 
             except Exception as e:
@@ -425,6 +398,7 @@ def enviar_notificacao(request):
         'show_save_and_continue': False,
         'show_close': True,
         'total_usuarios': User.objects.filter(is_active=True).count(),
+        'audiencias': Notificacao.AUDIENCIA_CHOICES[1:],
     }
     
     return render(
@@ -457,25 +431,19 @@ def enviar_notificacao_ajax(request):
         )
     
     try:
-        User = get_user_model()
-        usuarios = User.objects.filter(is_active=True)
-        total_usuarios = usuarios.count()
-        
         # Obtém o tipo da notificação do formulário
         tipo = request.POST.get('tipo', 'info')
         
-        # Usa transação atômica para garantir que todas as notificações sejam criadas
-        with transaction.atomic():
-            # Cria uma única notificação
-            notificacao = Notificacao.objects.create(
-                titulo='Nova notificação',
-                mensagem=mensagem,
-                tipo=tipo,
-                criado_por=request.user
-            )
-            
-            # Adiciona todos os usuários ativos à notificação
-            notificacao.adicionar_usuarios(usuarios)
+        # Cria uma única notificação de difusão, sem uma linha por usuário
+        notificacao = Notificacao.objects.create(
+            titulo='Nova notificação',
+            mensagem=mensagem,
+            tipo=tipo,
+            audiencia=_audiencia_difusao(request.POST.get('audiencia')),
+            criado_por=request.user
+        )
+        publicar_notificacao(notificacao)
+        total_usuarios = notificacao.publico().count()
         
         return JsonResponse({
             'status': 'success',
@@ -744,10 +712,11 @@ def excluir_evento(request, evento_id):
 def api_eventos(request):
     """
     API para listar (GET) e criar (POST) eventos.
+    GET: ``?cursor=`` (de ``next_cursor``/``previous_cursor``), ``per_page``
+    (até ``PAGINACAO_TAMANHO_MAXIMO``) e ``contar=1`` para o total aproximado.
     """
     from apps.agenda.serializers import EventSerializer
     from django.core.exceptions import ValidationError
-    from django.core.paginator import Paginator, EmptyPage
     
     if request.method == 'GET':
         try:
@@ -757,12 +726,7 @@ def api_eventos(request):
             # Aplicar filtros
             search = request.GET.get('search')
             if search:
-                eventos = eventos.filter(
-                    Q(titulo__icontains=search) |
-                    Q(descricao__icontains=search) |
-                    Q(local__icontains=search) |
-                    Q(palestrante__icontains=search)
-                )
+                eventos = buscar_eventos(eventos, search)
             
             start_date = request.GET.get('start_date')
             if start_date:
@@ -784,30 +748,29 @@ def api_eventos(request):
             if importante and importante.lower() == 'true':
                 eventos = eventos.filter(importante=True)
             
-            # Paginação
-            page = int(request.GET.get('page', 1))
-            per_page = int(request.GET.get('per_page', 10))
-            paginator = Paginator(eventos, per_page)
-            
+            # Paginação por cursor (keyset em start_time, id), com tamanho limitado
+            ordem = ['start_time', 'id']
+            if search:
+                ordem = ['relevancia_busca'] + ordem
+            per_page = tamanho_pagina(request.GET.get('per_page'), 10)
             try:
-                page_obj = paginator.get_page(page)
-            except EmptyPage:
-                return JsonResponse({
-                    'count': paginator.count,
-                    'num_pages': paginator.num_pages,
-                    'current_page': page,
-                    'results': []
-                }, safe=False)
+                pagina = paginar(eventos, ordem, request.GET.get('cursor'), per_page)
+            except CursorInvalido:
+                return JsonResponse({'error': 'Cursor inválido'}, status=400)
             
             # Usar o serializador para formatar os dados
-            serializer = EventSerializer(page_obj, many=True)
+            serializer = EventSerializer(pagina.itens, many=True)
             
-            return JsonResponse({
-                'count': paginator.count,
-                'num_pages': paginator.num_pages,
-                'current_page': page,
+            resposta = {
+                'per_page': per_page,
+                'next_cursor': pagina.proximo,
+                'previous_cursor': pagina.anterior,
                 'results': serializer.data
-            }, safe=False)
+            }
+            # Total opcional, aproximado (guardado em cache por alguns segundos)
+            if request.GET.get('contar') in ('1', 'true'):
+                resposta['count'] = contagem_aproximada(eventos)
+            return JsonResponse(resposta, safe=False)
         
         except Exception as e:
             print("Erro ao buscar eventos:", str(e))
@@ -930,6 +893,26 @@ def api_evento_detalhe(request, evento_id):
     return JsonResponse({'error': 'Método não permitido', 'allowed_methods': ['GET', 'PUT', 'DELETE']}, status=405)
 
 
+@staff_required
+@eventos_required
+@require_POST
+def api_importar_eventos(request):
+    """
+    Importação em massa de eventos (``apps/agenda/importacao.py``).
+    POST multipart com ``arquivo`` (.csv, .json ou .jsonl) e ``formato`` opcional.
+    Responde com a quantidade de eventos criados/atualizados e os erros por linha.
+    """
+    arquivo = request.FILES.get('arquivo')
+    if not arquivo:
+        return JsonResponse({'error': 'Envie o arquivo no campo "arquivo".'}, status=400)
+    try:
+        formato = request.POST.get('formato') or detectar_formato(arquivo.name)
+        resultado = importar_eventos(arquivo.file, formato, usuario=request.user)
+    except ErroImportacao as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(resultado.como_dict())
+
+
 @staff_required
 def avisos_admin(request):
     """
@@ -990,6 +973,39 @@ def avisos_admin(request):
     return render(request, 'admin_personalizado/avisos/gerenciar_avisos.html', context)
 
 
+@staff_required
+def perfilamento(request):
+    """
+    Relatório do perfilamento por requisição (``PerfilamentoMiddleware``).
+    Resume por view as requisições mais recentes deste processo.
+    GET ?formato=json: retorna o relatório em JSON
+    POST: limpa as medições
+    """
+    buffer = get_buffer_perfilamento()
+    if request.method == 'POST':
+        buffer.limpar()
+        messages.success(request, 'Medições descartadas.')
+        return redirect('admin_personalizado:perfilamento')
+
+    ativo = getattr(settings, 'PERFILAMENTO_ATIVO', False)
+    resumo = buffer.resumo_por_view()
+    recentes = buffer.recentes()
+
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({
+            'ativo': ativo,
+            'views': resumo,
+            'recentes': recentes,
+        }, encoder=DjangoJSONEncoder)
+
+    context = {
+        'ativo': ativo,
+        'resumo': resumo,
+        'recentes': recentes,
+    }
+    return render(request, 'admin_personalizado/perfilamento/relatorio.html', context)
+
+
 @require_http_methods(["POST", "DELETE"])
 @login_required
 @staff_required
@@ -4,11 +4,11 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import get_user_model
 from apps.usuarios.models import Usuario
-from django.db.models import Q
+from django.db.models import Count, Q
 from django.http import JsonResponse, HttpResponseForbidden
 from django.views.decorators.http import require_POST, require_http_methods
 from django.contrib.auth.models import Group
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from apps.core.paginacao import CursorInvalido, paginar
 from django.db import transaction
 from django.utils import timezone
 from django.contrib.contenttypes.models import ContentType
@@ -212,28 +212,30 @@ def listar_usuarios(request):
             Q(email__icontains=search_term)
         )
     
-    # Paginação
-    page = request.GET.get('page', 1)
-    paginator = Paginator(usuarios, 10)  # 10 usuários por página
-    
+    # Paginação por cursor (keyset no id): páginas profundas custam o mesmo
     try:
-        usuarios_paginados = paginator.page(page)
-    except PageNotAnInteger:
-        usuarios_paginados = paginator.page(1)
-    except EmptyPage:
-        usuarios_paginados = paginator.page(paginator.num_pages)
+        usuarios_paginados = paginar(usuarios, ['id'], request.GET.get('cursor'), 10)
+    except CursorInvalido:
+        usuarios_paginados = paginar(usuarios, ['id'], None, 10)
+    
+    # Totais dos cards de estatística em uma única consulta
+    totais = usuarios.aggregate(
+        total=Count('id'),
+        ativos=Count('id', filter=Q(is_active=True)),
+        inativos=Count('id', filter=Q(is_active=False)),
+        admins=Count('id', filter=Q(is_superuser=True)),
+    )
     
     context = {
         'object_list': usuarios_paginados,
         'page_obj': usuarios_paginados,
-        'is_paginated': usuarios_paginados.has_other_pages(),
-        'paginator': paginator,
+        'is_paginated': usuarios_paginados.has_next or usuarios_paginados.has_previous,
         'agora': timezone.now(),
         # Adicionando as variáveis usadas nos cards de estatística
-        'total_usuarios': usuarios.count(),
-        'ativos_count': usuarios.filter(is_active=True).count(),
-        'inativos_count': usuarios.filter(is_active=False).count(),
-        'admins_count': usuarios.filter(is_superuser=True).count(),
+        'total_usuarios': totais['total'],
+        'ativos_count': totais['ativos'],
+        'inativos_count': totais['inativos'],
+        'admins_count': totais['admins'],
     }
     
     return render(request, 'admin_personalizado/usuarios/usuario_list.html', context)
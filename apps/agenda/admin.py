@@ -1,10 +1,10 @@
 from django.contrib import admin
-from .models import Event
+from .models import Event, Tag
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
     list_display = ('titulo', 'start_time', 'end_time', 'local', 'palestrante', 'importante')
-    list_filter = ('importante', 'tags', 'start_time')
+    list_filter = ('importante', 'temas', 'start_time')
     search_fields = ('titulo', 'descricao', 'local', 'palestrante')
     date_hierarchy = 'start_time'
     ordering = ('-start_time',)
@@ -18,4 +18,10 @@ class EventAdmin(admin.ModelAdmin):
         ('Palestrante', {
             'fields': ('palestrante',)
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'slug')
+    search_fields = ('nome', 'slug')
@@ -0,0 +1,159 @@
+# apps/agenda/busca.py
+"""
+Busca textual de eventos.
+
+No SQLite os eventos são indexados na tabela virtual FTS5 ``agenda_event_busca``
+(criada pela migração ``0011_event_busca``), com o tokenizador ``unicode61``
+sem acentos: "sustentavel" encontra "Sustentável". Cada palavra digitada é
+buscada por prefixo ("clim" encontra "clima" e "climática") e todas precisam
+aparecer em algum dos campos. Os resultados vêm ordenados por relevância
+(``bm25``), com pesos maiores para título e palestrante.
+
+Em outros bancos, ou se o SQLite não tiver FTS5, a busca cai para
+``icontains`` por palavra, sem ranking nem normalização de acentos.
+
+O índice é mantido pelos sinais de ``Event`` (``signals.py``); cargas que não
+disparam sinais (``bulk_create``, ``update``) devem chamar ``indexar_lote`` ou
+``reindexar``.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Case, F, FloatField, Func, IntegerField, Q, When
+from django.db.models.expressions import RawSQL
+
+TABELA = 'agenda_event_busca'
+CAMPOS = ('titulo', 'descricao', 'palestrante', 'local')
+# Pesos do bm25 na ordem de CAMPOS
+PESOS = (10.0, 1.0, 5.0, 3.0)
+
+_PALAVRA = re.compile(r'\w+', re.UNICODE)
+
+_disponivel = None
+
+
+def fts_disponivel():
+    """True se a tabela FTS5 existe no banco atual."""
+    global _disponivel
+    if not _disponivel:
+        # Só o resultado positivo fica em memória: a tabela pode ser criada
+        # pelo migrate depois da primeira verificação
+        _disponivel = (
+            connection.vendor == 'sqlite'
+            and TABELA in connection.introspection.table_names()
+        )
+    return _disponivel
+
+
+def palavras(termo):
+    return _PALAVRA.findall(termo or '')
+
+
+def consulta_fts(termo):
+    """Converte o texto digitado em uma consulta FTS5 (prefixo, todas as palavras)."""
+    return ' '.join(f'"{palavra}"*' for palavra in palavras(termo))
+
+
+def buscar(queryset, termo):
+    """
+    Filtra ``queryset`` (de ``Event``) pelo texto ``termo`` e ordena por
+    relevância, desempatando pelo horário de início. Sem palavras no termo,
+    retorna o queryset inalterado.
+    """
+    if not palavras(termo):
+        return queryset
+
+    if not fts_disponivel():
+        return _buscar_icontains(queryset, termo)
+
+    consulta = consulta_fts(termo)
+    return queryset.filter(
+        id__in=RawSQL(f'SELECT rowid FROM {TABELA} WHERE {TABELA} MATCH %s', [consulta])
+    ).annotate(
+        relevancia_busca=Relevancia(consulta)
+    ).order_by('relevancia_busca', 'start_time', 'id')
+
+
+class Relevancia(Func):
+    """``bm25`` do evento para a consulta FTS5 (menor = mais relevante)."""
+    output_field = FloatField()
+
+    def __init__(self, consulta):
+        super().__init__(F('pk'))
+        self.consulta = consulta
+
+    def as_sql(self, compiler, connection, **extra_context):
+        coluna, params = compiler.compile(self.source_expressions[0])
+        pesos = ', '.join(str(peso) for peso in PESOS)
+        sql = (
+            f'(SELECT bm25({TABELA}, {pesos}) FROM {TABELA} '
+            f'WHERE {TABELA} MATCH %s AND {TABELA}.rowid = {coluna})'
+        )
+        return sql, [self.consulta, *params]
+
+
+def _buscar_icontains(queryset, termo):
+    for palavra in palavras(termo):
+        filtro = Q()
+        for campo in CAMPOS:
+            filtro |= Q(**{f'{campo}__icontains': palavra})
+        queryset = queryset.filter(filtro)
+
+    no_titulo = Q()
+    for palavra in palavras(termo):
+        no_titulo &= Q(titulo__icontains=palavra)
+    return queryset.annotate(
+        relevancia_busca=Case(When(no_titulo, then=0), default=1, output_field=IntegerField())
+    ).order_by('relevancia_busca', 'start_time', 'id')
+
+
+def indexar(evento):
+    """Insere ou atualiza o evento no índice."""
+    if not fts_disponivel():
+        return
+    colunas = ', '.join(CAMPOS)
+    marcadores = ', '.join(['%s'] * len(CAMPOS))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA} WHERE rowid = %s', [evento.pk])
+        cursor.execute(
+            f'INSERT INTO {TABELA} (rowid, {colunas}) VALUES (%s, {marcadores})',
+            [evento.pk] + [getattr(evento, campo) or '' for campo in CAMPOS],
+        )
+
+
+def indexar_lote(eventos):
+    """Como ``indexar``, para vários eventos de uma vez (importação em massa)."""
+    if not eventos or not fts_disponivel():
+        return
+    colunas = ', '.join(CAMPOS)
+    marcadores = ', '.join(['%s'] * len(CAMPOS))
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABELA} WHERE rowid = %s', [[evento.pk] for evento in eventos])
+        cursor.executemany(
+            f'INSERT INTO {TABELA} (rowid, {colunas}) VALUES (%s, {marcadores})',
+            [[evento.pk] + [getattr(evento, campo) or '' for campo in CAMPOS] for evento in eventos],
+        )
+
+
+def remover(evento_id):
+    if not fts_disponivel():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA} WHERE rowid = %s', [evento_id])
+
+
+def reindexar():
+    """Reconstrói o índice a partir da tabela de eventos. Retorna o total indexado."""
+    from .models import Event
+
+    if not fts_disponivel():
+        return 0
+    colunas = ', '.join(CAMPOS)
+    origem = ', '.join(f'COALESCE({campo}, \'\')' for campo in CAMPOS)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA}')
+        cursor.execute(
+            f'INSERT INTO {TABELA} (rowid, {colunas}) '
+            f'SELECT id, {origem} FROM {Event._meta.db_table}'
+        )
+    return Event.all_objects.count()
@@ -0,0 +1,74 @@
+# apps/agenda/cache_agenda.py
+"""
+Cache versionado da agenda oficial (``/agenda/``).
+
+A parte comum da página (eventos da página e seus cursores, total de eventos)
+é a mesma para todos os visitantes e fica no cache por (cursor, busca, tema). As
+chaves incluem uma versão global da agenda, incrementada pelos sinais de
+``Event`` após o commit; ao mudar a versão, todas as páginas antigas deixam de
+ser lidas e expiram sozinhas (``AGENDA_CACHE_TIMEOUT``).
+
+O que depende do usuário ("já está na minha agenda") é consultado depois,
+só para os ids da página.
+
+A versão fica no cache padrão: com vários workers use um backend
+compartilhado (Redis/Memcached) para que a invalidação valha para todos.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.core import paginacao
+
+CHAVE_VERSAO = 'agenda:versao'
+DEFAULT_TIMEOUT = 300
+
+
+def versao():
+    return cache.get_or_set(CHAVE_VERSAO, 1, timeout=None)
+
+
+def invalidar():
+    """Incrementa a versão da agenda (chamado após qualquer alteração de evento)."""
+    cache.add(CHAVE_VERSAO, 1, timeout=None)
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        cache.set(CHAVE_VERSAO, 1, timeout=None)
+
+
+def _chave(*partes):
+    digest = hashlib.sha1('\x1f'.join(str(p) for p in partes).encode()).hexdigest()
+    return f'agenda:oficial:{versao()}:{digest}'
+
+
+def pagina(queryset, ordem, cursor, tamanho, *filtros):
+    """
+    Retorna a ``PaginaCursor`` de ``queryset`` a partir de ``cursor``, lida do
+    cache quando possível. ``filtros`` (busca, tema...) entram na chave junto
+    com o cursor. Um cursor inválido leva à primeira página.
+    """
+    chave = _chave('pagina', cursor or '', tamanho, *filtros)
+    resultado = cache.get(chave)
+    if resultado is None:
+        try:
+            resultado = paginacao.paginar(queryset, ordem, cursor, tamanho)
+        except paginacao.CursorInvalido:
+            return pagina(queryset, ordem, None, tamanho, *filtros)
+        cache.set(chave, resultado, _timeout())
+    return resultado
+
+
+def total(queryset, *filtros):
+    """Quantidade de eventos para os filtros, calculada uma vez por versão da agenda."""
+    chave = _chave('total', *filtros)
+    resultado = cache.get(chave)
+    if resultado is None:
+        resultado = queryset.count()
+        cache.set(chave, resultado, _timeout())
+    return resultado
+
+
+def _timeout():
+    return getattr(settings, 'AGENDA_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
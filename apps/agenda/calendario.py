@@ -0,0 +1,125 @@
+# apps/agenda/calendario.py
+"""
+Exportação da agenda em iCalendar (RFC 5545).
+
+- ``/agenda/calendario.ics``: agenda oficial completa;
+- ``/agenda/calendario/<id>/<token>.ics``: agenda pessoal, assinável em
+  aplicativos de calendário sem login. O token é um HMAC do id e do hash da
+  senha do usuário: trocar a senha invalida os links antigos.
+
+O arquivo é gerado linha a linha (``StreamingHttpResponse`` sobre
+``iterator()``), sem montar a agenda inteira em memória. As respostas levam
+``ETag``/``Last-Modified`` calculados por uma única agregação (quantidade e
+última alteração), de modo que o calendário que consulta periodicamente
+recebe ``304`` sem que o arquivo seja gerado.
+"""
+import hashlib
+from datetime import timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .models import Event, UserAgenda
+
+SALT_TOKEN = 'apps.agenda.calendario'
+LINHA_MAXIMA = 75  # octetos por linha, sem o CRLF
+FORMATO_DATA = '%Y%m%dT%H%M%SZ'
+TAMANHO_LOTE = 500
+
+
+def token(usuario):
+    return salted_hmac(SALT_TOKEN, f'{usuario.pk}:{usuario.password}', algorithm='sha256').hexdigest()[:32]
+
+
+def token_valido(usuario, valor):
+    return constant_time_compare(token(usuario), valor or '')
+
+
+def eventos_do_usuario(usuario):
+    return Event.objects.filter(agenda_usuarios__user=usuario)
+
+
+def _versao(total, *datas):
+    datas = [data for data in datas if data]
+    ultima = max(datas) if datas else None
+    etag = hashlib.sha1(f'{total}:{ultima.isoformat() if ultima else ""}'.encode()).hexdigest()
+    return etag, ultima
+
+
+def versao(eventos):
+    """``(etag, ultima_alteracao)`` de um conjunto de eventos."""
+    dados = eventos.order_by().aggregate(total=Count('id'), alterado=Max('updated_at'))
+    return _versao(dados['total'], dados['alterado'])
+
+
+def versao_usuario(usuario):
+    """Como ``versao``, considerando também quando os eventos foram adicionados à agenda."""
+    dados = UserAgenda.objects.filter(user=usuario).aggregate(
+        total=Count('id'), alterado=Max('event__updated_at'), adicionado=Max('added_at')
+    )
+    return _versao(dados['total'], dados['alterado'], dados['adicionado'])
+
+
+def escapar(texto):
+    return (
+        (texto or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '')
+    )
+
+
+def dobrar(linha):
+    """Quebra a linha em partes de até 75 octetos (UTF-8), sem partir caracteres."""
+    partes, atual, tamanho = [], [], 0
+    for caractere in linha:
+        octetos = len(caractere.encode('utf-8'))
+        # As continuações começam com um espaço, que conta no limite
+        if tamanho + octetos > LINHA_MAXIMA:
+            partes.append(''.join(atual))
+            atual, tamanho = [' '], 1
+        atual.append(caractere)
+        tamanho += octetos
+    partes.append(''.join(atual))
+    return '\r\n'.join(partes) + '\r\n'
+
+
+def _data(valor):
+    return valor.astimezone(dt_timezone.utc).strftime(FORMATO_DATA)
+
+
+def linhas_evento(evento, dominio):
+    linhas = [
+        'BEGIN:VEVENT',
+        f'UID:evento-{evento.pk}@{dominio}',
+        f'DTSTAMP:{_data(evento.updated_at)}',
+        f'DTSTART:{_data(evento.start_time)}',
+        f'DTEND:{_data(evento.end_time)}',
+        f'SUMMARY:{escapar(evento.titulo)}',
+        f'LOCATION:{escapar(evento.local)}',
+    ]
+    descricao = evento.descricao or ''
+    if evento.palestrante:
+        descricao = f'Palestrante: {evento.palestrante}\n\n{descricao}'.strip()
+    if descricao:
+        linhas.append(f'DESCRIPTION:{escapar(descricao)}')
+    if evento.tags:
+        linhas.append(f'CATEGORIES:{",".join(escapar(t.strip()) for t in evento.tags.split(",") if t.strip())}')
+    if evento.latitude is not None and evento.longitude is not None:
+        linhas.append(f'GEO:{evento.latitude};{evento.longitude}')
+    linhas.append('END:VEVENT')
+    return linhas
+
+
+def gerar(eventos, nome, dominio):
+    """Gera o arquivo ``.ics`` em pedaços (um por evento)."""
+    yield ''.join(dobrar(linha) for linha in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:-//{dominio}//Agenda COP30//PT-BR',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escapar(nome)}',
+        'X-WR-TIMEZONE:America/Belem',
+    ])
+    for evento in eventos.order_by('start_time', 'id').iterator(chunk_size=TAMANHO_LOTE):
+        yield ''.join(dobrar(linha) for linha in linhas_evento(evento, dominio))
+    yield dobrar('END:VCALENDAR')
@@ -0,0 +1,128 @@
+# apps/agenda/conflitos.py
+"""
+Conflitos de horário na agenda pessoal.
+
+Os eventos da agenda de cada usuário ficam em um ``IntervalosAgenda``: a lista
+de intervalos ``(início, fim, id)`` ordenada pelo início, mais a maior duração
+entre eles. Um evento ``[a, b)`` só pode conflitar com intervalos que começam
+em ``(a - maior_duracao, b)``, encontrados por busca binária: a verificação
+custa O(log n + candidatos), sem percorrer a agenda inteira.
+
+A estrutura é montada com uma consulta e guardada no cache por usuário, com a
+versão da agenda na chave (alterar horários de eventos a invalida). Os
+sinais de ``UserAgenda`` (``signals.py``) inserem na estrutura em cache os
+eventos adicionados (busca binária com ``insort``, sem consultar o banco) e
+a descartam quando um evento sai da agenda. A inserção (ler, inserir,
+gravar) é feita sob uma trava ``cache.add`` por usuário; se outra inserção
+do mesmo usuário estiver em andamento, a estrutura é descartada e a próxima
+verificação a remonta, em vez de uma das inserções se perder.
+"""
+from bisect import bisect_left, bisect_right, insort
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import cache_agenda
+from .models import Event, UserAgenda, inicio_minimo_ativo
+
+DEFAULT_TIMEOUT = 3600
+TIMEOUT_TRAVA = 5  # segundos; libera a trava de uma inserção interrompida
+
+
+class IntervalosAgenda:
+    """Intervalos ``(início, fim, id)`` (timestamps) ordenados pelo início."""
+
+    def __init__(self, intervalos=()):
+        self.intervalos = sorted(intervalos)
+        self.maior_duracao = max((fim - inicio for inicio, fim, _ in self.intervalos), default=0)
+
+    def __len__(self):
+        return len(self.intervalos)
+
+    def conflitos(self, inicio, fim, ignorar=None):
+        """Ids dos intervalos que se sobrepõem a ``[inicio, fim)``, em ordem de início."""
+        primeiro = bisect_right(self.intervalos, (inicio - self.maior_duracao, float('inf')))
+        ultimo = bisect_left(self.intervalos, (fim,))
+        return [
+            evento_id for outro_inicio, outro_fim, evento_id in self.intervalos[primeiro:ultimo]
+            if outro_fim > inicio and evento_id != ignorar
+        ]
+
+    def inserir(self, inicio, fim, evento_id):
+        insort(self.intervalos, (inicio, fim, evento_id))
+        self.maior_duracao = max(self.maior_duracao, fim - inicio)
+
+    def pares(self):
+        """Todos os pares ``(id, id)`` que se sobrepõem, em O(n + pares)."""
+        resultado = []
+        intervalos = self.intervalos
+        n = len(intervalos)
+        for i in range(n):
+            _, fim, evento_id = intervalos[i]
+            for j in range(i + 1, n):
+                outro_inicio, _, outro_id = intervalos[j]
+                if outro_inicio >= fim:
+                    break
+                resultado.append((evento_id, outro_id))
+        return resultado
+
+
+def intervalo(evento):
+    return evento.start_time.timestamp(), evento.end_time.timestamp()
+
+
+def _chave(usuario_id):
+    return f'agenda:conflitos:{cache_agenda.versao()}:{usuario_id}'
+
+
+def _timeout():
+    return getattr(settings, 'AGENDA_CONFLITOS_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def intervalos_do_usuario(usuario_id):
+    """``IntervalosAgenda`` dos eventos ainda não encerrados da agenda do usuário."""
+    chave = _chave(usuario_id)
+    estrutura = cache.get(chave)
+    if estrutura is None:
+        linhas = UserAgenda.objects.filter(
+            user_id=usuario_id, event__start_time__gte=inicio_minimo_ativo()
+        ).values_list('event_id', 'event__start_time', 'event__end_time')
+        estrutura = IntervalosAgenda(
+            (inicio.timestamp(), fim.timestamp(), evento_id) for evento_id, inicio, fim in linhas
+        )
+        cache.set(chave, estrutura, _timeout())
+    return estrutura
+
+
+def verificar(usuario_id, evento):
+    """Eventos da agenda do usuário que conflitam com ``evento``."""
+    ids = intervalos_do_usuario(usuario_id).conflitos(*intervalo(evento), ignorar=evento.pk)
+    return list(Event.objects.filter(pk__in=ids).order_by('start_time', 'id')) if ids else []
+
+
+def registrar(usuario_id, evento):
+    """Acrescenta ``evento`` à estrutura em cache, se existir (novo ``UserAgenda``)."""
+    chave = _chave(usuario_id)
+    trava = f'{chave}:trava'
+    if not cache.add(trava, 1, TIMEOUT_TRAVA):
+        cache.delete(chave)
+        return
+    try:
+        estrutura = cache.get(chave)
+        if estrutura is not None:
+            estrutura.inserir(*intervalo(evento), evento.pk)
+            cache.set(chave, estrutura, _timeout())
+    finally:
+        cache.delete(trava)
+
+
+def invalidar(usuario_id):
+    cache.delete(_chave(usuario_id))
+
+
+def pares_do_usuario(usuario_id):
+    """Lista ``[(evento, evento), ...]`` dos pares conflitantes na agenda do usuário."""
+    pares = intervalos_do_usuario(usuario_id).pares()
+    ids = {evento_id for par in pares for evento_id in par}
+    eventos = Event.objects.in_bulk(ids) if ids else {}
+    return [(eventos[a], eventos[b]) for a, b in pares if a in eventos and b in eventos]
@@ -0,0 +1,217 @@
+# apps/agenda/importacao.py
+"""
+Importação em massa de eventos (programação completa da COP30).
+
+Formatos aceitos:
+
+- ``csv``: cabeçalho com os campos do ``EventSerializer`` (células vazias
+  contam como campo ausente);
+- ``jsonl``: um objeto JSON por linha;
+- ``json``: uma lista de objetos, lida objeto a objeto.
+
+O arquivo é lido em fluxo e processado em lotes de ``AGENDA_IMPORTACAO_LOTE``
+linhas. Cada linha é validada pelo ``EventSerializer`` (as mesmas regras da
+API); linhas inválidas entram no relatório com o número da linha e os erros,
+sem impedir as demais. As válidas são gravadas por chave natural
+(título, início, local): eventos existentes são atualizados com
+``bulk_update``, os novos criados com ``bulk_create``, cada lote em uma
+transação. Se a chave se repetir no arquivo, vale a última linha.
+
+Como as operações em massa não disparam os sinais de ``Event``, o índice de
+busca, os temas e o geohash do mapa são atualizados aqui, por lote, e a
+versão do cache da agenda é incrementada após cada lote gravado.
+"""
+import csv
+import io
+import json
+import os
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import busca, cache_agenda, mapa, tags
+from .models import Event
+from .serializers import EventSerializer
+
+FORMATOS = ('csv', 'json', 'jsonl')
+CAMPOS = ('titulo', 'descricao', 'local', 'palestrante', 'start_time', 'end_time',
+          'tags', 'importante', 'latitude', 'longitude')
+DEFAULT_LOTE = 500
+MAX_ERROS = 1000  # erros detalhados no relatório; os demais só são contados
+BLOCO_JSON = 64 * 1024
+
+
+class ErroImportacao(ValueError):
+    """Arquivo que não pode ser lido (formato desconhecido, JSON malformado...)."""
+
+
+@dataclass
+class ResultadoImportacao:
+    criados: int = 0
+    atualizados: int = 0
+    total_erros: int = 0
+    erros: list = field(default_factory=list)
+
+    def registrar_erro(self, linha, erros):
+        self.total_erros += 1
+        if len(self.erros) < MAX_ERROS:
+            self.erros.append({'linha': linha, 'erros': erros})
+
+    def como_dict(self):
+        return {
+            'criados': self.criados,
+            'atualizados': self.atualizados,
+            'total_erros': self.total_erros,
+            'erros': self.erros,
+        }
+
+
+def detectar_formato(nome):
+    """Formato pela extensão do arquivo (``.ndjson`` conta como ``jsonl``)."""
+    extensao = os.path.splitext(nome or '')[1].lower().lstrip('.')
+    extensao = 'jsonl' if extensao == 'ndjson' else extensao
+    if extensao not in FORMATOS:
+        raise ErroImportacao(f'Formato não suportado: {extensao or nome}. Use {", ".join(FORMATOS)}.')
+    return extensao
+
+
+def _linhas_csv(texto):
+    leitor = csv.DictReader(texto)
+    for registro in leitor:
+        # Células vazias são tratadas como ausentes (valor padrão / campo obrigatório)
+        yield leitor.line_num, {
+            (chave or '').strip(): valor for chave, valor in registro.items()
+            if chave and valor not in ('', None)
+        }
+
+
+def _linhas_jsonl(texto):
+    for numero, linha in enumerate(texto, start=1):
+        if not linha.strip():
+            continue
+        try:
+            yield numero, json.loads(linha)
+        except json.JSONDecodeError as e:
+            yield numero, ErroImportacao(f'JSON inválido: {e.msg}')
+
+
+def _linhas_json(texto):
+    """Percorre uma lista JSON objeto a objeto, lendo o arquivo em blocos."""
+    decoder = json.JSONDecoder()
+    buffer = texto.read(BLOCO_JSON).lstrip()
+    if not buffer.startswith('['):
+        raise ErroImportacao('O arquivo JSON deve conter uma lista de eventos.')
+    buffer = buffer[1:]
+    numero = 0
+    while True:
+        buffer = buffer.lstrip()
+        if numero and buffer.startswith(','):
+            buffer = buffer[1:].lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            if not buffer:
+                raise ValueError
+            objeto, fim = decoder.raw_decode(buffer)
+        except ValueError:
+            bloco = texto.read(BLOCO_JSON)
+            if not bloco:
+                raise ErroImportacao(f'JSON inválido ou incompleto após o item {numero}.')
+            buffer += bloco
+            continue
+        numero += 1
+        yield numero, objeto
+        buffer = buffer[fim:]
+
+
+def ler_linhas(arquivo, formato):
+    """Gera ``(número da linha, dados)`` a partir de um arquivo binário."""
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='' if formato == 'csv' else None)
+    leitores = {'csv': _linhas_csv, 'jsonl': _linhas_jsonl, 'json': _linhas_json}
+    try:
+        yield from leitores[formato](texto)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ErroImportacao(f'Não foi possível ler o arquivo: {e}')
+    finally:
+        texto.detach()
+
+
+def validar(dados):
+    """Retorna ``(dados validados, None)`` ou ``(None, erros)``."""
+    if isinstance(dados, ErroImportacao):
+        return None, {'non_field_errors': [str(dados)]}
+    if not isinstance(dados, dict):
+        return None, {'non_field_errors': ['Cada evento deve ser um objeto.']}
+    serializer = EventSerializer(data=dados)
+    if not serializer.is_valid():
+        return None, {campo: [str(erro) for erro in erros] for campo, erros in serializer.errors.items()}
+    return serializer.validated_data, None
+
+
+def gravar_lote(validos, usuario=None):
+    """
+    Cria ou atualiza os eventos de ``validos`` (lista de dados validados) em
+    uma transação. Retorna ``(criados, atualizados)``.
+    """
+    por_chave = {(d['titulo'], d['start_time'], d['local']): d for d in validos}
+    existentes = {}
+    inicios = {chave[1] for chave in por_chave}
+    for evento in Event.all_objects.filter(start_time__in=inicios).order_by('id'):
+        existentes.setdefault((evento.titulo, evento.start_time, evento.local), evento)
+
+    agora = timezone.now()
+    novos, alterados = [], []
+    for chave, dados in por_chave.items():
+        evento = existentes.get(chave)
+        if evento is None:
+            evento = Event(created_by=usuario, **dados)
+            novos.append(evento)
+        else:
+            for campo, valor in dados.items():
+                setattr(evento, campo, valor)
+            # bulk_update não preenche auto_now
+            evento.updated_at = agora
+            alterados.append(evento)
+        evento.geohash = mapa.geohash(evento.latitude, evento.longitude)
+
+    with transaction.atomic():
+        Event.objects.bulk_create(novos)
+        if alterados:
+            Event.objects.bulk_update(alterados, list(CAMPOS) + ['geohash', 'updated_at'])
+        busca.indexar_lote(novos + alterados)
+        tags.sincronizar_lote(novos + alterados)
+        transaction.on_commit(cache_agenda.invalidar)
+    return len(novos), len(alterados)
+
+
+def importar(arquivo, formato, usuario=None, lote=None):
+    """
+    Importa os eventos de ``arquivo`` (binário) no ``formato`` informado.
+    Retorna um ``ResultadoImportacao``; levanta ``ErroImportacao`` se o
+    arquivo não puder ser lido (os lotes anteriores ao erro já foram gravados).
+    """
+    if formato not in FORMATOS:
+        raise ErroImportacao(f'Formato não suportado: {formato}.')
+    lote = lote or getattr(settings, 'AGENDA_IMPORTACAO_LOTE', DEFAULT_LOTE)
+    resultado = ResultadoImportacao()
+    validos = []
+
+    def gravar():
+        criados, atualizados = gravar_lote(validos, usuario)
+        resultado.criados += criados
+        resultado.atualizados += atualizados
+        validos.clear()
+
+    for numero, dados in ler_linhas(arquivo, formato):
+        validados, erros = validar(dados)
+        if erros:
+            resultado.registrar_erro(numero, erros)
+            continue
+        validos.append(validados)
+        if len(validos) >= lote:
+            gravar()
+    if validos:
+        gravar()
+    return resultado
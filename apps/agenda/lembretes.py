@@ -0,0 +1,118 @@
+# apps/agenda/lembretes.py
+"""
+Lembretes de eventos próximos.
+
+``enviar_lembretes`` encontra, em uma única consulta, os pares (usuário,
+evento) da agenda pessoal com início nas próximas ``AGENDA_LEMBRETE_HORAS``
+horas que ainda não receberam lembrete (anti-join com ``LembreteEnviado``).
+Os pares são gravados em lotes de ``AGENDA_LEMBRETE_LOTE``, cada um em uma
+transação: primeiro o registro em ``LembreteEnviado``, depois uma
+``Notificacao`` por evento e os destinatários (``NotificacaoUsuario``), com
+``bulk_create``. O push de cada evento vai para ``enviar_push_em_lote``, que
+agrupa os destinatários por requisição ao OneSignal.
+
+O registro funciona como reserva: as linhas são inseridas com um
+identificador de lote, ignorando conflitos na restrição única, e só os pares
+que voltam com esse identificador são notificados. Execuções simultâneas (o
+beat e o comando ``send_event_reminders``) disputam a mesma restrição, e cada
+par é notificado por apenas uma delas.
+"""
+from collections import defaultdict
+from datetime import timedelta
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from apps.core.tarefas import despachar
+from apps.notificacoes.models import Notificacao, NotificacaoUsuario
+from apps.notificacoes.tasks import enviar_push_em_lote
+from apps.notificacoes.tempo_real import publicar_notificacao
+
+from .models import Event, LembreteEnviado, UserAgenda
+
+DEFAULT_HORAS = 24
+DEFAULT_LOTE = 5000
+DIAS_EXPIRACAO = 30
+
+
+def pendentes(agora=None, horas=None):
+    """Pares ``(evento_id, usuario_id)`` que devem receber lembrete, ordenados por evento."""
+    agora = agora or timezone.now()
+    horas = horas or getattr(settings, 'AGENDA_LEMBRETE_HORAS', DEFAULT_HORAS)
+    enviados = LembreteEnviado.objects.filter(evento_id=OuterRef('event_id'), usuario_id=OuterRef('user_id'))
+    return (
+        UserAgenda.objects
+        .filter(
+            event__start_time__gte=agora,
+            event__start_time__lte=agora + timedelta(hours=horas),
+            user__is_active=True,
+        )
+        .exclude(Exists(enviados))
+        .order_by('event_id', 'user_id')
+        .values_list('event_id', 'user_id')
+    )
+
+
+def _url_evento(evento_id):
+    return f"{getattr(settings, 'SITE_URL', '').rstrip('/')}/agenda/evento/{evento_id}/"
+
+
+def gravar_lote(pares):
+    """Cria as notificações e o registro dos lembretes de ``pares``. Retorna quantos foram gravados."""
+    eventos = Event.objects.only('id', 'titulo', 'local').in_bulk({evento_id for evento_id, _ in pares})
+    expiracao = timezone.now() + timedelta(days=DIAS_EXPIRACAO)
+    lote = uuid.uuid4()
+
+    with transaction.atomic():
+        LembreteEnviado.objects.bulk_create(
+            [
+                LembreteEnviado(evento_id=evento_id, usuario_id=usuario_id, lote=lote)
+                for evento_id, usuario_id in pares if evento_id in eventos
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        # Pares já registrados por outra execução ficam com outro lote
+        reservados = LembreteEnviado.objects.filter(evento_id__in=eventos, lote=lote)
+        por_evento = defaultdict(list)
+        for evento_id, usuario_id in reservados.values_list('evento_id', 'usuario_id'):
+            por_evento[evento_id].append(usuario_id)
+
+        notificacoes = Notificacao.objects.bulk_create([
+            Notificacao(
+                titulo=f'Lembrete de Evento: {eventos[evento_id].titulo}',
+                mensagem=f'O evento "{eventos[evento_id].titulo}" começará em breve no local: {eventos[evento_id].local}.',
+                tipo='info',
+                evento_id=evento_id,
+                data_expiracao=expiracao,
+            )
+            for evento_id in por_evento
+        ])
+        destinatarios = []
+        for notificacao in notificacoes:
+            destinatarios.extend(
+                NotificacaoUsuario(notificacao_id=notificacao.pk, usuario_id=usuario_id)
+                for usuario_id in por_evento[notificacao.evento_id]
+            )
+        NotificacaoUsuario.objects.bulk_create(destinatarios, batch_size=1000, ignore_conflicts=True)
+        for notificacao in notificacoes:
+            publicar_notificacao(notificacao, por_evento[notificacao.evento_id])
+            despachar(
+                enviar_push_em_lote, por_evento[notificacao.evento_id],
+                notificacao.titulo, notificacao.mensagem, _url_evento(notificacao.evento_id),
+            )
+    return len(destinatarios)
+
+
+def enviar_lembretes(agora=None, horas=None, lote=None):
+    """Envia os lembretes pendentes. Retorna ``(eventos, usuarios)`` notificados."""
+    lote = lote or getattr(settings, 'AGENDA_LEMBRETE_LOTE', DEFAULT_LOTE)
+    # Materializa os pares antes de gravar: o anti-join não deve ver o próprio lote
+    pares = list(pendentes(agora, horas))
+    total = 0
+    for inicio in range(0, len(pares), lote):
+        total += gravar_lote(pares[inicio:inicio + lote])
+    return len({evento_id for evento_id, _ in pares}), total
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.agenda.importacao import FORMATOS, ErroImportacao, detectar_formato, importar
+
+
+class Command(BaseCommand):
+    help = 'Importa eventos de um arquivo CSV, JSON ou JSON Lines (cria ou atualiza por título, início e local)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo a importar')
+        parser.add_argument(
+            '--formato',
+            choices=FORMATOS,
+            help='Formato do arquivo (padrão: pela extensão)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=None,
+            help='Eventos gravados por transação (padrão: AGENDA_IMPORTACAO_LOTE)'
+        )
+        parser.add_argument(
+            '--usuario',
+            help='E-mail do usuário registrado como criador dos novos eventos'
+        )
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = get_user_model().objects.get(email=options['usuario'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'Usuário não encontrado: {options["usuario"]}')
+
+        try:
+            formato = options['formato'] or detectar_formato(options['arquivo'])
+            with open(options['arquivo'], 'rb') as arquivo:
+                resultado = importar(arquivo, formato, usuario=usuario, lote=options['lote'])
+        except (OSError, ErroImportacao) as e:
+            raise CommandError(str(e))
+
+        for erro in resultado.erros:
+            detalhes = '; '.join(f'{campo}: {" ".join(msgs)}' for campo, msgs in erro['erros'].items())
+            self.stderr.write(f'Linha {erro["linha"]}: {detalhes}')
+        if resultado.total_erros > len(resultado.erros):
+            self.stderr.write(f'... e mais {resultado.total_erros - len(resultado.erros)} linhas com erro.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.criados} eventos criados, {resultado.atualizados} atualizados, '
+            f'{resultado.total_erros} linhas com erro.'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from apps.agenda.tasks import agendas_antigas, remover_agendas_antigas
+
+
+class Command(BaseCommand):
+    help = 'Remove das agendas pessoais os eventos que já passaram (em lotes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=None,
+            help='Quantidade de linhas removidas por transação (padrão: AGENDA_LIMPEZA_LOTE)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas mostra quantas linhas seriam removidas'
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'Modo de teste - {agendas_antigas().count()} eventos passados seriam removidos das agendas'
+            ))
+            return
+        total = remover_agendas_antigas(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} eventos passados removidos das agendas pessoais.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.agenda import busca
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca textual dos eventos (FTS5)'
+
+    def handle(self, *args, **options):
+        if not busca.fts_disponivel():
+            self.stdout.write(self.style.WARNING(
+                'Índice FTS5 indisponível neste banco; a busca usa o fallback com icontains.'
+            ))
+            return
+        total = busca.reindexar()
+        self.stdout.write(self.style.SUCCESS(f'{total} eventos indexados.'))
@@ -0,0 +1,192 @@
+# apps/agenda/mapa.py
+"""
+Dados do mapa de eventos (``/agenda/mapa/api/``).
+
+O mapa pede a área visível (``bbox``) e o zoom; a área é dividida nos tiles
+do Google Maps/OSM (Web Mercator) daquele zoom e cada tile é montado e
+guardado no cache separadamente, com a versão da agenda na chave
+(``cache_agenda.versao``): mover o mapa só calcula os tiles novos.
+
+Cada evento guarda o ``geohash`` das suas coordenadas (calculado ao salvar).
+Nos zooms baixos os eventos do tile são agrupados pelo prefixo do geohash
+com tamanho proporcional ao tile (cerca de ``DIVISOES`` grupos por lado), em
+uma única consulta ``GROUP BY``; a partir de ``AGENDA_MAPA_ZOOM_PINS`` o
+tile traz os eventos individualmente.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Min
+from django.db.models.functions import Substr
+
+from . import cache_agenda
+from .models import Event
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISAO_GEOHASH = 9
+
+# Largura (graus de longitude) de uma célula para cada tamanho de geohash
+LARGURA_GEOHASH = {1: 45.0, 2: 11.25, 3: 1.40625, 4: 0.3515625, 5: 0.0439453125,
+                   6: 0.010986328125, 7: 0.001373291015625, 8: 0.00034332275390625,
+                   9: 0.00004291534423828125}
+DIVISOES = 8
+
+ZOOM_MAXIMO = 21
+LATITUDE_MAXIMA = 85.05112878
+DEFAULT_ZOOM_PINS = 15
+DEFAULT_MAX_TILES = 64
+DEFAULT_TIMEOUT = 300
+
+
+class AreaInvalida(ValueError):
+    pass
+
+
+def geohash(latitude, longitude, precisao=PRECISAO_GEOHASH):
+    """Geohash (base32) das coordenadas; ``''`` se alguma estiver vazia."""
+    if latitude is None or longitude is None:
+        return ''
+    faixa_lat = [-90.0, 90.0]
+    faixa_lng = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    codigo = []
+    bits, valor, par = 0, 0, True
+    while len(codigo) < precisao:
+        faixa, coordenada = (faixa_lng, longitude) if par else (faixa_lat, latitude)
+        meio = (faixa[0] + faixa[1]) / 2
+        if coordenada >= meio:
+            valor = (valor << 1) | 1
+            faixa[0] = meio
+        else:
+            valor <<= 1
+            faixa[1] = meio
+        par = not par
+        bits += 1
+        if bits == 5:
+            codigo.append(BASE32[valor])
+            bits, valor = 0, 0
+    return ''.join(codigo)
+
+
+def tamanho_prefixo(zoom):
+    """Tamanho do prefixo de geohash que divide o tile em ~DIVISOES grupos por lado."""
+    largura_tile = 360.0 / 2 ** zoom
+    for tamanho in sorted(LARGURA_GEOHASH):
+        if LARGURA_GEOHASH[tamanho] <= largura_tile / DIVISOES:
+            return tamanho
+    return PRECISAO_GEOHASH
+
+
+def _tile_x(longitude, zoom):
+    return int((longitude + 180.0) / 360.0 * 2 ** zoom)
+
+
+def _tile_y(latitude, zoom):
+    latitude = max(-LATITUDE_MAXIMA, min(LATITUDE_MAXIMA, latitude))
+    rad = math.radians(latitude)
+    return int((1.0 - math.asinh(math.tan(rad)) / math.pi) / 2.0 * 2 ** zoom)
+
+
+def limites_tile(zoom, x, y):
+    """``(oeste, sul, leste, norte)`` do tile."""
+    n = 2 ** zoom
+
+    def latitude(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return x / n * 360.0 - 180.0, latitude(y + 1), (x + 1) / n * 360.0 - 180.0, latitude(y)
+
+
+def tiles(bbox, zoom):
+    """Tiles ``(x, y)`` que cobrem ``bbox`` = ``(oeste, sul, leste, norte)``."""
+    oeste, sul, leste, norte = bbox
+    ultimo = 2 ** zoom - 1
+    x0, x1 = _tile_x(oeste, zoom), min(_tile_x(leste, zoom), ultimo)
+    y0, y1 = _tile_y(norte, zoom), min(_tile_y(sul, zoom), ultimo)
+    return [(x, y) for x in range(max(x0, 0), x1 + 1) for y in range(max(y0, 0), y1 + 1)]
+
+
+def ler_area(bbox, zoom):
+    """
+    Valida ``bbox`` (``"oeste,sul,leste,norte"``) e ``zoom`` vindos da query string.
+    Levanta ``AreaInvalida``.
+    """
+    try:
+        oeste, sul, leste, norte = (float(valor) for valor in bbox.split(','))
+        zoom = int(zoom)
+    except (AttributeError, TypeError, ValueError):
+        raise AreaInvalida('Informe bbox=oeste,sul,leste,norte e zoom')
+    if not (-180 <= oeste < leste <= 180 and -90 <= sul < norte <= 90):
+        raise AreaInvalida('bbox fora dos limites')
+    return (oeste, sul, leste, norte), max(0, min(zoom, ZOOM_MAXIMO))
+
+
+def _eventos_no_tile(zoom, x, y):
+    oeste, sul, leste, norte = limites_tile(zoom, x, y)
+    return Event.objects.filter(
+        latitude__gte=sul, latitude__lt=norte,
+        longitude__gte=oeste, longitude__lt=leste,
+    )
+
+
+def _pino(evento):
+    return {
+        'tipo': 'evento',
+        'id': evento.id,
+        'titulo': evento.titulo,
+        'data': evento.start_time.strftime('%d/%m/%Y') if evento.start_time else '',
+        'hora': evento.start_time.strftime('%H:%M') if evento.start_time else '',
+        'latitude': float(evento.latitude),
+        'longitude': float(evento.longitude),
+    }
+
+
+def montar_tile(zoom, x, y):
+    """Itens (eventos ou grupos) de um tile, sem cache."""
+    eventos = _eventos_no_tile(zoom, x, y).only('id', 'titulo', 'start_time', 'latitude', 'longitude')
+    if zoom >= getattr(settings, 'AGENDA_MAPA_ZOOM_PINS', DEFAULT_ZOOM_PINS):
+        return [_pino(evento) for evento in eventos.order_by('id')]
+
+    grupos = list(
+        _eventos_no_tile(zoom, x, y)
+        .annotate(celula=Substr('geohash', 1, tamanho_prefixo(zoom)))
+        .values('celula')
+        .annotate(total=Count('id'), latitude=Avg('latitude'), longitude=Avg('longitude'), primeiro=Min('id'))
+        .order_by('celula')
+    )
+    # Grupos de um só evento aparecem como o próprio evento
+    sozinhos = {evento.id: evento for evento in eventos.filter(id__in=[g['primeiro'] for g in grupos if g['total'] == 1])}
+    itens = []
+    for grupo in grupos:
+        if grupo['total'] == 1:
+            itens.append(_pino(sozinhos[grupo['primeiro']]))
+        else:
+            itens.append({
+                'tipo': 'grupo',
+                'total': grupo['total'],
+                'latitude': float(grupo['latitude']),
+                'longitude': float(grupo['longitude']),
+            })
+    return itens
+
+
+def tile(zoom, x, y):
+    """Itens do tile, lidos do cache enquanto a agenda não mudar."""
+    chave = f'agenda:mapa:{cache_agenda.versao()}:{zoom}:{x}:{y}'
+    itens = cache.get(chave)
+    if itens is None:
+        itens = montar_tile(zoom, x, y)
+        cache.set(chave, itens, getattr(settings, 'AGENDA_MAPA_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+    return itens
+
+
+def itens_da_area(bbox, zoom):
+    """Junta os tiles que cobrem a área. Levanta ``AreaInvalida`` se forem tiles demais."""
+    cobertura = tiles(bbox, zoom)
+    if len(cobertura) > getattr(settings, 'AGENDA_MAPA_MAX_TILES', DEFAULT_MAX_TILES):
+        raise AreaInvalida('Área grande demais para o zoom informado')
+    itens = []
+    for x, y in cobertura:
+        itens.extend(tile(zoom, x, y))
+    return itens
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+TABELA = 'agenda_event_busca'
+CAMPOS = ('titulo', 'descricao', 'palestrante', 'local')
+
+
+def criar_indice_busca(apps, schema_editor):
+    """Cria e preenche a tabela FTS5 da busca (apps/agenda/busca.py); só no SQLite."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    colunas = ', '.join(CAMPOS)
+    origem = ', '.join(f"COALESCE({campo}, '')" for campo in CAMPOS)
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA} USING fts5('
+                f'{colunas}, tokenize="unicode61 remove_diacritics 2")'
+            )
+        except Exception:
+            # SQLite sem FTS5: a busca usa o fallback com icontains
+            return
+        cursor.execute(f'INSERT INTO {TABELA} (rowid, {colunas}) SELECT id, {origem} FROM agenda_event')
+
+
+def remover_indice_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {TABELA}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0010_event_indices'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice_busca, remover_indice_busca),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:44
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def separar_tags(apps, schema_editor):
+    """Cria os temas a partir de ``Event.tags`` ("clima, energia") e liga os eventos."""
+    Event = apps.get_model('agenda', 'Event')
+    Tag = apps.get_model('agenda', 'Tag')
+    Ligacao = Event.temas.through
+
+    tags = {}
+    ligacoes = []
+    for evento_id, texto in Event.objects.values_list('id', 'tags').iterator():
+        slugs = set()
+        for nome in (texto or '').split(','):
+            nome = nome.strip()
+            slug = slugify(nome)[:100]
+            if not slug or slug in slugs:
+                continue
+            slugs.add(slug)
+            if slug not in tags:
+                tags[slug] = Tag.objects.create(nome=nome, slug=slug)
+            ligacoes.append(Ligacao(event_id=evento_id, tag_id=tags[slug].id))
+    Ligacao.objects.bulk_create(ligacoes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0011_event_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, verbose_name='Nome')),
+                ('slug', models.SlugField(max_length=100, unique=True, verbose_name='Slug')),
+            ],
+            options={
+                'verbose_name': 'Tema',
+                'verbose_name_plural': 'Temas',
+                'ordering': ['nome'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='event_tags_idx',
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='temas',
+            field=models.ManyToManyField(blank=True, related_name='eventos', to='agenda.tag', verbose_name='Temas'),
+        ),
+        migrations.RunPython(separar_tags, migrations.RunPython.noop),
+    ]
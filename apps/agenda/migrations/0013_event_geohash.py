@@ -0,0 +1,65 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(latitude, longitude, precisao=9):
+    # Cópia de apps.agenda.mapa.geohash: a migração não deve depender do
+    # código atual do app, que pode mudar depois.
+    faixa_lat = [-90.0, 90.0]
+    faixa_lng = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    codigo = []
+    bits, valor, par = 0, 0, True
+    while len(codigo) < precisao:
+        faixa, coordenada = (faixa_lng, longitude) if par else (faixa_lat, latitude)
+        meio = (faixa[0] + faixa[1]) / 2
+        if coordenada >= meio:
+            valor = (valor << 1) | 1
+            faixa[0] = meio
+        else:
+            valor <<= 1
+            faixa[1] = meio
+        par = not par
+        bits += 1
+        if bits == 5:
+            codigo.append(BASE32[valor])
+            bits, valor = 0, 0
+    return ''.join(codigo)
+
+
+def calcular_geohash(apps, schema_editor):
+    Event = apps.get_model('agenda', 'Event')
+    eventos = []
+    for evento in Event.objects.filter(latitude__isnull=False, longitude__isnull=False).only('latitude', 'longitude').iterator():
+        evento.geohash = geohash(evento.latitude, evento.longitude)
+        eventos.append(evento)
+    Event.objects.bulk_update(eventos, ['geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0012_tags_normalizadas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12, verbose_name='Geohash'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['latitude', 'longitude'], name='event_lat_lng_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['geohash'], name='event_geohash_idx'),
+        ),
+        migrations.RunPython(calcular_geohash, migrations.RunPython.noop),
+    ]
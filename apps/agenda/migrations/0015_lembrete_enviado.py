@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0014_event_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LembreteEnviado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enviado_em', models.DateTimeField(auto_now_add=True, verbose_name='Enviado em')),
+                ('lote', models.UUIDField(blank=True, editable=False, null=True, verbose_name='Lote')),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lembretes_enviados', to='agenda.event', verbose_name='Evento')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lembretes_recebidos', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Lembrete Enviado',
+                'verbose_name_plural': 'Lembretes Enviados',
+                'constraints': [models.UniqueConstraint(fields=('evento', 'usuario'), name='lembrete_evento_usuario_unico')],
+            },
+        ),
+    ]
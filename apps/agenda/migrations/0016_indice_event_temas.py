@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Índice da busca por tema na tabela intermediária de ``Event.temas``.
+
+    O índice em ``Event.tags`` (0010) deixou de servir quando os temas
+    passaram para o M2M (0012). O filtro ``temas__slug`` parte do tema para
+    os eventos; o índice (tag_id, event_id) responde a junção só pelo índice.
+    A tabela é criada automaticamente pelo Django, por isso o SQL direto.
+    """
+
+    dependencies = [
+        ('agenda', '0015_lembrete_enviado'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX event_temas_tag_event_idx ON agenda_event_temas (tag_id, event_id)',
+            'DROP INDEX event_temas_tag_event_idx',
+        ),
+    ]
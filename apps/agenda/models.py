@@ -6,6 +6,14 @@ from datetime import timedelta
 # Obter o modelo de usuário ativo
 User = get_user_model()
 
+# Um evento deixa de aparecer nas agendas 10 horas após o início
+HORAS_EVENTO_ATIVO = 10
+
+
+def inicio_minimo_ativo():
+    """Eventos que começaram antes deste instante já passaram."""
+    return timezone.now() - timedelta(hours=HORAS_EVENTO_ATIVO)
+
 class EventManager(models.Manager):
     def get_queryset(self):
         """Manager padrão - retorna todos os eventos"""
@@ -13,12 +21,25 @@ class EventManager(models.Manager):
 
     def active_events(self):
         """Filtra apenas eventos ativos (últimas 10 horas ou sem horário definido)"""
-        ten_hours_ago = timezone.now() - timedelta(hours=10)
         return super().get_queryset().filter(
             models.Q(start_time__isnull=True) |  # Inclui eventos sem horário definido
-            models.Q(start_time__gte=ten_hours_ago)  # Inclui eventos das últimas 10 horas
+            models.Q(start_time__gte=inicio_minimo_ativo())  # Inclui eventos das últimas 10 horas
         )
 
+class Tag(models.Model):
+    """Tema normalizado de eventos, extraído de ``Event.tags`` (separados por vírgula)."""
+    nome = models.CharField(max_length=100, verbose_name='Nome')
+    slug = models.SlugField(max_length=100, unique=True, verbose_name='Slug')
+
+    def __str__(self):
+        return self.nome
+
+    class Meta:
+        verbose_name = 'Tema'
+        verbose_name_plural = 'Temas'
+        ordering = ['nome']
+
+
 class Event(models.Model):
     titulo = models.CharField(max_length=200, verbose_name='Título')
     descricao = models.TextField(blank=True, null=True, verbose_name='Descrição')
@@ -28,7 +49,10 @@ class Event(models.Model):
     end_time = models.DateTimeField(verbose_name='Data e Hora de Término')
     tags = models.CharField(max_length=100, default='sustentabilidade', verbose_name='Tema')
     importante = models.BooleanField(default=False, verbose_name='Evento Importante')
+    # Mantido a partir de ``tags`` pelos sinais (apps/agenda/tags.py)
+    temas = models.ManyToManyField(Tag, blank=True, related_name='eventos', verbose_name='Temas')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
     created_by = models.ForeignKey(
         User, 
         on_delete=models.SET_NULL, 
@@ -51,6 +75,8 @@ class Event(models.Model):
         blank=True,
         verbose_name='Longitude'
     )
+    # Geohash das coordenadas, mantido pelos sinais (apps/agenda/mapa.py)
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False, verbose_name='Geohash')
     
     # Gerenciadores
     objects = EventManager()
@@ -63,13 +89,21 @@ class Event(models.Model):
         verbose_name = 'Evento'
         verbose_name_plural = 'Eventos'
         ordering = ['start_time']
+        indexes = [
+            # Listagem da agenda em ordem cronológica e filtros por data
+            models.Index(fields=['start_time'], name='event_start_time_idx'),
+            # Eventos dentro de um tile do mapa
+            models.Index(fields=['latitude', 'longitude'], name='event_lat_lng_idx'),
+            # Agrupamento do mapa por prefixo de geohash
+            models.Index(fields=['geohash'], name='event_geohash_idx'),
+        ]
 
     @property
     def is_past_event(self):
         """Retorna True se o evento já passou há mais de 10 horas."""
         if not self.start_time:
             return False
-        return self.start_time < (timezone.now() - timedelta(hours=10))
+        return self.start_time < inicio_minimo_ativo()
 class UserAgenda(models.Model):
     """
     Modelo para relacionar usuários com eventos em suas agendas pessoais.
@@ -94,4 +128,24 @@ class UserAgenda(models.Model):
         unique_together = ('user', 'event')  # Evita duplicações
 
     def __str__(self):
-        return f"{self.user.username} - {self.event.titulo}"
\ No newline at end of file
+        return f"{self.user.username} - {self.event.titulo}"
+
+class LembreteEnviado(models.Model):
+    """
+    Registro dos lembretes de evento já enviados (um por usuário e evento),
+    usado para não repetir lembretes (apps/agenda/lembretes.py).
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lembretes_recebidos', verbose_name='Usuário')
+    evento = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='lembretes_enviados', verbose_name='Evento')
+    enviado_em = models.DateTimeField(auto_now_add=True, verbose_name='Enviado em')
+    lote = models.UUIDField(null=True, blank=True, editable=False, verbose_name='Lote')
+
+    class Meta:
+        verbose_name = 'Lembrete Enviado'
+        verbose_name_plural = 'Lembretes Enviados'
+        constraints = [
+            models.UniqueConstraint(fields=['evento', 'usuario'], name='lembrete_evento_usuario_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario} - {self.evento.titulo}"
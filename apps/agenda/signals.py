@@ -0,0 +1,43 @@
+# apps/agenda/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from . import busca, cache_agenda, conflitos, mapa, tags
+from .models import Event, UserAgenda
+
+
+@receiver(pre_save, sender=Event)
+def calcular_geohash(sender, instance, raw=False, **kwargs):
+    """Mantém o geohash usado no agrupamento do mapa."""
+    if not raw:
+        instance.geohash = mapa.geohash(instance.latitude, instance.longitude)
+
+
+@receiver(post_save, sender=Event)
+def indexar_evento(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mantém o índice de busca, os temas e o cache da agenda coerentes após criar/editar um evento."""
+    if raw:
+        return
+    busca.indexar(instance)
+    if update_fields is None or 'tags' in update_fields:
+        tags.sincronizar(instance)
+    transaction.on_commit(cache_agenda.invalidar)
+
+
+@receiver(post_delete, sender=Event)
+def remover_evento_do_indice(sender, instance, **kwargs):
+    busca.remover(instance.pk)
+    tags.invalidar_facetas()
+    transaction.on_commit(cache_agenda.invalidar)
+
+
+@receiver(post_save, sender=UserAgenda)
+def registrar_na_agenda(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        conflitos.registrar(instance.user_id, instance.event)
+
+
+@receiver(post_delete, sender=UserAgenda)
+def remover_da_agenda(sender, instance, **kwargs):
+    conflitos.invalidar(instance.user_id)
@@ -0,0 +1,99 @@
+# apps/agenda/tags.py
+"""
+Temas normalizados dos eventos.
+
+``Event.tags`` continua sendo o campo editado (admin, API, comandos), com os
+temas separados por vírgula. Os sinais de ``Event`` chamam ``sincronizar``
+para refletir o texto na relação ``Event.temas`` com ``Tag``; o filtro por
+tema usa essa relação (junção pelos índices de ``agenda_event_temas`` e do
+``Tag.slug``) em vez de ``tags__icontains``.
+
+As facetas (temas com a quantidade de eventos) ficam no cache até a próxima
+alteração de evento, em vez de serem recalculadas a cada página.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils.text import slugify
+
+from .models import Tag
+
+CHAVE_FACETAS = 'agenda:facetas_tags'
+DEFAULT_FACETAS_TIMEOUT = 3600
+
+
+def separar(texto):
+    """``"Clima, energia,clima"`` -> ``{'clima': 'Clima', 'energia': 'energia'}`` (slug -> nome)."""
+    temas = {}
+    for nome in (texto or '').split(','):
+        nome = nome.strip()
+        slug = slugify(nome)[:100]
+        if slug and slug not in temas:
+            temas[slug] = nome
+    return temas
+
+
+def sincronizar(evento):
+    """Atualiza ``evento.temas`` a partir de ``evento.tags``. Retorna True se algo mudou."""
+    temas = separar(evento.tags)
+    atuais = set(evento.temas.values_list('slug', flat=True))
+    if atuais == set(temas):
+        return False
+
+    existentes = {tag.slug: tag for tag in Tag.objects.filter(slug__in=temas)}
+    novos = [Tag(nome=nome, slug=slug) for slug, nome in temas.items() if slug not in existentes]
+    if novos:
+        Tag.objects.bulk_create(novos, ignore_conflicts=True)
+        existentes = {tag.slug: tag for tag in Tag.objects.filter(slug__in=temas)}
+    evento.temas.set(existentes.values())
+    invalidar_facetas()
+    return True
+
+
+def sincronizar_lote(eventos):
+    """Como ``sincronizar``, para vários eventos com poucas consultas (importação em massa)."""
+    desejados = {evento.pk: separar(evento.tags) for evento in eventos}
+    nomes = {slug: nome for temas in desejados.values() for slug, nome in temas.items()}
+    if nomes:
+        Tag.objects.bulk_create([Tag(nome=nome, slug=slug) for slug, nome in nomes.items()], ignore_conflicts=True)
+    ids = dict(Tag.objects.filter(slug__in=nomes).values_list('slug', 'id'))
+
+    Ligacao = Tag.eventos.through
+    Ligacao.objects.filter(event_id__in=desejados).delete()
+    Ligacao.objects.bulk_create(
+        [Ligacao(event_id=evento_id, tag_id=ids[slug]) for evento_id, temas in desejados.items() for slug in temas],
+        batch_size=1000,
+    )
+    invalidar_facetas()
+
+
+def filtrar(queryset, tema):
+    """Filtra eventos pelo tema (nome ou slug)."""
+    slug = slugify(tema or '')
+    if not slug:
+        return queryset
+    return queryset.filter(temas__slug=slug)
+
+
+def facetas():
+    """
+    Lista ``[{'nome', 'slug', 'total'}, ...]`` dos temas com eventos, em ordem
+    alfabética. Calculada uma vez e guardada no cache até ``invalidar_facetas``.
+    """
+    resultado = cache.get(CHAVE_FACETAS)
+    if resultado is None:
+        resultado = list(
+            Tag.objects.annotate(total=Count('eventos'))
+            .filter(total__gt=0)
+            .order_by('nome')
+            .values('nome', 'slug', 'total')
+        )
+        cache.set(
+            CHAVE_FACETAS, resultado,
+            getattr(settings, 'AGENDA_FACETAS_TIMEOUT', DEFAULT_FACETAS_TIMEOUT)
+        )
+    return resultado
+
+
+def invalidar_facetas():
+    cache.delete(CHAVE_FACETAS)
@@ -0,0 +1,60 @@
+# apps/agenda/tasks.py
+"""
+Tarefas periódicas da agenda.
+
+``limpar_agendas_pessoais`` remove das agendas pessoais os eventos que já
+passaram (``inicio_minimo_ativo``). Roda pelo Celery beat
+(``CELERY_BEAT_SCHEDULE``) ou pelo comando ``limpar_agendas``; a página
+``agenda_pessoal`` apenas deixa de exibir esses eventos, sem escrever no banco.
+
+A remoção é feita em lotes de ``AGENDA_LIMPEZA_LOTE`` linhas, cada um na sua
+própria transação, para não segurar o lock de escrita do SQLite por muito
+tempo.
+
+``enviar_lembretes_eventos`` envia os lembretes dos eventos próximos
+(``apps/agenda/lembretes.py``), como o comando ``send_event_reminders``.
+"""
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+
+from .lembretes import enviar_lembretes
+from .models import UserAgenda, inicio_minimo_ativo
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOTE = 1000
+
+
+def agendas_antigas(limite=None):
+    return UserAgenda.objects.filter(event__start_time__lt=limite or inicio_minimo_ativo())
+
+
+def remover_agendas_antigas(lote=None, limite=None):
+    """Remove as marcações de eventos passados, em lotes. Retorna quantas foram removidas."""
+    lote = lote or getattr(settings, 'AGENDA_LIMPEZA_LOTE', DEFAULT_LOTE)
+    limite = limite or inicio_minimo_ativo()
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(agendas_antigas(limite).order_by('id').values_list('id', flat=True)[:lote])
+            if not ids:
+                return total
+            removidos, _ = UserAgenda.objects.filter(id__in=ids).delete()
+        total += removidos
+
+
+@shared_task(ignore_result=True)
+def limpar_agendas_pessoais():
+    total = remover_agendas_antigas()
+    logger.info('Agendas pessoais: %s eventos passados removidos', total)
+    return total
+
+
+@shared_task(ignore_result=True)
+def enviar_lembretes_eventos():
+    eventos, usuarios = enviar_lembretes()
+    logger.info('Lembretes: %s usuários notificados sobre %s eventos', usuarios, eventos)
+    return usuarios
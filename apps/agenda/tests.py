@@ -1,3 +1,542 @@
+import io
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import busca, calendario, conflitos, importacao, lembretes, mapa, tags
+from apps.notificacoes.models import Notificacao, NotificacaoUsuario
+
+from .models import Event, LembreteEnviado, Tag, UserAgenda
+
+User = get_user_model()
+
+
+class BuscaEventosTest(TestCase):
+    """Testa a busca textual (FTS5) da agenda."""
+
+    def setUp(self):
+        cache.clear()
+        inicio = timezone.now() + timedelta(days=1)
+
+        def criar(titulo, **campos):
+            return Event.objects.create(
+                titulo=titulo, local=campos.pop('local', 'Belém'),
+                start_time=inicio, end_time=inicio + timedelta(hours=1), **campos
+            )
+
+        self.energia = criar('Energia Sustentável na Amazônia', palestrante='Ana Souza')
+        self.oceanos = criar('Oceanos', descricao='Impactos da energia nos oceanos')
+        self.clima = criar('Financiamento climático', local='Hangar')
+
+    def titulos(self, termo, queryset=None):
+        return [e.titulo for e in busca.buscar(queryset or Event.objects.all(), termo)]
+
+    def test_sem_acentos_e_por_prefixo(self):
+        """'sustentavel' encontra 'Sustentável' e 'clim' encontra 'climático'"""
+        self.assertTrue(busca.fts_disponivel())
+        self.assertEqual(self.titulos('sustentavel'), [self.energia.titulo])
+        self.assertEqual(self.titulos('CLIM'), [self.clima.titulo])
+        self.assertEqual(self.titulos('amazonia ana'), [self.energia.titulo])
+
+    def test_titulo_mais_relevante_que_descricao(self):
+        self.assertEqual(self.titulos('energia'), [self.energia.titulo, self.oceanos.titulo])
+
+    def test_indice_acompanha_edicao_e_exclusao(self):
+        self.clima.titulo = 'Transição justa'
+        self.clima.save()
+        self.assertEqual(self.titulos('financiamento'), [])
+        self.assertEqual(self.titulos('transicao'), ['Transição justa'])
+
+        self.energia.delete()
+        self.assertEqual(self.titulos('sustentavel'), [])
+
+        Event.objects.filter(pk=self.oceanos.pk).update(titulo='Mares')
+        busca.reindexar()
+        self.assertEqual(self.titulos('mares'), ['Mares'])
+
+    def test_fallback_icontains(self):
+        self.assertEqual(
+            [e.titulo for e in busca._buscar_icontains(Event.objects.all(), 'energia')],
+            [self.energia.titulo, self.oceanos.titulo],
+        )
+
+    def test_views_usam_a_busca(self):
+        user = User.objects.create_user(email='participante@teste.com', password='senha12345', nome='Participante')
+        UserAgenda.objects.create(user=user, event=self.energia)
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('agenda:agenda_oficial'), {'search': 'sustentavel'})
+        self.assertEqual(list(response.context['eventos']), [self.energia])
+        self.assertEqual(response.context['user_events'], [self.energia.id])
+
+        response = self.client.get(reverse('admin_personalizado:evento_listar'), {'search': 'energia'})
+        self.assertEqual([e['id'] for e in response.json()['results']], [self.energia.id, self.oceanos.id])
+
+
+class TemasEventosTest(TestCase):
+    """Testa os temas normalizados e as facetas da agenda."""
+
+    def setUp(self):
+        cache.clear()
+        self.inicio = timezone.now() + timedelta(days=1)
+        self.clima = self.criar('Clima', 'Clima, energia')
+        self.oceanos = self.criar('Oceanos', 'oceanos,clima, ')
+
+    def criar(self, titulo, temas):
+        return Event.objects.create(
+            titulo=titulo, local='Belém', tags=temas,
+            start_time=self.inicio, end_time=self.inicio + timedelta(hours=1),
+        )
+
+    def test_texto_separado_em_temas(self):
+        self.assertEqual(tags.separar('Clima, energia,clima,, '), {'clima': 'Clima', 'energia': 'energia'})
+        self.assertEqual(sorted(Tag.objects.values_list('slug', flat=True)), ['clima', 'energia', 'oceanos'])
+        self.assertEqual(sorted(self.oceanos.temas.values_list('slug', flat=True)), ['clima', 'oceanos'])
+
+        self.oceanos.tags = 'Oceanos'
+        self.oceanos.save()
+        self.assertEqual(list(self.oceanos.temas.values_list('slug', flat=True)), ['oceanos'])
+
+    def test_facetas_em_cache_ate_a_proxima_alteracao(self):
+        self.assertEqual(tags.facetas(), [
+            {'nome': 'Clima', 'slug': 'clima', 'total': 2},
+            {'nome': 'energia', 'slug': 'energia', 'total': 1},
+            {'nome': 'oceanos', 'slug': 'oceanos', 'total': 1},
+        ])
+        with self.assertNumQueries(0):
+            tags.facetas()
+
+        self.criar('Energia limpa', 'energia')
+        self.assertEqual(tags.facetas()[1]['total'], 2)
+        self.clima.delete()
+        self.assertEqual([f['slug'] for f in tags.facetas()], ['clima', 'energia', 'oceanos'])
+        self.assertEqual(tags.facetas()[0]['total'], 1)
+
+    def test_filtro_por_tema_na_agenda(self):
+        response = self.client.get(reverse('agenda:agenda_oficial'), {'tag': 'Energia'})
+        self.assertEqual(list(response.context['eventos']), [self.clima])
+        self.assertEqual(response.context['tag_filter'], 'energia')
+        self.assertContains(response, 'value="energia" selected')
+
+        response = self.client.get(reverse('agenda:agenda_oficial'), {'tag': 'clima'})
+        self.assertEqual(len(response.context['eventos']), 2)
+
+
+class CacheAgendaOficialTest(TestCase):
+    """Testa o cache versionado da agenda oficial."""
+
+    def setUp(self):
+        cache.clear()
+        inicio = timezone.now() + timedelta(days=1)
+        self.eventos = [
+            Event.objects.create(
+                titulo=f'Evento {i}', local='Belém', tags='clima',
+                start_time=inicio + timedelta(hours=i), end_time=inicio + timedelta(hours=i + 1),
+            )
+            for i in range(20)
+        ]
+        self.url = reverse('agenda:agenda_oficial')
+
+    def test_visitante_anonimo_servido_do_cache(self):
+        cursor = self.client.get(self.url).context['eventos'].proximo
+        self.client.get(self.url, {'cursor': cursor})
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url, {'cursor': cursor})
+        # Restam apenas as consultas do rodapé (context processor do site)
+        self.assertFalse([q for q in consultas.captured_queries if 'agenda_' in q['sql']])
+        self.assertEqual(list(response.context['eventos']), self.eventos[15:])
+        self.assertFalse(response.context['eventos'].has_next)
+        self.assertEqual(response.context['total_eventos'], 20)
+
+    def test_marcacoes_do_usuario_sobre_a_pagina_comum(self):
+        self.client.get(self.url)
+        user = User.objects.create_user(email='participante@teste.com', password='senha12345', nome='Participante')
+        UserAgenda.objects.create(user=user, event=self.eventos[1])
+        self.client.force_login(user)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['user_events'], [self.eventos[1].id])
+
+    def test_alteracao_de_evento_muda_a_versao(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.eventos[0].titulo = 'Plenária de abertura'
+            self.eventos[0].save()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Plenária de abertura')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.eventos[0].delete()
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'Plenária de abertura')
+        self.assertEqual(response.context['total_eventos'], 19)
+
+
+class MapaEventosTest(TestCase):
+    """Testa a API do mapa (tiles, agrupamento e cache)."""
+
+    def setUp(self):
+        cache.clear()
+        inicio = timezone.now() + timedelta(days=1)
+
+        def criar(titulo, latitude, longitude):
+            return Event.objects.create(
+                titulo=titulo, local='Belém', latitude=latitude, longitude=longitude,
+                start_time=inicio, end_time=inicio + timedelta(hours=1),
+            )
+
+        self.hangar = [criar(f'Hangar {i}', f'-1.45{i}', f'-48.45{i}') for i in range(3)]
+        self.sao_paulo = criar('Pavilhão SP', '-23.55', '-46.63')
+        Event.objects.create(titulo='Online', local='Internet', start_time=inicio, end_time=inicio + timedelta(hours=1))
+        self.user = User.objects.create_user(email='mapa@teste.com', password='senha12345', nome='Mapa')
+        self.client.force_login(self.user)
+        self.url = reverse('agenda:mapa_api')
+
+    def test_geohash(self):
+        self.assertEqual(mapa.geohash(57.64911, 10.40744), 'u4pruydqq')
+        self.assertEqual(mapa.geohash(None, 10), '')
+        self.hangar[0].refresh_from_db()
+        self.assertEqual(self.hangar[0].geohash, mapa.geohash(-1.450, -48.450))
+
+    def test_agrupa_eventos_em_zoom_baixo(self):
+        response = self.client.get(self.url, {'bbox': '-60,-30,-40,5', 'zoom': 5})
+        self.assertEqual(response.status_code, 200)
+        itens = response.json()['itens']
+        grupos = [item for item in itens if item['tipo'] == 'grupo']
+        self.assertEqual([g['total'] for g in grupos], [3])
+        self.assertAlmostEqual(grupos[0]['latitude'], -1.451, places=5)
+        self.assertEqual([item['id'] for item in itens if item['tipo'] == 'evento'], [self.sao_paulo.id])
+
+    def test_eventos_individuais_em_zoom_alto(self):
+        response = self.client.get(self.url, {'bbox': '-48.46,-1.46,-48.44,-1.44', 'zoom': 15})
+        itens = response.json()['itens']
+        self.assertEqual(sorted(item['id'] for item in itens), [e.id for e in self.hangar])
+        self.assertTrue(all(item['tipo'] == 'evento' for item in itens))
+
+    def test_tiles_em_cache_ate_a_proxima_alteracao(self):
+        params = {'bbox': '-60,-30,-40,5', 'zoom': 5}
+        self.client.get(self.url, params)
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(self.url, params)
+        self.assertFalse([q for q in consultas.captured_queries if 'agenda_' in q['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sao_paulo.latitude, self.sao_paulo.longitude = '-1.455', '-48.455'
+            self.sao_paulo.save()
+        itens = self.client.get(self.url, params).json()['itens']
+        self.assertEqual([item['total'] for item in itens], [4])
+
+    def test_area_invalida(self):
+        self.assertEqual(self.client.get(self.url, {'bbox': 'a,b', 'zoom': 5}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'bbox': '-40,-30,-60,5', 'zoom': 5}).status_code, 400)
+        # Área grande demais para o zoom
+        self.assertEqual(self.client.get(self.url, {'bbox': '-180,-80,180,80', 'zoom': 12}).status_code, 400)
+
+    def test_pagina_nao_embute_eventos(self):
+        response = self.client.get(reverse('agenda:mapa_eventos'))
+        self.assertNotContains(response, 'Hangar 0')
+        self.assertContains(response, self.url)
+
+
+class CalendarioIcsTest(TestCase):
+    """Testa os calendários .ics (oficial e pessoal)."""
+
+    def setUp(self):
+        inicio = timezone.now() + timedelta(days=1)
+        self.eventos = [
+            Event.objects.create(
+                titulo=f'Painel {i}; clima, energia', local='Belém', descricao='Linha 1\nLinha 2',
+                start_time=inicio + timedelta(hours=i), end_time=inicio + timedelta(hours=i + 1),
+            )
+            for i in range(3)
+        ]
+        self.user = User.objects.create_user(email='ics@teste.com', password='senha12345', nome='Ics')
+        UserAgenda.objects.create(user=self.user, event=self.eventos[1])
+        self.url = reverse('agenda:calendario_pessoal', args=[self.user.pk, calendario.token(self.user)])
+
+    def conteudo(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_calendario_oficial(self):
+        response = self.client.get(reverse('agenda:calendario_oficial'))
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        texto = self.conteudo(response)
+        self.assertTrue(texto.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(texto.count('BEGIN:VEVENT'), 3)
+        self.assertIn('SUMMARY:Painel 0\\; clima\\, energia\r\n', texto)
+        self.assertIn('DESCRIPTION:Linha 1\\nLinha 2', texto)
+
+    def test_feed_pessoal_com_token(self):
+        texto = self.conteudo(self.client.get(self.url))
+        self.assertEqual(texto.count('BEGIN:VEVENT'), 1)
+        self.assertIn(f'UID:evento-{self.eventos[1].pk}@', texto)
+
+        invalido = reverse('agenda:calendario_pessoal', args=[self.user.pk, 'x' * 32])
+        self.assertEqual(self.client.get(invalido).status_code, 404)
+        # Trocar a senha invalida o link
+        self.user.set_password('outra-senha-123')
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_get_condicional(self):
+        response = self.client.get(self.url)
+        etag, modificado = response['ETag'], response['Last-Modified']
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in consultas.captured_queries if 'agenda_event"."titulo' in q['sql']])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=modificado).status_code, 304)
+
+        UserAgenda.objects.create(user=self.user, event=self.eventos[2])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_linhas_longas_dobradas(self):
+        linha = calendario.dobrar('SUMMARY:' + 'ç' * 100)
+        partes = linha.split('\r\n')[:-1]
+        self.assertGreater(len(partes), 1)
+        self.assertTrue(all(len(p.encode()) <= 75 for p in partes))
+        self.assertTrue(all(p.startswith(' ') for p in partes[1:]))
+
+
+class LimpezaAgendasTest(TestCase):
+    """Testa a remoção de eventos passados fora da requisição."""
+
+    def setUp(self):
+        agora = timezone.now()
+        self.user = User.objects.create_user(email='limpeza@teste.com', password='senha12345', nome='Limpeza')
+        self.passados = [
+            Event.objects.create(
+                titulo=f'Passado {i}', local='Belém',
+                start_time=agora - timedelta(hours=11 + i), end_time=agora - timedelta(hours=10 + i),
+            )
+            for i in range(5)
+        ]
+        self.futuro = Event.objects.create(
+            titulo='Futuro', local='Belém',
+            start_time=agora + timedelta(hours=1), end_time=agora + timedelta(hours=2),
+        )
+        for evento in self.passados + [self.futuro]:
+            UserAgenda.objects.create(user=self.user, event=evento)
+
+    def test_agenda_pessoal_nao_escreve(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('agenda:agenda_pessoal'))
+        self.assertEqual([item.event for item in response.context['agenda_items']], [self.futuro])
+        self.assertFalse([q for q in consultas.captured_queries if q['sql'].startswith('DELETE')])
+        self.assertEqual(UserAgenda.objects.count(), 6)
+
+    def test_remocao_em_lotes(self):
+        from .tasks import limpar_agendas_pessoais, remover_agendas_antigas
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(remover_agendas_antigas(lote=2), 5)
+        self.assertEqual(len([q for q in consultas.captured_queries if q['sql'].startswith('DELETE')]), 3)
+        self.assertEqual(list(UserAgenda.objects.values_list('event', flat=True)), [self.futuro.id])
+        self.assertEqual(limpar_agendas_pessoais(), 0)
+
+
+class ImportacaoEventosTest(TestCase):
+    """Testa a importação em massa de eventos."""
+
+    CSV = (
+        'titulo,local,start_time,end_time,tags,latitude,longitude,descricao\n'
+        'Plenária de abertura,Hangar,2030-11-10T09:00:00-03:00,2030-11-10T11:00:00-03:00,"clima, energia",-1.45,-48.45,\n'
+        'Oficina de bioeconomia,Sala 2,2030-11-10T14:00:00-03:00,2030-11-10T16:00:00-03:00,bioeconomia,,,Oficina\n'
+        'Painel invertido,Sala 3,2030-11-10T18:00:00-03:00,2030-11-10T17:00:00-03:00,clima,,,\n'
+    )
+
+    def setUp(self):
+        cache.clear()
+
+    def importar(self, conteudo, formato='csv', **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return importacao.importar(io.BytesIO(conteudo.encode()), formato, **kwargs)
+
+    def test_csv_com_erros_por_linha(self):
+        resultado = self.importar(self.CSV)
+        self.assertEqual((resultado.criados, resultado.atualizados, resultado.total_erros), (2, 0, 1))
+        self.assertEqual(resultado.erros[0]['linha'], 4)
+        self.assertIn('end_time', resultado.erros[0]['erros'])
+
+        plenaria = Event.objects.get(titulo='Plenária de abertura')
+        self.assertEqual(plenaria.geohash, mapa.geohash(-1.45, -48.45))
+        self.assertEqual(sorted(plenaria.temas.values_list('slug', flat=True)), ['clima', 'energia'])
+        self.assertEqual(list(busca.buscar(Event.objects.all(), 'bioeconomia')), [Event.objects.get(local='Sala 2')])
+
+    def test_reimportacao_atualiza_pela_chave_natural(self):
+        self.importar(self.CSV)
+        resultado = self.importar(self.CSV.replace(',Oficina\n', ',Oficina prática\n'), lote=1)
+        self.assertEqual((resultado.criados, resultado.atualizados), (0, 2))
+        self.assertEqual(Event.objects.count(), 2)
+        self.assertEqual(Event.objects.get(local='Sala 2').descricao, 'Oficina prática')
+
+    def test_json_lido_em_blocos(self):
+        eventos = [
+            {'titulo': f'Evento {i}', 'local': 'Belém', 'start_time': '2030-11-11T09:00:00-03:00',
+             'end_time': '2030-11-11T10:00:00-03:00'}
+            for i in range(5)
+        ] + ['texto']
+        with mock.patch.object(importacao, 'BLOCO_JSON', 16):
+            resultado = self.importar(json.dumps(eventos), 'json', lote=2)
+        self.assertEqual(resultado.criados, 5)
+        self.assertEqual(resultado.erros, [{'linha': 6, 'erros': {'non_field_errors': ['Cada evento deve ser um objeto.']}}])
+
+        with self.assertRaises(importacao.ErroImportacao):
+            self.importar('[{"titulo": "incompleto"', 'json')
+
+    def test_jsonl_e_comando(self):
+        resultado = self.importar('{"titulo": "A", "local": "B", "start_time": "2030-11-11T09:00", "end_time": "2030-11-11T10:00"}\n{quebrado\n', 'jsonl')
+        self.assertEqual((resultado.criados, resultado.total_erros), (1, 1))
+        self.assertEqual(resultado.erros[0]['linha'], 2)
+        self.assertEqual(importacao.detectar_formato('programacao.ndjson'), 'jsonl')
+        with self.assertRaises(importacao.ErroImportacao):
+            importacao.detectar_formato('programacao.xlsx')
+
+
+class ConflitosAgendaTest(TestCase):
+    """Testa a detecção de conflitos de horário na agenda pessoal."""
+
+    def setUp(self):
+        cache.clear()
+        base = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+        def criar(titulo, inicio, horas):
+            return Event.objects.create(
+                titulo=titulo, local='Belém',
+                start_time=base + timedelta(hours=inicio), end_time=base + timedelta(hours=inicio + horas),
+            )
+
+        self.longo = criar('Plenária longa', 0, 8)
+        self.manha = criar('Painel da manhã', 1, 1)
+        self.tarde = criar('Painel da tarde', 9, 1)
+        self.encostado = criar('Logo após', 10, 1)
+        self.user = User.objects.create_user(email='conflitos@teste.com', password='senha12345', nome='Conflitos')
+        self.client.force_login(self.user)
+
+    def adicionar(self, evento):
+        return self.client.get(
+            reverse('agenda:add_to_agenda', args=[evento.id]), HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        ).json()
+
+    def test_estrutura_de_intervalos(self):
+        estrutura = conflitos.IntervalosAgenda([(0, 8, 1), (9, 10, 3)])
+        self.assertEqual(estrutura.conflitos(1, 2), [1])
+        self.assertEqual(estrutura.conflitos(8, 9), [])
+        self.assertEqual(estrutura.conflitos(7, 9.5), [1, 3])
+        estrutura.inserir(1, 2, 2)
+        self.assertEqual(estrutura.pares(), [(1, 2)])
+
+    def test_conflitos_ao_adicionar(self):
+        self.assertEqual(self.adicionar(self.longo)['conflitos'], [])
+        self.assertEqual([e['id'] for e in self.adicionar(self.manha)['conflitos']], [self.longo.id])
+        self.assertEqual(self.adicionar(self.tarde)['conflitos'], [])
+        # Intervalos encostados não conflitam
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.adicionar(self.encostado)['conflitos'], [])
+        # A agenda do usuário vem do cache, atualizado a cada inserção, sem nova consulta aos horários
+        self.assertFalse([q for q in consultas.captured_queries if 'FROM "agenda_useragenda" INNER JOIN' in q['sql']])
+
+    def test_insercao_simultanea_descarta_estrutura(self):
+        """Com outra inserção em andamento, a estrutura é descartada em vez de perder o evento"""
+        self.adicionar(self.longo)
+        cache.add(f'{conflitos._chave(self.user.pk)}:trava', 1)
+        UserAgenda.objects.create(user=self.user, event=self.manha)
+        self.assertIsNone(cache.get(conflitos._chave(self.user.pk)))
+        cache.delete(f'{conflitos._chave(self.user.pk)}:trava')
+        self.assertEqual(conflitos.pares_do_usuario(self.user.pk), [(self.longo, self.manha)])
+
+    def test_adicionar_fora_da_view_atualiza_estrutura(self):
+        """Um evento adicionado fora da view aparece na verificação seguinte"""
+        self.adicionar(self.longo)
+        UserAgenda.objects.create(user=self.user, event=self.manha)
+        self.assertEqual([e.id for e in conflitos.verificar(self.user.pk, self.tarde)], [])
+        self.assertEqual(conflitos.pares_do_usuario(self.user.pk), [(self.longo, self.manha)])
+
+    def test_meus_conflitos(self):
+        for evento in (self.longo, self.manha, self.tarde):
+            UserAgenda.objects.create(user=self.user, event=evento)
+        dados = self.client.get(reverse('agenda:meus_conflitos')).json()
+        self.assertEqual(dados['total'], 1)
+        self.assertEqual([e['id'] for e in dados['conflitos'][0]['eventos']], [self.longo.id, self.manha.id])
+
+        UserAgenda.objects.filter(user=self.user, event=self.manha).delete()
+        self.assertEqual(self.client.get(reverse('agenda:meus_conflitos')).json()['total'], 0)
+
+    def test_aviso_sem_ajax(self):
+        UserAgenda.objects.create(user=self.user, event=self.longo)
+        response = self.client.get(reverse('agenda:add_to_agenda', args=[self.manha.id]), follow=True)
+        self.assertContains(response, 'coincide com')
+
+
+class LembretesEventosTest(TestCase):
+    """Testa o envio em lote dos lembretes de eventos."""
+
+    def setUp(self):
+        agora = timezone.now()
+
+        def criar(titulo, horas):
+            return Event.objects.create(
+                titulo=titulo, local='Hangar',
+                start_time=agora + timedelta(hours=horas), end_time=agora + timedelta(hours=horas + 1),
+            )
+
+        self.proximo = criar('Amanhã cedo', 5)
+        self.outro = criar('Hoje à noite', 10)
+        self.distante = criar('Semana que vem', 24 * 7)
+        self.usuarios = [
+            User.objects.create_user(email=f'lembrete{i}@teste.com', password='senha12345', nome=f'U{i}')
+            for i in range(4)
+        ]
+        for user in self.usuarios:
+            for evento in (self.proximo, self.distante):
+                UserAgenda.objects.create(user=user, event=evento)
+        UserAgenda.objects.create(user=self.usuarios[0], event=self.outro)
+        self.usuarios[3].is_active = False
+        self.usuarios[3].save()
+
+    def test_envia_em_lote_sem_repetir(self):
+        with mock.patch.object(lembretes, 'despachar') as despachar:
+            with CaptureQueriesContext(connection) as consultas:
+                self.assertEqual(lembretes.enviar_lembretes(lote=2), (2, 4))
+        # Consulta dos pendentes + eventos, notificações, destinatários e registro por lote
+        self.assertLessEqual(len(consultas.captured_queries), 16)
+
+        self.assertEqual(LembreteEnviado.objects.count(), 4)
+        notificados = NotificacaoUsuario.objects.filter(notificacao__evento=self.proximo)
+        self.assertEqual(sorted(notificados.values_list('usuario_id', flat=True)), [u.id for u in self.usuarios[:3]])
+        self.assertTrue(Notificacao.objects.filter(evento=self.outro, titulo='Lembrete de Evento: Hoje à noite').exists())
+        usuarios_push = sorted(u for chamada in despachar.call_args_list for u in chamada.args[1])
+        self.assertEqual(usuarios_push, sorted([u.id for u in self.usuarios[:3]] + [self.usuarios[0].id]))
+
+        # Segunda execução: nada pendente
+        with mock.patch.object(lembretes, 'despachar') as despachar:
+            self.assertEqual(lembretes.enviar_lembretes(), (0, 0))
+        despachar.assert_not_called()
+
+    def test_novo_participante_recebe_depois(self):
+        with mock.patch.object(lembretes, 'despachar'):
+            lembretes.enviar_lembretes()
+            novo = User.objects.create_user(email='novo@teste.com', password='senha12345', nome='Novo')
+            UserAgenda.objects.create(user=novo, event=self.proximo)
+            self.assertEqual(list(lembretes.pendentes()), [(self.proximo.id, novo.id)])
+            self.assertEqual(lembretes.enviar_lembretes(), (1, 1))
 
-# Create your tests here.
+    def test_execucoes_simultaneas_nao_repetem(self):
+        """Pares reservados por outra execução não são notificados de novo"""
+        pares = list(lembretes.pendentes())
+        LembreteEnviado.objects.create(evento=self.proximo, usuario=self.usuarios[0])
+        with mock.patch.object(lembretes, 'despachar') as despachar:
+            self.assertEqual(lembretes.gravar_lote(pares), 3)
+        self.assertFalse(NotificacaoUsuario.objects.filter(usuario=self.usuarios[0], notificacao__evento=self.proximo).exists())
+        usuarios_push = sorted(u for chamada in despachar.call_args_list for u in chamada.args[1])
+        self.assertEqual(usuarios_push, sorted([u.id for u in self.usuarios[1:3]] + [self.usuarios[0].id]))
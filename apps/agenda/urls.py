@@ -5,12 +5,16 @@ app_name = 'agenda'
 urlpatterns = [
     path('', views.agenda_oficial, name='agenda_oficial'),
     path('minha_agenda/', views.agenda_pessoal, name='agenda_pessoal'),
+    path('minha_agenda/conflitos/', views.meus_conflitos, name='meus_conflitos'),
     path('add/<int:event_id>/', views.add_to_agenda, name='add_to_agenda'),
     # Adicionando a nova URL para remover eventos
     path('remove/<int:event_id>/', views.remove_from_agenda, name='remove_from_agenda'),
     # URL para detalhes do evento
     path('evento/<int:event_id>/', views.detalhes_evento, name='detalhes_evento'),
     path('mapa/', views.mapa_eventos, name='mapa_eventos'),
+    path('mapa/api/', views.mapa_api, name='mapa_api'),
+    path('calendario.ics', views.calendario_oficial, name='calendario_oficial'),
+    path('calendario/<int:user_id>/<str:token>.ics', views.calendario_pessoal, name='calendario_pessoal'),
 ]
 
 
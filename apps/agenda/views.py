@@ -1,12 +1,19 @@
 # apps/agenda/views.py
 
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from .models import Event, UserAgenda
+from .models import Event, UserAgenda, inicio_minimo_ativo
+from apps.core import paginacao
+from . import busca, cache_agenda, calendario, conflitos, mapa, tags
 import json
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.utils.text import slugify
 from django.core.serializers.json import DjangoJSONEncoder
 
 # -----------------------------------------------------------------------------
@@ -16,7 +23,7 @@ from django.core.serializers.json import DjangoJSONEncoder
 def agenda_oficial(request):
     """
     Exibe a lista de todos os eventos oficiais com paginação e filtros.
-    Mostra 15 eventos por página.
+    Mostra 15 eventos por página, navegando por cursor (``?cursor=``).
     """
     # Obtém os parâmetros de busca
     search_query = request.GET.get('search', '')
@@ -25,53 +32,49 @@ def agenda_oficial(request):
     # Filtra os eventos
     eventos_list = Event.objects.all().order_by('start_time')
     
-    # Aplica filtro de busca no título e descrição
+    # Busca textual em título, descrição, palestrante e local, por relevância
     if search_query:
-        from django.db.models import Q
-        eventos_list = eventos_list.filter(
-            Q(titulo__icontains=search_query) | 
-            Q(descricao__icontains=search_query) |
-            Q(palestrante__icontains=search_query) |
-            Q(local__icontains=search_query)
-        )
+        eventos_list = busca.buscar(eventos_list, search_query)
     
-    # Aplica filtro de tag
+    # Aplica filtro de tema (junção indexada com Tag)
     if tag_filter:
-        eventos_list = eventos_list.filter(tags__icontains=tag_filter)
+        tag_filter = slugify(tag_filter)
+        eventos_list = tags.filtrar(eventos_list, tag_filter)
     
-    # Configura a paginação com 15 itens por página
-    paginator = Paginator(eventos_list, 15)
-    page = request.GET.get('page')
+    # Página com 15 eventos por cursor (keyset em start_time, id); a parte
+    # comum a todos os visitantes vem do cache versionado da agenda
+    ordem = ['start_time', 'id']
+    if search_query:
+        ordem = ['relevancia_busca'] + ordem
+    cursor = request.GET.get('cursor')
+    eventos = cache_agenda.pagina(eventos_list, ordem, cursor, 15, search_query, tag_filter)
+    total_eventos = cache_agenda.total(eventos_list, search_query, tag_filter)
     
-    try:
-        eventos = paginator.page(page)
-    except PageNotAnInteger:
-        eventos = paginator.page(1)
-    except EmptyPage:
-        eventos = paginator.page(paginator.num_pages)
+    # Parâmetros dos links de navegação (filtros, sem o cursor)
+    filtros_url = request.GET.copy()
+    for parametro in ('cursor', 'page'):
+        filtros_url.pop(parametro, None)
     
-    # Obtém a lista de eventos na agenda do usuário
+    # Marcações do usuário aplicadas sobre a página em cache
     user_events = []
     if request.user.is_authenticated:
         user_events = list(UserAgenda.objects.filter(
             user=request.user, 
-            event__in=eventos.object_list
+            event_id__in=[evento.id for evento in eventos]
         ).values_list('event_id', flat=True))
     
-    # Obtém todas as tags únicas para o filtro
-    all_tags = Event.objects.exclude(tags__isnull=True).exclude(tags__exact='').values_list('tags', flat=True).distinct()
-    unique_tags = set()
-    for tags in all_tags:
-        if tags:  # Verifica se tags não está vazio
-            # Divide as tags por vírgula e adiciona ao conjunto
-            unique_tags.update(tag.strip() for tag in tags.split(','))
+    # Temas com a contagem de eventos (facetas em cache)
+    all_tags = tags.facetas()
     
     context = {
         'eventos': eventos,
         'user_events': user_events,
         'search_query': search_query,
         'tag_filter': tag_filter,
-        'all_tags': sorted(unique_tags)  # Tags únicas ordenadas
+        'all_tags': all_tags,
+        'total_eventos': total_eventos,
+        'filtros_url': filtros_url.urlencode(),
+        'cursor_ultima': paginacao.ultima_pagina() if eventos.has_next else None,
     }
     return render(request, 'agenda/agenda_oficial.html', context)
 
@@ -82,23 +85,20 @@ from django.utils import timezone
 def agenda_pessoal(request):
     """
     Exibe a agenda pessoal do usuário logado.
-    Remove automaticamente eventos que já passaram mais de 10 horas do seu início.
+    Eventos que começaram há mais de 10 horas não são exibidos; a remoção
+    deles fica com a tarefa ``limpar_agendas_pessoais`` (apps/agenda/tasks.py).
     """
-    # Remove eventos antigos (mais de 10 horas do início)
-    ten_hours_ago = timezone.now() - timedelta(hours=10)
-    UserAgenda.objects.filter(
-        user=request.user,
-        event__start_time__lt=ten_hours_ago
-    ).delete()
-    
     # Get the user's agenda items, ordered by event start time
     agenda_items = UserAgenda.objects.filter(
-        user=request.user
+        user=request.user,
+        event__start_time__gte=inicio_minimo_ativo()
     ).select_related('event').order_by('event__start_time')
     
+    feed = reverse('agenda:calendario_pessoal', args=[request.user.pk, calendario.token(request.user)])
     context = {
         'agenda_items': agenda_items,
-        'title': 'Minha Agenda Pessoal'
+        'title': 'Minha Agenda Pessoal',
+        'calendario_url': request.build_absolute_uri(feed),
     }
     return render(request, 'agenda/agenda_pessoal.html', context)
 
@@ -109,25 +109,54 @@ def agenda_pessoal(request):
 @login_required
 def add_to_agenda(request, event_id):
     """
-    Adiciona um evento à agenda pessoal do usuário.
+    Adiciona um evento à agenda pessoal do usuário, avisando se o horário
+    coincide com outros eventos já adicionados.
     """
     evento = get_object_or_404(Event, pk=event_id)
     
     # Verifica se o evento já está na agenda do usuário
     already_added = UserAgenda.objects.filter(user=request.user, event=evento).exists()
     
+    conflitantes = []
     if not already_added:
+        conflitantes = conflitos.verificar(request.user.pk, evento)
         UserAgenda.objects.create(user=request.user, event=evento)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
             'status': 'success',
             'message': 'Evento adicionado à sua agenda!',
-            'already_added': already_added
+            'already_added': already_added,
+            'conflitos': [_resumo_evento(e) for e in conflitantes],
         })
     
+    if conflitantes:
+        titulos = ', '.join(f'"{e.titulo}"' for e in conflitantes)
+        messages.warning(request, f'"{evento.titulo}" coincide com {titulos} na sua agenda.')
     return redirect('agenda:agenda_pessoal')
 
+
+def _resumo_evento(evento):
+    return {
+        'id': evento.id,
+        'titulo': evento.titulo,
+        'local': evento.local,
+        'start_time': evento.start_time.isoformat(),
+        'end_time': evento.end_time.isoformat(),
+    }
+
+
+@login_required
+def meus_conflitos(request):
+    """
+    Pares de eventos da agenda pessoal com horários sobrepostos.
+    """
+    pares = conflitos.pares_do_usuario(request.user.pk)
+    return JsonResponse({
+        'total': len(pares),
+        'conflitos': [{'eventos': [_resumo_evento(a), _resumo_evento(b)]} for a, b in pares],
+    })
+
 @login_required
 def remove_from_agenda(request, event_id):
     """
@@ -143,34 +172,68 @@ def remove_from_agenda(request, event_id):
 
 def mapa_eventos(request):
     """
-    Exibe o mapa com todos os eventos que possuem coordenadas.
+    Exibe o mapa de eventos. Os pinos são carregados por ``mapa_api`` conforme
+    a área visível, em vez de todos os eventos virem embutidos na página.
     """
-    # Filtra eventos com coordenadas válidas
-    eventos = Event.objects.exclude(latitude__isnull=True).exclude(longitude__isnull=True)
-    
-    # Formata os dados dos eventos para o mapa
-    eventos_data = []
-    for evento in eventos:
-        # Formata a data e hora de forma mais legível
-        data_formatada = evento.start_time.strftime('%d/%m/%Y') if evento.start_time else ''
-        hora_formatada = evento.start_time.strftime('%H:%M') if evento.start_time else ''
-        
-        eventos_data.append({
-            "titulo": evento.titulo,
-            "data": data_formatada,
-            "hora": hora_formatada,
-            # Converte Decimal para float para serialização JSON
-            "latitude": float(evento.latitude) if evento.latitude is not None else None,
-            "longitude": float(evento.longitude) if evento.longitude is not None else None,
-            "id": evento.id
-        })
-
     context = {
-        'eventos_json': json.dumps(list(eventos_data), cls=DjangoJSONEncoder),
         'google_maps_api_key': settings.GOOGLE_MAPS_API_KEY
     }
     return render(request, 'agenda/mapa_eventos.html', context)
 
+
+def mapa_api(request):
+    """
+    Eventos e grupos de eventos dentro de ``bbox=oeste,sul,leste,norte`` no
+    ``zoom`` informado (veja apps/agenda/mapa.py).
+    """
+    try:
+        area, zoom = mapa.ler_area(request.GET.get('bbox'), request.GET.get('zoom'))
+        itens = mapa.itens_da_area(area, zoom)
+    except mapa.AreaInvalida as e:
+        return JsonResponse({'erro': str(e)}, status=400)
+    return JsonResponse({'zoom': zoom, 'itens': itens})
+
+# -----------------------------------------------------------------------------
+# Calendário (.ics)
+# -----------------------------------------------------------------------------
+
+def _resposta_calendario(request, eventos, versao, nome, arquivo):
+    """Responde 304 se o cliente já tem a versão atual; senão gera o .ics em streaming."""
+    etag, ultima = versao
+    etag = quote_etag(etag)
+    ultima = int(ultima.timestamp()) if ultima else None
+    response = get_conditional_response(request, etag=etag, last_modified=ultima)
+    if response is None:
+        response = StreamingHttpResponse(
+            calendario.gerar(eventos, nome, request.get_host()),
+            content_type='text/calendar; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'inline; filename="{arquivo}"'
+    response['ETag'] = etag
+    if ultima:
+        response['Last-Modified'] = http_date(ultima)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def calendario_oficial(request):
+    """Agenda oficial completa em iCalendar."""
+    eventos = Event.objects.all()
+    return _resposta_calendario(
+        request, eventos, calendario.versao(eventos), 'Agenda Oficial COP30', 'agenda-cop30.ics'
+    )
+
+
+def calendario_pessoal(request, user_id, token):
+    """Agenda pessoal em iCalendar, acessada pelo link com token (sem login)."""
+    usuario = get_object_or_404(get_user_model(), pk=user_id, is_active=True)
+    if not calendario.token_valido(usuario, token):
+        raise Http404
+    return _resposta_calendario(
+        request, calendario.eventos_do_usuario(usuario), calendario.versao_usuario(usuario),
+        'Minha Agenda COP30', 'minha-agenda-cop30.ics'
+    )
+
 # -----------------------------------------------------------------------------
 # View de Detalhes do Evento (com mapa integrado)
 # -----------------------------------------------------------------------------
@@ -0,0 +1,178 @@
+# apps/core/paginacao.py
+"""
+Paginação por cursor (keyset).
+
+Em vez de ``COUNT(*)`` + ``OFFSET``, cada página filtra a partir da última
+linha da página anterior pela própria ordenação (por exemplo
+``(start_time, id) > (t, 42)``), de modo que a página 500 custa o mesmo que a
+primeira e usa o índice da ordenação.
+
+O cursor é opaco para o cliente: os valores da ordenação assinados com
+``django.core.signing`` (um cursor adulterado é rejeitado). A ordenação
+precisa terminar em uma coluna única (normalmente ``id``) para ser total.
+
+O total de itens não é calculado por página; quem precisar dele usa
+``contagem_aproximada``, que guarda o ``COUNT`` no cache por alguns segundos.
+"""
+import datetime
+import hashlib
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+
+SALT = 'apps.core.paginacao'
+PROXIMA = 'p'
+ANTERIOR = 'a'
+
+DEFAULT_TAMANHO_MAXIMO = 100
+DEFAULT_CONTAGEM_TIMEOUT = 60
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+class PaginaCursor:
+    """Página de resultados com os cursores da página seguinte e da anterior."""
+
+    def __init__(self, itens, proximo=None, anterior=None):
+        self.itens = itens
+        self.proximo = proximo
+        self.anterior = anterior
+
+    @property
+    def has_next(self):
+        return self.proximo is not None
+
+    @property
+    def has_previous(self):
+        return self.anterior is not None
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def __len__(self):
+        return len(self.itens)
+
+    def __getitem__(self, indice):
+        return self.itens[indice]
+
+
+def tamanho_pagina(valor, padrao, maximo=None):
+    """Tamanho pedido pelo cliente, limitado a ``PAGINACAO_TAMANHO_MAXIMO``."""
+    if maximo is None:
+        maximo = getattr(settings, 'PAGINACAO_TAMANHO_MAXIMO', DEFAULT_TAMANHO_MAXIMO)
+    try:
+        tamanho = int(valor)
+    except (TypeError, ValueError):
+        tamanho = padrao
+    return max(1, min(tamanho, maximo))
+
+
+def codificar_cursor(valores, direcao=PROXIMA):
+    return signing.dumps({'v': valores, 'd': direcao}, salt=SALT, compress=True)
+
+
+def ultima_pagina():
+    """Cursor da última página (percorre a ordenação de trás para frente)."""
+    return codificar_cursor(None, ANTERIOR)
+
+
+def decodificar_cursor(cursor):
+    """Retorna ``(valores, direcao)``; levanta ``CursorInvalido``."""
+    try:
+        dados = signing.loads(cursor, salt=SALT)
+    except signing.BadSignature:
+        raise CursorInvalido('Cursor inválido')
+    if not isinstance(dados, dict) or dados.get('d') not in (PROXIMA, ANTERIOR):
+        raise CursorInvalido('Cursor inválido')
+    return dados.get('v'), dados['d']
+
+
+def _campos(ordem):
+    return [(campo.lstrip('-'), campo.startswith('-')) for campo in ordem]
+
+
+def _converter(modelo, campo, valor):
+    """Converte o valor lido do cursor (JSON) para o tipo do campo."""
+    try:
+        return modelo._meta.get_field(campo).to_python(valor)
+    except FieldDoesNotExist:
+        return valor
+
+
+def _filtro_apos(campos, valores, para_tras):
+    """``(a, b) > (va, vb)`` expandido em ``a > va OR (a = va AND b > vb)``."""
+    filtro = Q()
+    iguais = Q()
+    for (campo, decrescente), valor in zip(campos, valores):
+        maior = decrescente == para_tras
+        filtro |= iguais & Q(**{f'{campo}__{"gt" if maior else "lt"}': valor})
+        iguais &= Q(**{campo: valor})
+    return filtro
+
+
+def _serializar(valor):
+    # isoformat mantém os microssegundos, necessários para a comparação exata
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, (Decimal, uuid.UUID)):
+        return str(valor)
+    return valor
+
+
+def _valores(item, campos):
+    return [_serializar(getattr(item, campo)) for campo, _ in campos]
+
+
+def paginar(queryset, ordem, cursor=None, tamanho=20):
+    """
+    Retorna a ``PaginaCursor`` de ``queryset`` ordenado por ``ordem`` (lista de
+    campos, ``-`` para decrescente) a partir de ``cursor``. Levanta
+    ``CursorInvalido`` se o cursor não puder ser lido.
+    """
+    campos = _campos(ordem)
+    valores, direcao = (None, PROXIMA)
+    if cursor:
+        valores, direcao = decodificar_cursor(cursor)
+        if valores is not None:
+            if not isinstance(valores, list) or len(valores) != len(campos):
+                raise CursorInvalido('Cursor inválido')
+            valores = [_converter(queryset.model, campo, valor) for (campo, _), valor in zip(campos, valores)]
+
+    para_tras = direcao == ANTERIOR
+    if valores is not None:
+        queryset = queryset.filter(_filtro_apos(campos, valores, para_tras))
+    if para_tras:
+        queryset = queryset.order_by(*[campo if decrescente else f'-{campo}' for campo, decrescente in campos])
+    else:
+        queryset = queryset.order_by(*ordem)
+
+    itens = list(queryset[:tamanho + 1])
+    ha_mais = len(itens) > tamanho
+    itens = itens[:tamanho]
+    if para_tras:
+        itens.reverse()
+    if not itens:
+        return PaginaCursor(itens)
+
+    primeiro = codificar_cursor(_valores(itens[0], campos), ANTERIOR)
+    ultimo = codificar_cursor(_valores(itens[-1], campos), PROXIMA)
+    if para_tras:
+        # Chegou-se aqui vindo de uma página posterior (exceto pela última página)
+        return PaginaCursor(itens, ultimo if valores is not None else None, primeiro if ha_mais else None)
+    return PaginaCursor(itens, ultimo if ha_mais else None, primeiro if valores is not None else None)
+
+
+def contagem_aproximada(queryset, timeout=None):
+    """``COUNT`` do queryset guardado no cache por ``PAGINACAO_CONTAGEM_TIMEOUT`` segundos."""
+    if timeout is None:
+        timeout = getattr(settings, 'PAGINACAO_CONTAGEM_TIMEOUT', DEFAULT_CONTAGEM_TIMEOUT)
+    sql, params = queryset.query.sql_with_params()
+    chave = 'paginacao:contagem:' + hashlib.sha1(f'{sql}|{params!r}'.encode()).hexdigest()
+    return cache.get_or_set(chave, queryset.count, timeout)
@@ -0,0 +1,165 @@
+# apps/core/perfilamento.py
+"""
+Medições por requisição usadas pelo ``PerfilamentoMiddleware``.
+
+Para cada requisição são medidos o número de consultas SQL, o tempo gasto no
+banco, o tempo de renderização dos templates e o tempo total. As medições
+ficam em um buffer circular em memória (``PERFILAMENTO_TAMANHO`` requisições
+mais recentes, por processo) e são resumidas por view no relatório do painel
+administrativo (``admin_personalizado:perfilamento``).
+
+As consultas são medidas com ``connection.execute_wrapper``, o que funciona
+com ``DEBUG = False``. O tempo de template é medido envolvendo
+``Template.render`` do backend de templates do Django, instalado apenas
+quando o middleware está ativo.
+"""
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+
+from django.conf import settings
+from django.utils import timezone
+
+DEFAULT_TAMANHO = 500
+
+_medicao_atual = ContextVar('perfilamento_medicao', default=None)
+
+
+@dataclass
+class Medicao:
+    """Medições de uma requisição."""
+    metodo: str
+    caminho: str
+    view: str = ''
+    status: int = 0
+    consultas: int = 0
+    tempo_db: float = 0.0         # ms
+    tempo_template: float = 0.0   # ms
+    tempo_total: float = 0.0      # ms
+    quando: object = field(default_factory=timezone.now)
+
+    def server_timing(self):
+        """Valor do cabeçalho ``Server-Timing``."""
+        return ', '.join([
+            f'db;dur={self.tempo_db:.1f};desc="{self.consultas} consultas"',
+            f'tpl;dur={self.tempo_template:.1f}',
+            f'total;dur={self.tempo_total:.1f}',
+        ])
+
+
+class MedidorConsultas:
+    """``execute_wrapper`` que soma as consultas na medição corrente."""
+
+    def __call__(self, execute, sql, params, many, context):
+        medicao = _medicao_atual.get()
+        if medicao is None:
+            return execute(sql, params, many, context)
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            medicao.consultas += 1
+            medicao.tempo_db += (time.perf_counter() - inicio) * 1000
+
+
+def iniciar(request):
+    medicao = Medicao(metodo=request.method, caminho=request.path)
+    return medicao, _medicao_atual.set(medicao)
+
+
+def finalizar(token):
+    _medicao_atual.reset(token)
+
+
+_template_instrumentado = False
+_template_lock = threading.Lock()
+
+
+def instrumentar_templates():
+    """Envolve ``Template.render`` do backend do Django para medir o tempo de renderização."""
+    global _template_instrumentado
+    if _template_instrumentado:
+        return
+    with _template_lock:
+        if _template_instrumentado:
+            return
+        from django.template.backends.django import Template
+
+        render_original = Template.render
+
+        def render(self, context=None, request=None):
+            medicao = _medicao_atual.get()
+            if medicao is None:
+                return render_original(self, context, request)
+            inicio = time.perf_counter()
+            try:
+                return render_original(self, context, request)
+            finally:
+                medicao.tempo_template += (time.perf_counter() - inicio) * 1000
+
+        Template.render = render
+        _template_instrumentado = True
+
+
+class BufferMedicoes:
+    """Buffer circular com as medições mais recentes do processo."""
+
+    def __init__(self, tamanho=DEFAULT_TAMANHO):
+        self._itens = deque(maxlen=tamanho)
+        self._lock = threading.Lock()
+
+    def adicionar(self, medicao):
+        with self._lock:
+            self._itens.append(medicao)
+
+    def medicoes(self):
+        with self._lock:
+            return list(self._itens)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def resumo_por_view(self):
+        """
+        Agrega as medições por view, ordenadas pelo maior número médio de
+        consultas (os candidatos a N+1 aparecem primeiro).
+        """
+        grupos = {}
+        for medicao in self.medicoes():
+            grupos.setdefault(medicao.view or medicao.caminho, []).append(medicao)
+
+        resumo = []
+        for view, medicoes in grupos.items():
+            n = len(medicoes)
+            resumo.append({
+                'view': view,
+                'requisicoes': n,
+                'consultas_media': round(sum(m.consultas for m in medicoes) / n, 1),
+                'consultas_max': max(m.consultas for m in medicoes),
+                'tempo_db_medio': round(sum(m.tempo_db for m in medicoes) / n, 1),
+                'tempo_template_medio': round(sum(m.tempo_template for m in medicoes) / n, 1),
+                'tempo_total_medio': round(sum(m.tempo_total for m in medicoes) / n, 1),
+                'tempo_total_max': round(max(m.tempo_total for m in medicoes), 1),
+            })
+        resumo.sort(key=lambda item: (-item['consultas_media'], -item['tempo_total_medio']))
+        return resumo
+
+    def recentes(self, limite=50):
+        return [asdict(m) for m in reversed(self.medicoes()[-limite:])]
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Retorna o buffer de medições do processo."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = BufferMedicoes(getattr(settings, 'PERFILAMENTO_TAMANHO', DEFAULT_TAMANHO))
+    return _buffer
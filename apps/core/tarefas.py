@@ -0,0 +1,86 @@
+# apps/core/tarefas.py
+"""
+Execução em segundo plano de efeitos colaterais (notificações, push...).
+
+``despachar(tarefa, *args)`` recebe uma tarefa Celery (``@shared_task``) e a
+executa conforme ``settings.TAREFAS_MODO``:
+
+- ``auto`` (padrão): Celery se ``CELERY_BROKER_URL`` estiver configurado,
+  senão o pool de threads;
+- ``celery``: ``tarefa.delay(...)``; se o broker estiver fora do ar, cai para
+  o pool de threads;
+- ``thread``: pool de threads do processo (``TAREFAS_WORKERS`` threads);
+- ``sincrono``: executa na hora, na própria requisição.
+
+O envio acontece em ``transaction.on_commit``: a tarefa nunca enxerga dados
+de uma transação que ainda pode ser desfeita.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+MODO_AUTO = 'auto'
+MODO_CELERY = 'celery'
+MODO_THREAD = 'thread'
+MODO_SINCRONO = 'sincrono'
+
+DEFAULT_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def modo_tarefas():
+    modo = getattr(settings, 'TAREFAS_MODO', MODO_AUTO)
+    if modo == MODO_AUTO:
+        return MODO_CELERY if getattr(settings, 'CELERY_BROKER_URL', '') else MODO_THREAD
+    return modo
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'TAREFAS_WORKERS', DEFAULT_WORKERS),
+                    thread_name_prefix='tarefas',
+                )
+    return _executor
+
+
+def _executar(tarefa, args, kwargs):
+    try:
+        tarefa(*args, **kwargs)
+    except Exception as e:
+        logger.error(f"Erro na tarefa {getattr(tarefa, 'name', tarefa)}: {e}")
+    finally:
+        # Cada thread do pool tem a própria conexão; não a mantém aberta
+        connection.close()
+
+
+def _enviar(tarefa, args, kwargs):
+    modo = modo_tarefas()
+    if modo == MODO_SINCRONO:
+        try:
+            tarefa(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Erro na tarefa {getattr(tarefa, 'name', tarefa)}: {e}")
+        return
+    if modo == MODO_CELERY:
+        try:
+            tarefa.delay(*args, **kwargs)
+            return
+        except Exception as e:
+            logger.warning(f"Broker indisponível, executando {getattr(tarefa, 'name', tarefa)} localmente: {e}")
+    _get_executor().submit(_executar, tarefa, args, kwargs)
+
+
+def despachar(tarefa, *args, **kwargs):
+    """Agenda a tarefa para depois do commit da transação atual."""
+    transaction.on_commit(lambda: _enviar(tarefa, args, kwargs))
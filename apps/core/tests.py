@@ -1,3 +1,192 @@
-from django.test import TestCase
+import re
+import unittest
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.agenda.models import Event, UserAgenda
+from apps.core.paginacao import CursorInvalido, paginar, tamanho_pagina, ultima_pagina
+from apps.notificacoes.models import Aviso, Notificacao
+from apps.passefacil.indice import get_indice
+from apps.passefacil.models import PasseFacil, ValidacaoQRCode
+
+User = get_user_model()
+
+
+def tabelas_varridas(sql):
+    """
+    Executa ``EXPLAIN QUERY PLAN`` e retorna as tabelas lidas por varredura
+    completa (``SCAN tabela`` sem índice). Aliases dos subselects (``U0``)
+    são traduzidos para o nome da tabela.
+    """
+    aliases = dict((alias, tabela) for tabela, alias in re.findall(r'"(\w+)" (U\d+)', sql))
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        linhas = cursor.fetchall()
+
+    varridas = set()
+    for linha in linhas:
+        detalhe = linha[-1]
+        if detalhe.startswith('SCAN ') and ' USING ' not in detalhe:
+            nome = detalhe.split()[1]
+            varridas.add(aliases.get(nome, nome))
+    return varridas
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN é específico do SQLite')
+@override_settings(PASSEFACIL_AUDITORIA_ASSINCRONA=False, TAREFAS_MODO='sincrono')
+class PlanoDeConsultaTest(TestCase):
+    """
+    Garante que as consultas das views mais acessadas usam índices.
+    Cada teste executa a view, captura as consultas e falha se alguma das
+    tabelas quentes for lida por varredura completa.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='admin@teste.com', password='senha12345', nome='Admin')
+        cls.user = User.objects.create_user(email='participante@teste.com', password='senha12345', nome='Participante')
+        cls.passe = PasseFacil.objects.create(user=cls.user)
+
+        inicio = timezone.now() + timedelta(days=1)
+        eventos = Event.objects.bulk_create([
+            Event(
+                titulo=f'Evento {i}', local='Belém', tags='clima, energia' if i % 2 else 'oceanos',
+                start_time=inicio + timedelta(hours=i), end_time=inicio + timedelta(hours=i + 1),
+            )
+            for i in range(30)
+        ])
+        UserAgenda.objects.create(user=cls.user, event=eventos[0])
+
+        notificacao = Notificacao.objects.create(titulo='Aviso', mensagem='Mensagem', criado_por=cls.admin)
+        notificacao.usuarios.add(cls.user)
+        Aviso.objects.create(titulo='Aviso', mensagem='Mensagem', criado_por=cls.admin)
+        ValidacaoQRCode.objects.create(passe_facil=cls.passe, codigo=str(cls.passe.codigo), valido=True)
+
+    def assertSemVarreduraCompleta(self, consultas, tabelas):
+        for consulta in consultas.captured_queries:
+            sql = consulta['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            varridas = tabelas_varridas(sql) & set(tabelas)
+            self.assertFalse(varridas, f'Varredura completa de {sorted(varridas)} em:\n{sql}')
+
+    def test_validacao_do_qr_code(self):
+        get_indice().limpar()
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('passefacil:api_validar_qr_code'), {'codigo': self.passe.codigo.hex})
+        self.assertTrue(response.json()['valido'])
+        self.assertSemVarreduraCompleta(consultas, ['passefacil_passefacil'])
+
+    def test_agenda_oficial(self):
+        cache.clear()
+        cursor = self.client.get(reverse('agenda:agenda_oficial')).context['eventos'].proximo
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('agenda:agenda_oficial'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertSemVarreduraCompleta(consultas, ['agenda_event'])
+
+    def test_pagina_inicial_com_avisos(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Aviso')
+        self.assertSemVarreduraCompleta(consultas, ['notificacoes_aviso'])
+
+    def test_agenda_pessoal(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('agenda:agenda_pessoal'))
+        self.assertEqual(response.status_code, 200)
+        self.assertSemVarreduraCompleta(consultas, ['agenda_event', 'agenda_useragenda'])
+
+    def test_notificacoes_do_usuario(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('notificacoes:listar'))
+            self.client.post(reverse('notificacoes:marcar_todas_lidas'))
+        self.assertEqual(response.json()['total'], 1)
+        self.assertSemVarreduraCompleta(
+            consultas, ['notificacoes_notificacao', 'notificacoes_notificacaousuario']
+        )
+
+    def test_painel_do_passe_facil(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('admin_personalizado:passefacil_admin'))
+        self.assertEqual(response.status_code, 200)
+        # A lista de passes é exibida inteira; as validações não podem ser varridas
+        self.assertSemVarreduraCompleta(
+            consultas, ['passefacil_validacaoqrcode', 'passefacil_contadorvalidacoes']
+        )
+
+
+class PaginacaoCursorTest(TestCase):
+    """Testa a paginação por cursor (keyset)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        inicio = timezone.now().replace(microsecond=123456) + timedelta(days=1)
+        # Pares de eventos no mesmo horário: o id desempata a ordenação
+        cls.eventos = [
+            Event.objects.create(
+                titulo=f'Evento {i}', local='Belém',
+                start_time=inicio + timedelta(hours=i // 2), end_time=inicio + timedelta(hours=i // 2 + 1),
+            )
+            for i in range(7)
+        ]
+
+    def test_percorre_em_ambas_as_direcoes(self):
+        ordem = ['start_time', 'id']
+        vistos = []
+        cursor = None
+        while True:
+            pagina = paginar(Event.objects.all(), ordem, cursor, 3)
+            vistos.extend(pagina)
+            if not pagina.has_next:
+                break
+            cursor = pagina.proximo
+        self.assertEqual(vistos, self.eventos)
+
+        ultima = paginar(Event.objects.all(), ordem, ultima_pagina(), 3)
+        self.assertEqual(list(ultima), self.eventos[4:])
+        anterior = paginar(Event.objects.all(), ordem, ultima.anterior, 3)
+        self.assertEqual(list(anterior), self.eventos[1:4])
+        self.assertEqual(list(paginar(Event.objects.all(), ordem, anterior.proximo, 3)), self.eventos[4:])
+
+    def test_pagina_profunda_sem_offset_nem_count(self):
+        cursor = paginar(Event.objects.all(), ['start_time', 'id'], None, 5).proximo
+        with CaptureQueriesContext(connection) as consultas:
+            pagina = paginar(Event.objects.all(), ['start_time', 'id'], cursor, 5)
+        self.assertEqual(list(pagina), self.eventos[5:])
+        sql = consultas.captured_queries[0]['sql']
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT', sql)
+
+    def test_cursor_adulterado_e_tamanho_maximo(self):
+        with self.assertRaises(CursorInvalido):
+            paginar(Event.objects.all(), ['id'], 'abc', 3)
+        self.assertEqual(tamanho_pagina('100000', 10), 100)
+        self.assertEqual(tamanho_pagina('x', 10), 10)
+
+    def test_api_de_eventos(self):
+        admin = User.objects.create_superuser(email='admin@teste.com', password='senha12345', nome='Admin')
+        self.client.force_login(admin)
+        url = reverse('admin_personalizado:evento_listar')
+
+        dados = self.client.get(url, {'per_page': 4, 'contar': 1}).json()
+        self.assertEqual(len(dados['results']), 4)
+        self.assertEqual(dados['count'], 7)
+        dados = self.client.get(url, {'per_page': 4, 'cursor': dados['next_cursor']}).json()
+        self.assertEqual([e['id'] for e in dados['results']], [e.id for e in self.eventos[4:]])
+        self.assertIsNone(dados['next_cursor'])
+
+        self.assertEqual(self.client.get(url, {'cursor': 'adulterado'}).status_code, 400)
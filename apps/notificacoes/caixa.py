@@ -0,0 +1,74 @@
+# apps/notificacoes/caixa.py
+"""
+Caixa de notificações de cada usuário.
+
+Há dois fluxos:
+
+- notificações pessoais, com uma linha ``NotificacaoUsuario`` por destinatário
+  (lembretes de eventos, Passe Fácil...);
+- difusões (``audiencia`` = todos ou um papel), gravadas uma única vez. A
+  linha ``NotificacaoUsuario`` de uma difusão só existe depois que o usuário a
+  lê; sem ela, a difusão conta como não lida.
+
+Enviar uma difusão custa uma escrita, qualquer que seja o público; a
+listagem junta os dois fluxos já ordenados pela data de criação.
+"""
+import heapq
+
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import AUDIENCIA_PESSOAL, Notificacao, NotificacaoUsuario
+
+
+def serializar(notificacao, lida):
+    return {
+        'id': notificacao.id,
+        'titulo': notificacao.titulo,
+        'mensagem': notificacao.mensagem,
+        'tipo': notificacao.tipo,
+        'lida': lida,
+        'tempo': 'agora mesmo',
+        'criada_em': notificacao.criada_em.isoformat(),
+        'evento_id': notificacao.evento_id,
+    }
+
+
+def difusoes_com_leitura(usuario):
+    """Difusões do usuário anotadas com ``lida``."""
+    return Notificacao.difusoes_para(usuario).annotate(
+        lida=Exists(NotificacaoUsuario.objects.filter(
+            notificacao=OuterRef('pk'), usuario=usuario, lida=True
+        ))
+    )
+
+
+def recentes(usuario, desde):
+    """Notificações pessoais e difusões criadas a partir de ``desde``, da mais nova para a mais antiga."""
+    pessoais = (
+        (rel.notificacao, rel.lida) for rel in
+        NotificacaoUsuario.objects.filter(
+            usuario=usuario,
+            notificacao__criada_em__gte=desde,
+            notificacao__audiencia=AUDIENCIA_PESSOAL,
+        ).select_related('notificacao').order_by('-notificacao__criada_em', '-notificacao_id')
+    )
+    difusoes = (
+        (notificacao, notificacao.lida) for notificacao in
+        difusoes_com_leitura(usuario).filter(criada_em__gte=desde).order_by('-criada_em', '-id')
+    )
+    juntas = heapq.merge(pessoais, difusoes, key=lambda par: (par[0].criada_em, par[0].id), reverse=True)
+    return [serializar(notificacao, lida) for notificacao, lida in juntas]
+
+
+def marcar_todas_como_lidas(usuario):
+    """Marca como lidas as notificações pessoais e as difusões vigentes. Retorna quantas."""
+    agora = timezone.now()
+    pessoais = NotificacaoUsuario.objects.filter(usuario=usuario, lida=False).update(lida=True, lida_em=agora)
+    # Consultadas depois do update: restam as difusões sem linha de leitura
+    nao_lidas = difusoes_com_leitura(usuario).filter(lida=False, data_expiracao__gt=agora).values_list('id', flat=True)
+    leituras = NotificacaoUsuario.objects.bulk_create(
+        [NotificacaoUsuario(notificacao_id=pk, usuario=usuario, lida=True, lida_em=agora) for pk in nao_lidas],
+        ignore_conflicts=True,
+    )
+    return pessoais + len(leituras)
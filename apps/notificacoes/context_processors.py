@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 from .models import Aviso
@@ -19,3 +20,12 @@ def avisos_ativos(request):
     return {
         'avisos_ativos': avisos
     }
+
+
+def tempo_real(request):
+    """
+    Indica aos templates se a página deve abrir o stream de notificações (SSE).
+    """
+    return {
+        'notificacoes_tempo_real': getattr(settings, 'NOTIFICACOES_TEMPO_REAL_ATIVO', False)
+    }
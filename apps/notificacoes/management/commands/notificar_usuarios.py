@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.notificacoes.models import Notificacao
+from apps.notificacoes.publico import filtrar
+
+
+class Command(BaseCommand):
+    help = 'Cria uma notificação pessoal para um público (papéis/atributos), gravando os destinatários em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titulo')
+        parser.add_argument('--mensagem')
+        parser.add_argument('--tipo', default='info', choices=[tipo for tipo, _ in Notificacao.TIPO_CHOICES])
+        parser.add_argument(
+            '--papel',
+            action='append',
+            default=[],
+            help='Papel do público (pode ser repetido); padrão: todos os usuários ativos'
+        )
+        parser.add_argument(
+            '--filtro',
+            action='append',
+            default=[],
+            metavar='CAMPO=VALOR',
+            help='Filtro por atributo do usuário, como email__endswith=@cop30.br (pode ser repetido)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=None,
+            help='Destinatários gravados por bulk_create (padrão: NOTIFICACOES_LOTE_DESTINATARIOS)'
+        )
+        parser.add_argument(
+            '--notificacao',
+            type=int,
+            default=None,
+            metavar='ID',
+            help='Retoma o envio interrompido dessa notificação, gravando só os destinatários que faltam'
+        )
+
+    def handle(self, *args, **options):
+        notificacao = None
+        if options['notificacao'] is not None:
+            notificacao = Notificacao.objects.filter(pk=options['notificacao'], audiencia='').first()
+            if notificacao is None:
+                raise CommandError(f"Notificação pessoal {options['notificacao']} não encontrada.")
+        elif not options['titulo'] or not options['mensagem']:
+            raise CommandError('Informe --titulo e --mensagem, ou --notificacao para retomar um envio.')
+
+        atributos = {}
+        for filtro in options['filtro']:
+            campo, separador, valor = filtro.partition('=')
+            if not separador or not campo:
+                raise CommandError(f'Filtro inválido: {filtro}. Use CAMPO=VALOR.')
+            atributos[campo] = valor
+        try:
+            usuarios = filtrar(papeis=options['papel'], **atributos)
+            if notificacao is not None:
+                usuarios = usuarios.exclude(notificacoes_usuario__notificacao=notificacao)
+            total = usuarios.count()
+        except Exception as e:
+            raise CommandError(f'Público inválido: {e}')
+
+        if notificacao is None:
+            notificacao = Notificacao.objects.create(
+                titulo=options['titulo'],
+                mensagem=options['mensagem'],
+                tipo=options['tipo'],
+            )
+
+        def progresso(gravados):
+            self.stdout.write(f'{gravados} de {total} destinatários gravados')
+
+        gravados = notificacao.adicionar_usuarios(usuarios, lote=options['lote'], progresso=progresso)
+        self.stdout.write(self.style.SUCCESS(f'Notificação {notificacao.id} enviada para {gravados} usuários.'))
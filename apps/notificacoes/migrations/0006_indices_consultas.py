@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificacoes', '0005_remove_notificacao_lida_remove_notificacao_lida_em_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aviso',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['data_expiracao'], name='aviso_ativo_expiracao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacao',
+            index=models.Index(fields=['-criada_em'], name='notificacao_criada_em_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacaousuario',
+            index=models.Index(fields=['usuario', 'lida'], name='notif_usuario_lida_idx'),
+        ),
+    ]
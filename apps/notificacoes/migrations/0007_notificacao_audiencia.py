@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificacoes', '0006_indices_consultas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacao',
+            name='audiencia',
+            field=models.CharField(blank=True, choices=[('', 'Destinatários selecionados'), ('todos', 'Todos os usuários'), ('USUARIO', 'Usuário Comum'), ('EVENTOS', 'Usuário de Eventos'), ('GERENTE', 'Usuário Gerente'), ('SUPERUSER', 'Superusuário')], default='', help_text='Difusões (todos ou um papel) não criam uma linha por usuário; a leitura é registrada ao ler', max_length=20, verbose_name='Público'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacao',
+            index=models.Index(condition=models.Q(('audiencia', ''), _negated=True), fields=['audiencia', '-criada_em'], name='notificacao_difusao_idx'),
+        ),
+    ]
@@ -7,6 +7,12 @@ from apps.agenda.models import Event
 
 User = get_user_model()
 
+# Público das notificações: pessoal (destinatários em NotificacaoUsuario) ou
+# difusão para todos / um papel, gravada uma única vez
+AUDIENCIA_PESSOAL = ''
+AUDIENCIA_TODOS = 'todos'
+
+
 class Notificacao(models.Model):
     TIPO_CHOICES = [
         ('info', 'Informação'),
@@ -14,6 +20,11 @@ class Notificacao(models.Model):
         ('warning', 'Aviso'),
         ('error', 'Erro'),
     ]
+    AUDIENCIA_CHOICES = [
+        (AUDIENCIA_PESSOAL, 'Destinatários selecionados'),
+        (AUDIENCIA_TODOS, 'Todos os usuários'),
+        *User.Role.choices,
+    ]
     
     usuarios = models.ManyToManyField(User, through='NotificacaoUsuario', related_name='notificacoes')
     titulo = models.CharField(max_length=200)
@@ -23,8 +34,21 @@ class Notificacao(models.Model):
     criado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='notificacoes_sistema_criadas')
     evento = models.ForeignKey(Event, on_delete=models.CASCADE, null=True, blank=True, related_name='notificacoes_evento')
     data_expiracao = models.DateTimeField('Data de Expiração', null=True, blank=True, help_text='Data em que a notificação será considerada expirada')
+    audiencia = models.CharField(
+        'Público', max_length=20, choices=AUDIENCIA_CHOICES, default=AUDIENCIA_PESSOAL, blank=True,
+        help_text='Difusões (todos ou um papel) não criam uma linha por usuário; a leitura é registrada ao ler'
+    )
     class Meta:
         ordering = ['-criada_em']
+        indexes = [
+            models.Index(fields=['-criada_em'], name='notificacao_criada_em_idx'),
+            # Difusões recentes de um público (listagem de cada usuário)
+            models.Index(
+                fields=['audiencia', '-criada_em'],
+                condition=~models.Q(audiencia=AUDIENCIA_PESSOAL),
+                name='notificacao_difusao_idx',
+            ),
+        ]
         verbose_name = 'Notificação'
         verbose_name_plural = 'Notificações'
 
@@ -37,8 +61,40 @@ class Notificacao(models.Model):
     def __str__(self):
         return f"{self.titulo} - {self.criado_por.get_full_name() if self.criado_por else 'Sistema'}"
     
+    @property
+    def eh_difusao(self):
+        return self.audiencia != AUDIENCIA_PESSOAL
+
+    @staticmethod
+    def audiencias_de(usuario):
+        """Públicos de difusão que incluem o usuário."""
+        return [AUDIENCIA_TODOS, usuario.role]
+
+    @classmethod
+    def difusoes_para(cls, usuario):
+        """Difusões visíveis para o usuário (enviadas depois do seu cadastro)."""
+        return cls.objects.filter(
+            audiencia__in=cls.audiencias_de(usuario),
+            criada_em__gte=usuario.data_cadastro,
+        )
+
+    def publico(self):
+        """Usuários ativos alcançados por uma difusão."""
+        usuarios = User.objects.filter(is_active=True)
+        if self.audiencia != AUDIENCIA_TODOS:
+            usuarios = usuarios.filter(role=self.audiencia)
+        return usuarios
+
     def marcar_como_lida(self, usuario):
         """Marca a notificação como lida para um usuário específico"""
+        if self.eh_difusao:
+            # A linha de leitura da difusão só é criada quando o usuário lê
+            _, criada = NotificacaoUsuario.objects.get_or_create(
+                notificacao=self, usuario=usuario,
+                defaults={'lida': True, 'lida_em': timezone.now()},
+            )
+            if criada:
+                return True
         try:
             notificacao_usuario = self.notificacao_usuario.get(usuario=usuario)
             if not notificacao_usuario.lida:
@@ -59,19 +115,21 @@ class Notificacao(models.Model):
     
     def get_quantidade_usuarios(self):
         """Retorna o número de usuários que receberam esta notificação"""
+        if self.eh_difusao:
+            return self.publico().count()
         return self.usuarios.count()
     
     def get_quantidade_lidas(self):
         """Retorna quantos usuários já leram esta notificação"""
         return self.notificacao_usuario.filter(lida=True).count()
     
-    def adicionar_usuarios(self, usuarios):
-        """Adiciona múltiplos usuários a esta notificação"""
-        notificacoes_usuarios = [
-            NotificacaoUsuario(notificacao=self, usuario=usuario)
-            for usuario in usuarios
-        ]
-        NotificacaoUsuario.objects.bulk_create(notificacoes_usuarios, ignore_conflicts=True)
+    def adicionar_usuarios(self, usuarios, lote=None, progresso=None):
+        """
+        Adiciona múltiplos usuários (queryset, usuários ou ids) a esta notificação,
+        em lotes (ver ``publico.materializar``). Retorna quantos foram processados.
+        """
+        from .publico import materializar
+        return materializar(self, usuarios, lote=lote, progresso=progresso)
 
 
 class NotificacaoUsuario(models.Model):
@@ -83,6 +141,10 @@ class NotificacaoUsuario(models.Model):
     
     class Meta:
         unique_together = ('notificacao', 'usuario')
+        indexes = [
+            # Contagem e marcação das não lidas de cada usuário
+            models.Index(fields=['usuario', 'lida'], name='notif_usuario_lida_idx'),
+        ]
         verbose_name = 'Notificação do Usuário'
         verbose_name_plural = 'Notificações dos Usuários'
     
@@ -160,6 +222,15 @@ class Aviso(models.Model):
         verbose_name = _('Aviso')
         verbose_name_plural = _('Avisos')
         ordering = ['-fixo_no_topo', '-data_criacao']
+        indexes = [
+            # Avisos visíveis (context processor em todas as páginas). Índice
+            # parcial: o SQLite não usa um índice comum para "WHERE ativo"
+            models.Index(
+                fields=['data_expiracao'],
+                condition=models.Q(ativo=True),
+                name='aviso_ativo_expiracao_idx',
+            ),
+        ]
     
     def __str__(self):
         return self.titulo
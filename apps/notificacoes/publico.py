@@ -0,0 +1,77 @@
+# apps/notificacoes/publico.py
+"""
+Destinatários de notificações pessoais (uma linha ``NotificacaoUsuario`` por
+usuário).
+
+Para públicos inteiros, prefira a difusão (``Notificacao.audiencia``), que
+não grava destinatários. Quando as linhas por usuário são necessárias, o
+público é percorrido só pelos ids (``values_list(...).iterator()``) e gravado
+com ``bulk_create`` em lotes de ``NOTIFICACOES_LOTE_DESTINATARIOS``: a memória
+fica limitada ao lote, qualquer que seja o tamanho do público. Cada lote é
+gravado em sua própria transação. Um envio interrompido é retomado com
+``notificar_usuarios --notificacao <id>``, que reaproveita a notificação e
+grava apenas os destinatários que faltam; repetir o comando sem essa opção
+cria uma notificação nova.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+
+DEFAULT_LOTE = 1000
+
+User = get_user_model()
+
+
+def filtrar(papeis=None, **atributos):
+    """
+    Usuários ativos do público: ``papeis`` (valores de ``Usuario.Role``) e
+    filtros por atributo no formato do ORM (``email__endswith='@cop30.br'``).
+    """
+    usuarios = User.objects.filter(is_active=True, **atributos)
+    if papeis:
+        usuarios = usuarios.filter(role__in=papeis)
+    return usuarios
+
+
+def _tamanho_lote(lote):
+    return lote or getattr(settings, 'NOTIFICACOES_LOTE_DESTINATARIOS', DEFAULT_LOTE)
+
+
+def lotes_de_ids(usuarios, lote=None):
+    """
+    Gera listas de até ``lote`` ids a partir de um queryset de usuários (lido
+    em fluxo, só a coluna ``id``) ou de um iterável de usuários/ids.
+    """
+    lote = _tamanho_lote(lote)
+    if isinstance(usuarios, QuerySet):
+        ids = usuarios.order_by().values_list('id', flat=True).iterator(chunk_size=lote)
+    else:
+        ids = (getattr(usuario, 'pk', usuario) for usuario in usuarios)
+    while True:
+        bloco = list(islice(ids, lote))
+        if not bloco:
+            return
+        yield bloco
+
+
+def materializar(notificacao, usuarios, lote=None, progresso=None):
+    """
+    Grava os destinatários de ``notificacao`` em lotes. ``progresso``, se
+    informado, é chamado com o total processado após cada lote. Retorna o total.
+    """
+    from .models import NotificacaoUsuario
+    from .tempo_real import publicar_notificacao
+
+    total = 0
+    for ids in lotes_de_ids(usuarios, lote):
+        NotificacaoUsuario.objects.bulk_create(
+            [NotificacaoUsuario(notificacao=notificacao, usuario_id=usuario_id) for usuario_id in ids],
+            ignore_conflicts=True,
+        )
+        publicar_notificacao(notificacao, ids)
+        total += len(ids)
+        if progresso:
+            progresso(total)
+    return total
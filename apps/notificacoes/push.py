@@ -1,10 +1,78 @@
+"""
+Web Push via OneSignal.
+
+All requests share one pooled ``requests.Session`` (keep-alive connections).
+Its adapter retries 429 and 5xx responses and connection errors up to
+``ONESIGNAL_MAX_TENTATIVAS`` times, with exponential backoff
+(``ONESIGNAL_BACKOFF``), honoring ``Retry-After``. Each payload carries an
+``idempotency_key``, so a retried request never delivers a push twice.
+
+``send_push_to_users`` groups recipients that share a payload into batches of
+``ONESIGNAL_MAX_DESTINATARIOS`` external_ids and sends the batches
+concurrently, with at most ``ONESIGNAL_WORKERS`` requests in flight.
+``ONESIGNAL_API_URL`` can point to a local stub server in tests.
+"""
 import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
 ONESIGNAL_API_URL = "https://api.onesignal.com/notifications"
+# OneSignal accepts up to 20,000 external_ids per request
+DEFAULT_MAX_DESTINATARIOS = 2000
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_TENTATIVAS = 3
+DEFAULT_BACKOFF = 0.5
+TIMEOUT = 10
+STATUS_RETRY = (429, 500, 502, 503, 504)
+
+_session = None
+_session_config = None
+_session_lock = threading.Lock()
+
+
+def _config():
+    return (
+        getattr(settings, 'ONESIGNAL_WORKERS', DEFAULT_WORKERS),
+        getattr(settings, 'ONESIGNAL_MAX_TENTATIVAS', DEFAULT_MAX_TENTATIVAS),
+        getattr(settings, 'ONESIGNAL_BACKOFF', DEFAULT_BACKOFF),
+    )
+
+
+def get_session() -> requests.Session:
+    """Shared session, rebuilt only if the pool/retry settings change."""
+    global _session, _session_config
+    config = _config()
+    with _session_lock:
+        if _session is None or _session_config != config:
+            workers, tentativas, backoff = config
+            retry = Retry(
+                total=tentativas,
+                backoff_factor=backoff,
+                status_forcelist=STATUS_RETRY,
+                allowed_methods=frozenset({'POST'}),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(workers, 1), max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            if _session is not None:
+                _session.close()
+            _session, _session_config = session, config
+        return _session
+
+
+def _api_url() -> str:
+    return getattr(settings, 'ONESIGNAL_API_URL', ONESIGNAL_API_URL)
 
 
 def _build_auth_header(api_key: str) -> dict:
@@ -18,6 +86,22 @@ def _build_auth_header(api_key: str) -> dict:
     return {"Authorization": f"{scheme} {api_key}"}
 
 
+def _build_payload(app_id: str, external_ids, title: str, message: str, url: str | None = None) -> dict:
+    payload = {
+        "app_id": app_id,
+        # Necessário quando usa include_aliases/external_id com a API v16
+        "target_channel": "webpush",
+        "headings": {"en": title, "pt": title},
+        "contents": {"en": message, "pt": message},
+        "include_aliases": {"external_id": [str(external_id) for external_id in external_ids]},
+    }
+    if url:
+        payload["url"] = url
+    # Makes retries safe: OneSignal ignores a repeated key
+    payload["idempotency_key"] = str(uuid.uuid4())
+    return payload
+
+
 def send_push_to_user(user_external_id: str, title: str, message: str, url: str | None = None) -> bool:
     """
     Sends a Web Push notification using OneSignal to a specific user identified by external_id.
@@ -38,17 +122,7 @@ def send_push_to_user(user_external_id: str, title: str, message: str, url: str
         logger.warning("OneSignal credentials are not configured. Skipping push.")
         return False
 
-    payload = {
-        "app_id": app_id,
-        # Necessário quando usa include_aliases/external_id com a API v16
-        "target_channel": "webpush",
-        "headings": {"en": title, "pt": title},
-        "contents": {"en": message, "pt": message},
-        "include_aliases": {"external_id": [str(user_external_id)]},
-    }
-
-    if url:
-        payload["url"] = url
+    payload = _build_payload(app_id, [user_external_id], title, message, url)
 
     headers = {
         **_build_auth_header(api_key),
@@ -56,11 +130,11 @@ def send_push_to_user(user_external_id: str, title: str, message: str, url: str
     }
 
     try:
-        resp = requests.post(
-            ONESIGNAL_API_URL,
+        resp = get_session().post(
+            _api_url(),
             json=payload,
             headers=headers,
-            timeout=10,
+            timeout=TIMEOUT,
         )
         if resp.status_code in (200, 201, 202):
             logger.info("OneSignal push accepted: %s", resp.text)
@@ -70,3 +144,52 @@ def send_push_to_user(user_external_id: str, title: str, message: str, url: str
     except requests.RequestException as exc:
         logger.exception("Error sending OneSignal push: %s", exc)
         return False
+
+
+def _post_batch(app_id: str, headers: dict, batch: list, title: str, message: str, url: str | None) -> int:
+    try:
+        resp = get_session().post(
+            _api_url(),
+            json=_build_payload(app_id, batch, title, message, url),
+            headers=headers,
+            timeout=TIMEOUT,
+        )
+    except requests.RequestException as exc:
+        logger.error("Error sending OneSignal push to %s users: %s", len(batch), exc)
+        return 0
+    if resp.status_code in (200, 201, 202):
+        return len(batch)
+    logger.error("OneSignal push failed for %s users (%s): %s", len(batch), resp.status_code, resp.text)
+    return 0
+
+
+def send_push_to_users(user_external_ids, title: str, message: str, url: str | None = None) -> int:
+    """
+    Sends the same Web Push notification to many users: one OneSignal request
+    per ``ONESIGNAL_MAX_DESTINATARIOS`` external_ids, sent concurrently by up
+    to ``ONESIGNAL_WORKERS`` threads.
+
+    Returns:
+        How many external_ids were in requests accepted by OneSignal.
+    """
+    app_id = getattr(settings, 'ONESIGNAL_APP_ID', '')
+    api_key = getattr(settings, 'ONESIGNAL_REST_API_KEY', '')
+
+    if not app_id or not api_key:
+        logger.warning("OneSignal credentials are not configured. Skipping push.")
+        return 0
+
+    headers = {
+        **_build_auth_header(api_key),
+        "Content-Type": "application/json",
+    }
+    ids = list(dict.fromkeys(str(external_id) for external_id in user_external_ids))
+    batch_size = getattr(settings, 'ONESIGNAL_MAX_DESTINATARIOS', DEFAULT_MAX_DESTINATARIOS)
+    batches = [ids[start:start + batch_size] for start in range(0, len(ids), batch_size)]
+    if len(batches) <= 1:
+        return sum(_post_batch(app_id, headers, batch, title, message, url) for batch in batches)
+
+    workers = min(getattr(settings, 'ONESIGNAL_WORKERS', DEFAULT_WORKERS), len(batches))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='onesignal') as executor:
+        results = executor.map(lambda batch: _post_batch(app_id, headers, batch, title, message, url), batches)
+        return sum(results)
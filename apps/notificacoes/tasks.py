@@ -0,0 +1,13 @@
+# apps/notificacoes/tasks.py
+"""
+Envio de push em segundo plano (ver ``apps/core/tarefas.py``).
+"""
+from celery import shared_task
+
+from .push import send_push_to_users
+
+
+@shared_task(ignore_result=True)
+def enviar_push_em_lote(user_ids, titulo, mensagem, url=None):
+    """Envia o mesmo push para vários usuários (requisições agrupadas)."""
+    return send_push_to_users(user_ids, titulo, mensagem, url)
@@ -0,0 +1,260 @@
+# apps/notificacoes/tempo_real.py
+"""
+Entrega em tempo real das notificações e validações do Passe Fácil.
+
+O navegador mantém uma conexão Server-Sent Events (``/notificacoes/stream/``,
+view assíncrona) em vez de consultar ``/notificacoes/`` e
+``/api/passefacil/ultimas-validacoes/`` periodicamente. Cada conexão assina
+os canais do usuário:
+
+- ``usuario:<id>``: notificações pessoais e validações do seu passe;
+- ``difusao:todos`` e ``difusao:<papel>``: difusões (``Notificacao.audiencia``).
+
+As mensagens passam por um barramento pub/sub:
+
+- ``BarramentoLocal`` (padrão): filas ``asyncio`` no próprio processo. Atende
+  quando a aplicação roda em um único processo e as tarefas rodam nele
+  (``TAREFAS_MODO`` ``thread``/``sincrono``);
+- ``BarramentoRedis``: com ``NOTIFICACOES_TEMPO_REAL_REDIS_URL``, publica no
+  Redis, e qualquer processo (workers do servidor, Celery) alcança as
+  conexões abertas em qualquer outro.
+
+Publicar nunca interrompe quem publica: falhas do barramento são apenas
+registradas no log, e o cliente recupera o estado ao reconectar.
+
+O stream fica desligado por padrão (``NOTIFICACOES_TEMPO_REAL_ATIVO``) e só
+é servido via ASGI: sob WSGI o Django junta o iterador assíncrono inteiro
+antes de responder, prendendo um worker por toda a conexão. Desligado ou sob
+WSGI, o endpoint responde ``204`` (o ``EventSource`` desiste) e a página não
+abre a conexão; os scripts continuam consultando periodicamente.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import AUDIENCIA_TODOS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PENDENTES = 100
+DEFAULT_HEARTBEAT = 25   # segundos entre comentários ":" (mantém proxies abertos)
+DEFAULT_DURACAO = 300    # segundos até encerrar a conexão; o EventSource reconecta
+RECONEXAO_MS = 3000
+
+EVENTO_NOTIFICACAO = 'notificacao'
+EVENTO_VALIDACAO = 'validacao'
+
+
+def disponivel(request):
+    """Se o stream pode ser servido nesta requisição (ativo e sob ASGI)."""
+    from django.core.handlers.asgi import ASGIRequest
+
+    return getattr(settings, 'NOTIFICACOES_TEMPO_REAL_ATIVO', False) and isinstance(request, ASGIRequest)
+
+
+def canal_usuario(usuario_id):
+    return f'usuario:{usuario_id}'
+
+
+def canal_difusao(audiencia):
+    return f'difusao:{audiencia}'
+
+
+def canais_do_usuario(usuario):
+    return [canal_usuario(usuario.pk), canal_difusao(AUDIENCIA_TODOS), canal_difusao(usuario.role)]
+
+
+class AssinaturaLocal:
+    """Fila de mensagens de uma conexão no barramento local."""
+
+    def __init__(self, barramento, canais, max_pendentes):
+        self.barramento = barramento
+        self.canais = canais
+        self.loop = asyncio.get_running_loop()
+        self.fila = asyncio.Queue(max_pendentes)
+
+    def _entregar(self, mensagem):
+        try:
+            self.fila.put_nowait(mensagem)
+        except asyncio.QueueFull:
+            # Cliente lento: descarta; o estado é recarregado na reconexão
+            logger.warning(f'Mensagem descartada para {self.canais[0]}: fila cheia')
+
+    async def receber(self, timeout):
+        """Próxima mensagem ``(evento, dados)`` ou ``None`` após ``timeout`` segundos."""
+        try:
+            return await asyncio.wait_for(self.fila.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def fechar(self):
+        self.barramento._remover(self)
+
+
+class BarramentoLocal:
+    """Pub/sub em memória, para as conexões abertas neste processo."""
+
+    def __init__(self, max_pendentes=DEFAULT_MAX_PENDENTES):
+        self.max_pendentes = max_pendentes
+        self._assinaturas = {}
+        self._lock = threading.Lock()
+
+    async def assinar(self, canais):
+        assinatura = AssinaturaLocal(self, canais, self.max_pendentes)
+        with self._lock:
+            for canal in canais:
+                self._assinaturas.setdefault(canal, set()).add(assinatura)
+        return assinatura
+
+    def _remover(self, assinatura):
+        with self._lock:
+            for canal in assinatura.canais:
+                assinantes = self._assinaturas.get(canal)
+                if assinantes is not None:
+                    assinantes.discard(assinatura)
+                    if not assinantes:
+                        del self._assinaturas[canal]
+
+    def assinantes(self, canal):
+        return len(self._assinaturas.get(canal, ()))
+
+    def publicar_varios(self, canais, evento, dados):
+        """Publica a mesma mensagem em vários canais (pode ser chamado de qualquer thread)."""
+        mensagem = (evento, dados)
+        with self._lock:
+            destinos = {assinatura for canal in canais for assinatura in self._assinaturas.get(canal, ())}
+        for assinatura in destinos:
+            try:
+                assinatura.loop.call_soon_threadsafe(assinatura._entregar, mensagem)
+            except RuntimeError:
+                # O loop da conexão já foi encerrado
+                self._remover(assinatura)
+
+
+class AssinaturaRedis:
+    """Assinatura dos canais do usuário no Redis."""
+
+    def __init__(self, cliente, pubsub):
+        self.cliente = cliente
+        self.pubsub = pubsub
+
+    async def receber(self, timeout):
+        mensagem = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if mensagem is None:
+            return None
+        conteudo = json.loads(mensagem['data'])
+        return conteudo['evento'], conteudo['dados']
+
+    async def fechar(self):
+        await self.pubsub.aclose()
+        await self.cliente.aclose()
+
+
+class BarramentoRedis:
+    """Pub/sub do Redis, compartilhado entre processos."""
+
+    def __init__(self, url):
+        import redis
+
+        self.url = url
+        self._cliente = redis.Redis.from_url(url)
+
+    async def assinar(self, canais):
+        import redis.asyncio
+
+        cliente = redis.asyncio.Redis.from_url(self.url)
+        pubsub = cliente.pubsub()
+        await pubsub.subscribe(*canais)
+        return AssinaturaRedis(cliente, pubsub)
+
+    def publicar_varios(self, canais, evento, dados):
+        mensagem = json.dumps({'evento': evento, 'dados': dados})
+        with self._cliente.pipeline(transaction=False) as pipe:
+            for canal in canais:
+                pipe.publish(canal, mensagem)
+            pipe.execute()
+
+
+_barramento = None
+_barramento_lock = threading.Lock()
+
+
+def get_barramento():
+    """Retorna o barramento do processo (Redis, se configurado, ou local)."""
+    global _barramento
+    if _barramento is None:
+        with _barramento_lock:
+            if _barramento is None:
+                url = getattr(settings, 'NOTIFICACOES_TEMPO_REAL_REDIS_URL', '')
+                if url:
+                    _barramento = BarramentoRedis(url)
+                else:
+                    _barramento = BarramentoLocal(
+                        getattr(settings, 'NOTIFICACOES_STREAM_MAX_PENDENTES', DEFAULT_MAX_PENDENTES)
+                    )
+    return _barramento
+
+
+def publicar(canais, evento, dados):
+    """Publica depois do commit da transação atual; erros vão só para o log."""
+    canais = list(canais)
+    if not canais:
+        return
+
+    def enviar():
+        try:
+            get_barramento().publicar_varios(canais, evento, dados)
+        except Exception as e:
+            logger.warning(f'Falha ao publicar {evento} em tempo real: {e}')
+
+    transaction.on_commit(enviar)
+
+
+def publicar_notificacao(notificacao, usuario_ids=()):
+    """Avisa os destinatários (ou o público da difusão) de uma notificação nova."""
+    from .caixa import serializar
+
+    dados = serializar(notificacao, lida=False)
+    if notificacao.eh_difusao:
+        publicar([canal_difusao(notificacao.audiencia)], EVENTO_NOTIFICACAO, dados)
+    else:
+        publicar((canal_usuario(usuario_id) for usuario_id in usuario_ids), EVENTO_NOTIFICACAO, dados)
+
+
+def publicar_validacao(usuario_id, data_validacao, ip_address=None):
+    """Avisa o usuário de que o seu Passe Fácil foi validado."""
+    publicar([canal_usuario(usuario_id)], EVENTO_VALIDACAO, {
+        'valido': True,
+        'data_validacao': data_validacao,
+        'ip_address': ip_address or 'Local desconhecido',
+    })
+
+
+def formatar(evento, dados):
+    """Mensagem no formato ``text/event-stream``."""
+    return f'event: {evento}\ndata: {json.dumps(dados)}\n\n'
+
+
+async def fluxo(usuario):
+    """
+    Corpo da resposta ``text/event-stream`` de uma conexão: mensagens dos
+    canais do usuário e comentários periódicos, por até ``NOTIFICACOES_STREAM_DURACAO``.
+    """
+    heartbeat = getattr(settings, 'NOTIFICACOES_STREAM_HEARTBEAT', DEFAULT_HEARTBEAT)
+    duracao = getattr(settings, 'NOTIFICACOES_STREAM_DURACAO', DEFAULT_DURACAO)
+    assinatura = await get_barramento().assinar(canais_do_usuario(usuario))
+    loop = asyncio.get_running_loop()
+    fim = loop.time() + duracao
+    try:
+        yield f'retry: {RECONEXAO_MS}\n\n'
+        # Ao (re)conectar o cliente recarrega o estado, cobrindo o que perdeu
+        yield formatar('conectado', {})
+        while (restante := fim - loop.time()) > 0:
+            mensagem = await assinatura.receber(min(heartbeat, restante))
+            yield ': ping\n\n' if mensagem is None else formatar(*mensagem)
+    finally:
+        await assinatura.fechar()
@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import AUDIENCIA_TODOS, Notificacao, NotificacaoUsuario
+
+User = get_user_model()
+
+
+class DifusaoNotificacoesTest(TestCase):
+    """Testa as notificações de difusão (gravadas uma vez, lidas sob demanda)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='participante@teste.com', password='senha12345', nome='Participante')
+        self.gerente = User.objects.create_user(
+            email='gerente@teste.com', password='senha12345', nome='Gerente', role=User.Role.GERENTE
+        )
+        self.pessoal = Notificacao.objects.create(titulo='Pessoal', mensagem='Só para você')
+        self.pessoal.adicionar_usuarios([self.user])
+        self.todos = Notificacao.objects.create(titulo='Todos', mensagem='Para todos', audiencia=AUDIENCIA_TODOS)
+        self.gerentes = Notificacao.objects.create(
+            titulo='Gerentes', mensagem='Para gerentes', audiencia=User.Role.GERENTE
+        )
+
+    def listar(self, usuario):
+        self.client.force_login(usuario)
+        return self.client.get(reverse('notificacoes:listar')).json()
+
+    def test_difusao_nao_cria_linhas_por_usuario(self):
+        self.assertFalse(NotificacaoUsuario.objects.filter(notificacao=self.todos).exists())
+        self.assertEqual(self.todos.get_quantidade_usuarios(), 2)
+        self.assertEqual(self.gerentes.get_quantidade_usuarios(), 1)
+
+    def test_listagem_junta_pessoais_e_difusoes(self):
+        dados = self.listar(self.user)
+        self.assertEqual([n['titulo'] for n in dados['notificacoes']], ['Todos', 'Pessoal'])
+        self.assertEqual(dados['nao_lidas'], 2)
+
+        dados = self.listar(self.gerente)
+        self.assertEqual([n['titulo'] for n in dados['notificacoes']], ['Gerentes', 'Todos'])
+
+    def test_marcar_difusao_como_lida(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('notificacoes:marcar_lida', args=[self.todos.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.todos.esta_lida_por(self.user))
+        self.assertEqual(self.listar(self.user)['nao_lidas'], 1)
+
+        # Difusão de outro público
+        response = self.client.post(reverse('notificacoes:marcar_lida', args=[self.gerentes.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_marcar_todas_como_lidas(self):
+        self.client.force_login(self.gerente)
+        response = self.client.post(reverse('notificacoes:marcar_todas_lidas'))
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(self.listar(self.gerente)['nao_lidas'], 0)
+        self.assertEqual(self.listar(self.user)['nao_lidas'], 2)
@@ -0,0 +1,71 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..models import Notificacao, NotificacaoUsuario
+from ..publico import filtrar, lotes_de_ids
+
+User = get_user_model()
+
+
+class PublicoNotificacoesTest(TestCase):
+    """Testa a gravação em lotes dos destinatários de notificações pessoais."""
+
+    def setUp(self):
+        self.usuarios = [
+            User.objects.create_user(email=f'participante{i}@teste.com', password='senha12345', nome=f'Participante {i}')
+            for i in range(5)
+        ]
+        User.objects.create_user(email='eventos@cop30.br', password='senha12345', nome='Eventos', role=User.Role.EVENTOS)
+        User.objects.create_user(email='inativo@teste.com', password='senha12345', nome='Inativo', is_active=False)
+
+    def test_grava_em_lotes_com_progresso(self):
+        notificacao = Notificacao.objects.create(titulo='Aviso', mensagem='Mensagem')
+        progresso = []
+
+        total = notificacao.adicionar_usuarios(filtrar(), lote=2, progresso=progresso.append)
+
+        self.assertEqual(total, 6)
+        self.assertEqual(progresso, [2, 4, 6])
+        self.assertEqual(notificacao.get_quantidade_usuarios(), 6)
+
+    def test_lotes_aceitam_usuarios_e_ids(self):
+        ids = [usuario.pk for usuario in self.usuarios]
+        self.assertEqual(list(lotes_de_ids(self.usuarios[:3], lote=2)), [ids[:2], ids[2:3]])
+        self.assertEqual(list(lotes_de_ids(ids[:2], lote=5)), [ids[:2]])
+
+    def test_filtros_por_papel_e_atributo(self):
+        self.assertEqual(filtrar(papeis=[User.Role.EVENTOS]).get().email, 'eventos@cop30.br')
+        self.assertEqual(filtrar(email__endswith='@teste.com').count(), 5)
+
+    def test_comando(self):
+        saida = StringIO()
+        call_command(
+            'notificar_usuarios', '--titulo', 'Credenciamento', '--mensagem', 'Retire sua credencial',
+            '--filtro', 'email__endswith=@teste.com', '--lote', '4', stdout=saida,
+        )
+
+        self.assertEqual(NotificacaoUsuario.objects.count(), 5)
+        self.assertIn('4 de 5 destinatários gravados', saida.getvalue())
+
+    def test_comando_retoma_envio_interrompido(self):
+        notificacao = Notificacao.objects.create(titulo='Credenciamento', mensagem='Retire sua credencial')
+        notificacao.adicionar_usuarios(self.usuarios[:2])
+        saida = StringIO()
+
+        call_command(
+            'notificar_usuarios', '--notificacao', str(notificacao.id),
+            '--filtro', 'email__endswith=@teste.com', stdout=saida,
+        )
+
+        self.assertEqual(Notificacao.objects.count(), 1)
+        self.assertEqual(notificacao.get_quantidade_usuarios(), 5)
+        self.assertIn('3 de 3 destinatários gravados', saida.getvalue())
+
+    def test_comando_exige_titulo_ou_notificacao(self):
+        with self.assertRaises(CommandError):
+            call_command('notificar_usuarios', '--mensagem', 'Sem título', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('notificar_usuarios', '--notificacao', '999', stdout=StringIO())
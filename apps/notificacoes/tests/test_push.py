@@ -0,0 +1,87 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase, override_settings
+
+from ..push import send_push_to_user, send_push_to_users
+
+
+class StubOneSignal(BaseHTTPRequestHandler):
+    """Servidor local que registra as requisições e responde com os status da fila."""
+
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        servidor = self.server
+        with servidor.lock:
+            servidor.recebidos.append(corpo)
+            status = servidor.respostas.pop(0) if servidor.respostas else 200
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"id": "stub"}')
+
+    def log_message(self, *args):
+        pass
+
+
+class PushOneSignalTest(SimpleTestCase):
+    """Testa o envio em lote para o OneSignal contra um servidor local."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = ThreadingHTTPServer(('127.0.0.1', 0), StubOneSignal)
+        cls.servidor.lock = threading.Lock()
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+        cls.configuracao = override_settings(
+            ONESIGNAL_API_URL=f'http://127.0.0.1:{cls.servidor.server_port}/notifications',
+            ONESIGNAL_APP_ID='app-teste',
+            ONESIGNAL_REST_API_KEY='os_chave',
+            ONESIGNAL_MAX_DESTINATARIOS=2,
+            ONESIGNAL_WORKERS=3,
+            ONESIGNAL_MAX_TENTATIVAS=2,
+            ONESIGNAL_BACKOFF=0,
+        )
+        cls.configuracao.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.configuracao.disable()
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.servidor.recebidos = []
+        self.servidor.respostas = []
+
+    def test_destinatarios_agrupados_em_lotes(self):
+        aceitos = send_push_to_users([1, 2, 3, 4, 5, 5], 'Título', 'Mensagem', 'https://exemplo/evento/1/')
+
+        self.assertEqual(aceitos, 5)
+        self.assertEqual(len(self.servidor.recebidos), 3)
+        destinatarios = sorted(
+            external_id for corpo in self.servidor.recebidos for external_id in corpo['include_aliases']['external_id']
+        )
+        self.assertEqual(destinatarios, ['1', '2', '3', '4', '5'])
+        self.assertTrue(all(corpo['url'] == 'https://exemplo/evento/1/' for corpo in self.servidor.recebidos))
+
+    def test_repete_em_429_e_5xx_com_a_mesma_chave(self):
+        self.servidor.respostas = [429, 503]
+        self.assertTrue(send_push_to_user('7', 'Título', 'Mensagem'))
+
+        self.assertEqual(len(self.servidor.recebidos), 3)
+        self.assertEqual(len({corpo['idempotency_key'] for corpo in self.servidor.recebidos}), 1)
+
+    def test_desiste_apos_as_tentativas(self):
+        self.servidor.respostas = [500, 500, 500]
+        self.assertEqual(send_push_to_users(['1'], 'Título', 'Mensagem'), 0)
+        self.assertEqual(len(self.servidor.recebidos), 3)
+
+    @override_settings(ONESIGNAL_APP_ID='')
+    def test_sem_credenciais(self):
+        self.assertEqual(send_push_to_users(['1'], 'Título', 'Mensagem'), 0)
+        self.assertEqual(self.servidor.recebidos, [])
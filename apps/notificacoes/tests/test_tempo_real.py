@@ -0,0 +1,90 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import tempo_real
+from ..models import AUDIENCIA_TODOS, Notificacao
+
+User = get_user_model()
+
+
+class BarramentoLocalTest(TestCase):
+    """Testa o pub/sub em memória."""
+
+    async def test_entrega_so_aos_canais_assinados(self):
+        barramento = tempo_real.BarramentoLocal()
+        assinatura = await barramento.assinar(['usuario:1', 'difusao:todos'])
+
+        barramento.publicar_varios(['usuario:2'], 'notificacao', {'id': 1})
+        barramento.publicar_varios(['usuario:1', 'difusao:todos'], 'notificacao', {'id': 2})
+
+        self.assertEqual(await assinatura.receber(1), ('notificacao', {'id': 2}))
+        self.assertIsNone(await assinatura.receber(0.01))
+
+        await assinatura.fechar()
+        self.assertEqual(barramento.assinantes('usuario:1'), 0)
+
+
+@override_settings(NOTIFICACOES_TEMPO_REAL_ATIVO=True, NOTIFICACOES_STREAM_HEARTBEAT=0.05, NOTIFICACOES_STREAM_DURACAO=5)
+class StreamNotificacoesTest(TestCase):
+    """Testa o endpoint Server-Sent Events."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='participante@teste.com', password='senha12345', nome='Participante')
+        self.outro = User.objects.create_user(email='outro@teste.com', password='senha12345', nome='Outro')
+
+    async def abrir_stream(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('notificacoes:stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        conteudo = aiter(response.streaming_content)
+        self.assertTrue((await anext(conteudo)).startswith(b'retry:'))
+        self.assertTrue((await anext(conteudo)).startswith(b'event: conectado'))
+        return conteudo
+
+    async def proxima_mensagem(self, conteudo):
+        while (pedaco := await anext(conteudo)).startswith(b':'):
+            continue
+        evento, dados = pedaco.decode().strip().split('\n')
+        return evento.removeprefix('event: '), json.loads(dados.removeprefix('data: '))
+
+    async def test_entrega_notificacoes_do_usuario(self):
+        conteudo = await self.abrir_stream()
+
+        def enviar():
+            with self.captureOnCommitCallbacks(execute=True):
+                outra = Notificacao.objects.create(titulo='Para outro', mensagem='...')
+                outra.adicionar_usuarios([self.outro])
+                notificacao = Notificacao.objects.create(titulo='Para você', mensagem='...')
+                notificacao.adicionar_usuarios([self.user])
+                difusao = Notificacao.objects.create(titulo='Todos', mensagem='...', audiencia=AUDIENCIA_TODOS)
+                tempo_real.publicar_notificacao(difusao)
+                tempo_real.publicar_validacao(self.user.pk, '2030-11-10T09:00:00-03:00', '10.0.0.1')
+
+        await sync_to_async(enviar)()
+
+        evento, dados = await self.proxima_mensagem(conteudo)
+        self.assertEqual((evento, dados['titulo'], dados['lida']), ('notificacao', 'Para você', False))
+        evento, dados = await self.proxima_mensagem(conteudo)
+        self.assertEqual((evento, dados['titulo']), ('notificacao', 'Todos'))
+        evento, dados = await self.proxima_mensagem(conteudo)
+        self.assertEqual((evento, dados['ip_address']), ('validacao', '10.0.0.1'))
+        await conteudo.aclose()
+
+    async def test_exige_login(self):
+        response = await self.async_client.get(reverse('notificacoes:stream'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_sob_wsgi_nao_abre_stream(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('notificacoes:stream'))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_desligado(self):
+        await self.async_client.aforce_login(self.user)
+        with self.settings(NOTIFICACOES_TEMPO_REAL_ATIVO=False):
+            response = await self.async_client.get(reverse('notificacoes:stream'))
+        self.assertEqual(response.status_code, 204)
@@ -12,6 +12,7 @@ urlpatterns = [
     path('', views.listar_notificacoes, name='listar'),
     path('marcar-todas-lidas/', views.marcar_todas_como_lidas, name='marcar_todas_lidas'),
     path('<int:notificacao_id>/marcar-lida/', views.marcar_como_lida, name='marcar_lida'),
+    path('stream/', views.stream_notificacoes, name='stream'),
     
     # URLs para gerenciamento de avisos
     path('avisos/', ListaAvisosView.as_view(), name='lista_avisos'),
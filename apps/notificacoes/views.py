@@ -1,10 +1,11 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from datetime import timedelta
 import json
+from . import caixa, tempo_real
 from .models import Notificacao, NotificacaoUsuario
 
 @login_required
@@ -13,25 +14,8 @@ def listar_notificacoes(request):
     # Calcular o limite de 10 horas atrás
     dez_horas_atras = timezone.now() - timedelta(hours=10)
     
-    # Obter as notificações do usuário com menos de 10 horas
-    notificacoes_usuario = request.user.notificacoes_usuario.filter(
-        notificacao__criada_em__gte=dez_horas_atras
-    ).select_related('notificacao').order_by('-notificacao__criada_em')
-    
-    # Preparar a lista de notificações com status de leitura
-    notificacoes_data = []
-    for rel_usuario in notificacoes_usuario:
-        notif = rel_usuario.notificacao
-        notificacoes_data.append({
-            'id': notif.id,
-            'titulo': notif.titulo,
-            'mensagem': notif.mensagem,
-            'tipo': notif.tipo,
-            'lida': rel_usuario.lida,
-            'tempo': rel_usuario.tempo_decorrido if hasattr(rel_usuario, 'tempo_decorrido') else 'agora mesmo',
-            'criada_em': notif.criada_em.isoformat(),
-            'evento_id': notif.evento.id if notif.evento else None
-        })
+    # Notificações pessoais e difusões (todos / papel do usuário), já ordenadas
+    notificacoes_data = caixa.recentes(request.user, dez_horas_atras)
     
     # Contar notificações não lidas
     nao_lidas = sum(1 for n in notificacoes_data if not n['lida'])
@@ -50,19 +34,8 @@ def listar_notificacoes(request):
 def marcar_todas_como_lidas(request):
     """Marca todas as notificações do usuário como lidas"""
     try:
-        # Atualiza todas as notificações não lidas do usuário
-        notificacoes_nao_lidas = NotificacaoUsuario.objects.filter(
-            usuario=request.user,
-            lida=False
-        )
-        
-        count = notificacoes_nao_lidas.count()
-        
-        # Atualiza o status para lido e define a data/hora atual
-        notificacoes_nao_lidas.update(
-            lida=True,
-            lida_em=timezone.now()
-        )
+        # Pessoais não lidas e difusões ainda sem registro de leitura
+        count = caixa.marcar_todas_como_lidas(request.user)
         
         return JsonResponse({
             'success': True,
@@ -81,6 +54,15 @@ def marcar_todas_como_lidas(request):
 def marcar_como_lida(request, notificacao_id):
     """Marca uma notificação específica como lida"""
     try:
+        # Difusão destinada ao usuário: a leitura é registrada agora
+        difusao = Notificacao.difusoes_para(request.user).filter(pk=notificacao_id).first()
+        if difusao is not None:
+            difusao.marcar_como_lida(request.user)
+            return JsonResponse({
+                'success': True,
+                'message': 'Notificação marcada como lida'
+            })
+        
         # Obtém a relação de notificação do usuário
         notificacao_usuario = NotificacaoUsuario.objects.get(
             notificacao_id=notificacao_id,
@@ -107,3 +89,17 @@ def marcar_como_lida(request, notificacao_id):
             'success': False,
             'message': f'Erro ao marcar notificação: {str(e)}'
         }, status=500)
+
+@login_required
+async def stream_notificacoes(request):
+    """Envia as notificações e validações do usuário logado via Server-Sent Events"""
+    # Desligado ou sob WSGI: 204 encerra o EventSource e o cliente volta a consultar
+    if not tempo_real.disponivel(request):
+        return HttpResponse(status=204)
+    
+    usuario = await request.auser()
+    response = StreamingHttpResponse(tempo_real.fluxo(usuario), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Desativa o buffer de proxies (nginx) para as mensagens saírem na hora
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -11,6 +11,7 @@ from django.http import HttpResponseRedirect
 from django.utils.translation import gettext_lazy as _
 from .models import PasseFacil, ValidacaoQRCode
 from .admin_views import validar_qr_code
+from . import contadores
 
 class PasseFacilAdmin(admin.ModelAdmin):
     list_display = ('user', 'codigo', 'ultima_validacao', 'status_validacao', 'acoes')
@@ -87,4 +88,10 @@ class ValidacaoQRCodeAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         return False
 
+    def delete_model(self, request, obj):
+        contadores.apagar_validacoes(ValidacaoQRCode.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        contadores.apagar_validacoes(queryset)
+
 admin.site.register(PasseFacil, PasseFacilAdmin)
\ No newline at end of file
@@ -4,6 +4,9 @@ from django.contrib.auth.decorators import user_passes_test
 from django.http import JsonResponse
 from django.utils import timezone
 from .models import PasseFacil, ValidacaoQRCode
+from .codigos import formatar_codigo, resolver_codigo
+from .auditoria import registrar_validacao
+from . import contadores
 from django.contrib import messages
 from django.db.models import Count, OuterRef, Subquery, Prefetch
 from datetime import timedelta
@@ -33,30 +36,17 @@ def admin_dashboard(request):
         )
     ).order_by('user__nome')
     
-    # Estatísticas
-    agora = timezone.now()
-    hoje = agora.date()
-    inicio_dia = timezone.make_aware(timezone.datetime.combine(hoje, timezone.datetime.min.time()))
-    
-    total_validacoes = ValidacaoQRCode.objects.filter(
-        data_validacao__gte=inicio_dia
-    ).count()
-    
-    validas = ValidacaoQRCode.objects.filter(
-        valido=True,
-        data_validacao__gte=inicio_dia
-    ).count()
-    
-    invalidas = total_validacoes - validas
+    # Estatísticas do dia (contadores incrementais, sem varrer as validações)
+    resumo = contadores.resumo_dia()
     
     # Adiciona o CSRF token ao contexto
     from django.template.context_processors import csrf
     context = {
         'validacoes_recentes': validacoes_recentes,
         'passes': passes,  # Adiciona a lista de passes ao contexto
-        'total_validacoes': total_validacoes,
-        'validas': validas,
-        'invalidas': invalidas,
+        'total_validacoes': resumo['total'],
+        'validas': resumo['validas'],
+        'invalidas': resumo['invalidas'],
         'ultimas_validacoes': validacoes_recentes,
     }
     # Adiciona o token CSRF ao contexto
@@ -76,36 +66,21 @@ def validar_qr_code(request):
     View para validação de QR Code no painel de administração.
     Suporta tanto requisições AJAX quanto requisições normais.
     """
-    # Cálculo das estatísticas
-    agora = timezone.now()
-    hoje = agora.date()
-    inicio_dia = timezone.make_aware(timezone.datetime.combine(hoje, timezone.datetime.min.time()))
-    
-    total_validacoes = ValidacaoQRCode.objects.filter(
-        data_validacao__gte=inicio_dia
-    ).count()
-    
-    validas = ValidacaoQRCode.objects.filter(
-        valido=True,
-        data_validacao__gte=inicio_dia
-    ).count()
-    
-    invalidas = total_validacoes - validas
-    
-    # Últimas 10 validações
-    ultimas_validacoes = ValidacaoQRCode.objects.select_related(
-        'passe_facil__user'
-    ).order_by('-data_validacao')[:10]
-    
     if request.method == 'GET':
+        # Estatísticas do dia (contadores incrementais) e últimas 10 validações
+        resumo = contadores.resumo_dia()
+        ultimas_validacoes = ValidacaoQRCode.objects.select_related(
+            'passe_facil__user'
+        ).order_by('-data_validacao')[:10]
+        
         # Exibe o formulário de validação
         return render(request, 'admin/passefacil/validar_qr_code.html', {
             'title': 'Validar QR Code',
             'opts': PasseFacil._meta,
             'has_permission': True,
-            'total_validacoes': total_validacoes,
-            'validas': validas,
-            'invalidas': invalidas,
+            'total_validacoes': resumo['total'],
+            'validas': resumo['validas'],
+            'invalidas': resumo['invalidas'],
             'ultimas_validacoes': ultimas_validacoes,
         })
     
@@ -117,19 +92,15 @@ def validar_qr_code(request):
         return redirect('admin:passefacil_validar_qr_code')
     
     try:
-        # Normaliza o código para UUID (aceita com ou sem hífens)
-        import uuid
-        try:
-            codigo_uuid = uuid.UUID(codigo)
-        except ValueError:
-            codigo_uuid = uuid.UUID(hex=codigo.replace('-', ''))
+        # Normaliza o código (UUID com ou sem hífens, ou código dinâmico) e
+        # consulta o índice em memória, recorrendo ao banco apenas em caso de falta
+        codigo_lido = formatar_codigo(codigo)
+        entrada = resolver_codigo(codigo)
 
-        try:
-            passe = PasseFacil.objects.get(codigo=codigo_uuid)
-        except PasseFacil.DoesNotExist:
+        if entrada is None:
             # Registra tentativa inválida
-            ValidacaoQRCode.objects.create(
-                codigo=str(codigo),
+            registrar_validacao(
+                codigo=str(codigo)[:36],
                 valido=False,
                 ip_address=request.META.get('REMOTE_ADDR', '0.0.0.0'),
             )
@@ -137,34 +108,34 @@ def validar_qr_code(request):
             return redirect('admin:passefacil_validar_qr_code')
         
         # Verifica se o passe está ativo
-        if not passe.ativo:
-            ValidacaoQRCode.objects.create(
-                passe_facil=passe,
-                codigo=str(codigo_uuid),
+        if not entrada.ativo:
+            registrar_validacao(
+                passe_facil_id=entrada.passe_id,
+                codigo=codigo_lido,
                 valido=False,
                 ip_address=request.META.get('REMOTE_ADDR', '0.0.0.0'),
             )
             messages.error(request, f'Passe inativo para o código: {codigo}')
             return redirect('admin:passefacil_validar_qr_code')
         
-        # Cria o registro de validação
-        validacao = ValidacaoQRCode(
-            passe_facil=passe,
-            codigo=str(codigo_uuid),
+        # Cria o registro de validação na hora: a resposta traz o id e os
+        # totais do dia já contando esta leitura
+        validacao = registrar_validacao(
+            sincrono=True,
+            passe_facil_id=entrada.passe_id,
+            codigo=codigo_lido,
             valido=True,
             ip_address=request.META.get('REMOTE_ADDR', '0.0.0.0')
         )
-        validacao.save()
         
-        # Atualiza a data de atualização do passe
-        passe.data_atualizacao = timezone.now()
-        passe.save()
+        # Atualiza a data de atualização do passe (update direto: o código não
+        # muda, então o índice continua válido)
+        PasseFacil.objects.filter(pk=entrada.passe_id).update(data_atualizacao=timezone.now())
         
         # Prepara a mensagem de sucesso
         # Preferir campo customizado 'nome'; fallback para get_full_name e, por fim, email
-        user = passe.user
-        usuario_nome = (getattr(user, 'nome', '') or user.get_full_name() or '').strip() or user.email
-        mensagem = f'Validação realizada com sucesso para: {usuario_nome} (Código: {str(codigo_uuid)})'
+        usuario_nome = entrada.nome
+        mensagem = f'Validação realizada com sucesso para: {usuario_nome} (Código: {codigo_lido})'
         
         messages.success(
             request, 
@@ -173,62 +144,39 @@ def validar_qr_code(request):
         )
         
         # Atualiza as estatísticas para a resposta
-        total_validacoes = ValidacaoQRCode.objects.filter(
-            data_validacao__gte=inicio_dia
-        ).count()
-        
-        validas = ValidacaoQRCode.objects.filter(
-            valido=True,
-            data_validacao__gte=inicio_dia
-        ).count()
-        
-        invalidas = total_validacoes - validas
+        resumo = contadores.resumo_dia()
         
         # Se for uma requisição AJAX, retorna JSON
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             # Garante que temos o nome do usuário
             if not usuario_nome or usuario_nome == '':
-                usuario_nome = f"Usuário {passe.user.id}"
-            
-            # Log para depuração
-            print("\n[DEBUG] Dados do usuário a serem retornados:")
-            print(f"- Nome: {usuario_nome}")
-            print(f"- Email: {passe.user.email}")
-            print(f"- ID: {passe.user.id}")
-            print(f"- Usuário completo: {passe.user}")
+                usuario_nome = f"Usuário {entrada.user_id}"
             
             try:
-                # Tenta obter o nome preferido
-                nome_completo = (getattr(user, 'nome', '') or user.get_full_name() or '').strip() or user.email
-                print(f"- Nome preferido: {nome_completo}")
+                nome_completo = usuario_nome
                 
                 # Cria o dicionário de resposta com os dados do usuário
                 response_data = {
                     'valido': True,
                     'mensagem': f'Passe válido para {nome_completo}',
                     'usuario': {
-                        'id': passe.user.id,
+                        'id': entrada.user_id,
                         'nome': nome_completo,
-                        'username': getattr(passe.user, 'username', '') or '',
-                        'email': passe.user.email,
-                        'first_name': passe.user.first_name or '',
-                        'last_name': passe.user.last_name or ''
+                        'username': entrada.username,
+                        'email': entrada.email,
+                        'first_name': entrada.first_name,
+                        'last_name': entrada.last_name
                     },
-                    'codigo': str(codigo_uuid),
+                    'codigo': codigo_lido,
                     'validacao_id': validacao.id,
                     'data_validacao': validacao.data_validacao.strftime('%d/%m/%Y %H:%M:%S'),
                     'estatisticas': {
-                        'total': total_validacoes,
-                        'validas': validas,
-                        'invalidas': invalidas
+                        'total': resumo['total'],
+                        'validas': resumo['validas'],
+                        'invalidas': resumo['invalidas']
                     }
                 }
                 
-                # Log da resposta completa
-                print("\n[DEBUG] Resposta JSON a ser enviada:")
-                import json
-                print(json.dumps(response_data, indent=2, ensure_ascii=False))
-                
                 return JsonResponse(response_data)
                 
             except Exception as e:
@@ -15,6 +15,11 @@ urlpatterns = [
     
     # API Passe Fácil
     path('validar-qr/', api_views.ValidarQRCodeAPIView.as_view(), name='validar_qr'),
+    path('validar-lote/', api_views.ValidarLoteAPIView.as_view(), name='validar_lote'),
     path('gerar-qr/', api_views.GerarQRCodeAPIView.as_view(), name='gerar_qr'),
     path('ultimas-validacoes/', api_views.UltimasValidacoesAPIView.as_view(), name='ultimas_validacoes'),
+    
+    # Validação offline nas estações de leitura
+    path('offline/pacote/', api_views.PacoteOfflineAPIView.as_view(), name='pacote_offline'),
+    path('offline/validacoes/', api_views.ValidacoesOfflineAPIView.as_view(), name='validacoes_offline'),
 ]
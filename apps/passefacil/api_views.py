@@ -1,15 +1,21 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.authentication import SessionAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.throttling import UserRateThrottle
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_cookie
 from django.views.decorators.csrf import csrf_exempt
+from django.utils.dateparse import parse_datetime
+from django.core.exceptions import ImproperlyConfigured
 import logging
 
+from .codigos import MODO_TOTP, codigo_exibido, modo_codigo
 from .services import PasseFacilService
+from . import protecao
 from .models import ValidacaoQRCode, PasseFacil
 
 logger = logging.getLogger(__name__)
@@ -35,24 +41,12 @@ class ValidarQRCodeAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Obtém o endereço IP do cliente
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        ip_address = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
+        # Obtém o endereço IP do cliente (REMOTE_ADDR ou o informado pelos proxies confiáveis)
+        ip_address = protecao.ip_cliente(request)
         
         try:
-            # Valida o código usando o serviço
-            valido, mensagem = PasseFacilService.validar_codigo(codigo, request.user)
-
-            # Garante que o usuário possui um PasseFacil para registrar a tentativa
-            passe_facil, _ = PasseFacil.objects.get_or_create(user=request.user, defaults={'ativo': True})
-
-            # Registra a tentativa de validação
-            ValidacaoQRCode.objects.create(
-                passe_facil=passe_facil,
-                codigo=codigo,
-                valido=valido,
-                ip_address=ip_address
-            )
+            # Valida o código usando o serviço (que também registra a tentativa)
+            valido, mensagem = PasseFacilService.validar_codigo(codigo, request.user, ip_address=ip_address)
             
             if valido:
                 nome_preferido = (getattr(request.user, 'nome', '') or request.user.get_full_name() or '').strip() or request.user.email
@@ -66,6 +60,7 @@ class ValidarQRCodeAPIView(APIView):
                     }
                 })
             else:
+                protecao.registrar_falha(ip_address)
                 return Response(
                     {'valido': False, 'erro': mensagem}, 
                     status=status.HTTP_400_BAD_REQUEST
@@ -78,6 +73,49 @@ class ValidarQRCodeAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class ValidarLoteAPIView(APIView):
+    """
+    Valida em uma única chamada os códigos enfileirados por uma estação de leitura.
+    Corpo: ``{"codigos": ["<uuid>", ...]}``; retorna um resultado por código, na
+    mesma ordem. Não dispara notificações: as leituras já aconteceram.
+    """
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, format=None):
+        codigos = request.data.get('codigos') if isinstance(request.data, dict) else None
+        if not isinstance(codigos, list) or not codigos:
+            return Response(
+                {'erro': 'Envie uma lista não vazia em "codigos"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(codigos) > PasseFacilService.LOTE_MAX_CODIGOS:
+            return Response(
+                {'erro': f'Máximo de {PasseFacilService.LOTE_MAX_CODIGOS} códigos por chamada'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        ip_address = protecao.ip_cliente(request)
+        
+        try:
+            resultados = PasseFacilService.validar_lote([str(c) for c in codigos], ip_address=ip_address)
+        except Exception as e:
+            logger.error(f"Erro ao validar lote de QR Codes: {str(e)}")
+            return Response(
+                {'erro': 'Erro ao processar a validação'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        protecao.registrar_falha(
+            ip_address,
+            sum(1 for r in resultados if not r['valido'])
+        )
+        return Response({
+            'total': len(resultados),
+            'validos': sum(1 for r in resultados if r['valido']),
+            'resultados': resultados,
+        })
+
 class GerarQRCodeAPIView(APIView):
     """
     API para geração de QR Code com autenticação de sessão
@@ -98,6 +136,17 @@ class GerarQRCodeAPIView(APIView):
                 passe.ativo = True
                 passe.save()
             
+            # No modo totp o código vem da janela de tempo, sem escrita no banco
+            if modo_codigo() == MODO_TOTP:
+                codigo, tempo_restante = codigo_exibido(passe)
+                return Response({
+                    'status': 'success',
+                    'codigo': codigo,
+                    'tempo_restante': tempo_restante,
+                    'data_atualizacao': passe.data_atualizacao.isoformat(),
+                    'novo': created
+                })
+            
             # Gera um novo código
             novo_codigo = passe.gerar_novo_codigo()
             
@@ -158,3 +207,77 @@ class UltimasValidacoesAPIView(APIView):
                 {'erro': 'Erro ao buscar validações'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class PacoteOfflineAPIView(APIView):
+    """
+    Exporta o pacote assinado para validação offline nas estações de leitura.
+    Use ``?desde=<versao>`` para receber apenas as alterações (delta).
+    """
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+    throttle_classes = []
+    
+    def get(self, request, format=None):
+        desde = request.query_params.get('desde')
+        if desde:
+            desde = parse_datetime(desde)
+            if desde is None:
+                return Response(
+                    {'erro': 'Parâmetro "desde" inválido'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        try:
+            dados, pacote = PasseFacilService.gerar_pacote_offline(desde=desde)
+        except ImproperlyConfigured as e:
+            logger.error(str(e))
+            return Response(
+                {'erro': 'Validação offline não configurada', 'detalhe': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return Response({
+            'versao': dados['versao'],
+            'desde': dados['desde'],
+            'total': len(dados['passes']),
+            'pacote': pacote,
+        })
+
+
+class ValidacoesOfflineAPIView(APIView):
+    """
+    Recebe em lote as validações registradas pelas estações enquanto offline.
+    Corpo: ``{"validacoes": [{"codigo", "usuario_id", "valido", "data_validacao", "ip_address"}, ...]}``
+    """
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+    throttle_classes = []
+    
+    def post(self, request, format=None):
+        registros = request.data.get('validacoes') if isinstance(request.data, dict) else None
+        if not isinstance(registros, list):
+            return Response(
+                {'erro': 'Envie uma lista em "validacoes"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(registros) > PasseFacilService.OFFLINE_MAX_VALIDACOES:
+            return Response(
+                {'erro': f'Máximo de {PasseFacilService.OFFLINE_MAX_VALIDACOES} validações por envio'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            gravados, erros = PasseFacilService.importar_validacoes_offline(registros)
+        except Exception as e:
+            logger.error(f"Erro ao importar validações offline: {str(e)}")
+            return Response(
+                {'erro': 'Erro ao importar validações'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return Response({
+            'status': 'success',
+            'recebidas': len(registros),
+            'gravadas': gravados,
+            'erros': erros,
+        })
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class PassefacilConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.passefacil'
\ No newline at end of file
+    name = 'apps.passefacil'
+
+    def ready(self):
+        from . import signals  # noqa: F401
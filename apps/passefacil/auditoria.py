@@ -0,0 +1,169 @@
+# apps/passefacil/auditoria.py
+"""
+Gravação em lote (write-behind) dos registros de ``ValidacaoQRCode``.
+
+Cada leitura de QR Code gera um registro de auditoria. Por padrão
+(``PASSEFACIL_AUDITORIA_ASSINCRONA = False``) cada registro é gravado na hora,
+com um INSERT síncrono por leitura.
+
+Com ``PASSEFACIL_AUDITORIA_ASSINCRONA = True`` os registros são acumulados em
+memória e gravados com ``bulk_create`` quando o lote atinge
+``PASSEFACIL_AUDITORIA_LOTE`` registros ou quando passam
+``PASSEFACIL_AUDITORIA_INTERVALO`` segundos, o que vier antes, evitando que
+cada leitura dispute o lock de escrita do SQLite com o resto da aplicação. Os
+pendentes são gravados também no encerramento do processo (``atexit``). Se o
+buffer chega a ``PASSEFACIL_AUDITORIA_MAX_PENDENTES``, as leituras seguintes
+voltam a ser gravadas na hora até o gravador esvaziá-lo.
+
+Quem precisa do registro gravado chama com ``sincrono=True`` e grava na hora
+em qualquer modo; é o caso da validação pelo admin, que devolve o id e os
+totais do dia. Em todos os casos os contadores do painel (``contadores.py``)
+são atualizados junto com a gravação.
+
+No modo assíncrono os pendentes ficam só na memória do processo: um
+encerramento abrupto (``SIGKILL``, queda do servidor) perde até um lote,
+pois o ``atexit`` não roda.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .contadores import gravar_validacoes, incrementar
+from .models import ValidacaoQRCode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOTE = 100
+DEFAULT_INTERVALO = 2.0
+DEFAULT_MAX_PENDENTES = 5000
+
+
+class RegistroValidacoes:
+    """Buffer de validações pendentes com gravação periódica em lote."""
+
+    def __init__(self, tamanho_lote=DEFAULT_LOTE, intervalo=DEFAULT_INTERVALO,
+                 max_pendentes=DEFAULT_MAX_PENDENTES):
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.max_pendentes = max_pendentes
+        self._pendentes = []
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+
+    @property
+    def assincrono(self):
+        return getattr(settings, 'PASSEFACIL_AUDITORIA_ASSINCRONA', False)
+
+    def registrar(self, sincrono=False, **campos):
+        """
+        Enfileira uma validação e retorna a instância (ainda sem ``id`` quando
+        a gravação for adiada). Com ``sincrono=True`` grava na hora.
+        """
+        validacao = ValidacaoQRCode(**campos)
+        if sincrono or not self.assincrono:
+            self._salvar(validacao)
+            return validacao
+
+        with self._lock:
+            if len(self._pendentes) >= self.max_pendentes:
+                # Buffer cheio: o gravador não está acompanhando, grava direto
+                sincrono = True
+            else:
+                sincrono = False
+                self._pendentes.append(validacao)
+                cheio = len(self._pendentes) >= self.tamanho_lote
+
+        if sincrono:
+            self._salvar(validacao)
+            return validacao
+
+        self._garantir_thread()
+        if cheio:
+            self._acordar.set()
+        return validacao
+
+    def pendentes(self):
+        return len(self._pendentes)
+
+    def flush(self):
+        """Grava todos os registros pendentes. Retorna quantos foram gravados."""
+        with self._lock:
+            lote, self._pendentes = self._pendentes, []
+        if not lote:
+            return 0
+        return self._gravar(lote)
+
+    def _salvar(self, validacao):
+        with transaction.atomic():
+            validacao.save()
+            incrementar([validacao])
+
+    def _gravar(self, lote):
+        gravados = 0
+        for inicio in range(0, len(lote), self.tamanho_lote):
+            parte = lote[inicio:inicio + self.tamanho_lote]
+            try:
+                gravar_validacoes(parte)
+                gravados += len(parte)
+            except Exception as e:
+                # Um registro inválido não pode derrubar o lote inteiro
+                logger.warning(f"Falha no bulk_create de validações, gravando uma a uma: {e}")
+                for validacao in parte:
+                    try:
+                        validacao.pk = None
+                        self._salvar(validacao)
+                        gravados += 1
+                    except Exception as erro:
+                        logger.error(f"Validação descartada ({validacao.codigo}): {erro}")
+        return gravados
+
+    def _garantir_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._loop, name='passefacil-auditoria', daemon=True
+            )
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erro ao gravar validações pendentes: {e}")
+            finally:
+                # A thread tem a própria conexão; não a mantém aberta entre lotes
+                connection.close()
+
+
+_registro = None
+_registro_lock = threading.Lock()
+
+
+def get_registro():
+    """Retorna o gravador de validações do processo."""
+    global _registro
+    if _registro is None:
+        with _registro_lock:
+            if _registro is None:
+                _registro = RegistroValidacoes(
+                    tamanho_lote=getattr(settings, 'PASSEFACIL_AUDITORIA_LOTE', DEFAULT_LOTE),
+                    intervalo=getattr(settings, 'PASSEFACIL_AUDITORIA_INTERVALO', DEFAULT_INTERVALO),
+                    max_pendentes=getattr(settings, 'PASSEFACIL_AUDITORIA_MAX_PENDENTES', DEFAULT_MAX_PENDENTES),
+                )
+                atexit.register(_registro.flush)
+    return _registro
+
+
+def registrar_validacao(sincrono=False, **campos):
+    """Atalho para ``get_registro().registrar(...)``."""
+    return get_registro().registrar(sincrono=sincrono, **campos)
@@ -0,0 +1,136 @@
+# apps/passefacil/codigos.py
+"""
+Códigos exibidos no QR Code do Passe Fácil.
+
+Dois modos, escolhidos por ``settings.PASSEFACIL_MODO_CODIGO``:
+
+- ``uuid`` (padrão): o código é o ``PasseFacil.codigo``, trocado no banco a
+  cada rotação (``atualizar_qr_code`` / ``GerarQRCodeAPIView``).
+- ``totp``: o código é derivado do ``secret_totp`` do passe e da janela de
+  tempo atual (``PasseFacilService.TOTP_INTERVAL``), sem nenhuma escrita no
+  banco na rotação. A validação recalcula a assinatura para a janela lida.
+
+Formato do código dinâmico (até 36 caracteres, cabe em
+``ValidacaoQRCode.codigo``)::
+
+    T<user_id hex>.<janela hex>.<assinatura>
+
+onde ``assinatura`` são os 16 primeiros dígitos hex de
+``HMAC-SHA256(secret_totp, "<user_id>:<janela>")``. São aceitos a janela
+atual e a anterior, de modo que um código vale por até dois intervalos.
+"""
+import hashlib
+import hmac
+
+import pyotp
+from django.conf import settings
+from django.utils import timezone
+
+from .indice import get_indice, normalizar_codigo
+
+MODO_UUID = 'uuid'
+MODO_TOTP = 'totp'
+
+PREFIXO = 'T'
+TAMANHO_ASSINATURA = 16
+# Janelas anteriores à atual ainda aceitas na validação
+TOLERANCIA_JANELAS = 1
+
+
+def modo_codigo():
+    return getattr(settings, 'PASSEFACIL_MODO_CODIGO', MODO_UUID)
+
+
+def _intervalo():
+    from .services import PasseFacilService
+    return PasseFacilService.TOTP_INTERVAL
+
+
+def _totp(secret):
+    return pyotp.TOTP(secret, interval=_intervalo())
+
+
+def _assinar(secret, user_id, janela):
+    mensagem = f'{user_id}:{janela}'.encode()
+    digest = hmac.new(_totp(secret).byte_secret(), mensagem, hashlib.sha256).hexdigest()
+    return digest[:TAMANHO_ASSINATURA]
+
+
+def eh_dinamico(codigo):
+    return str(codigo).strip().startswith(PREFIXO)
+
+
+def gerar_codigo_dinamico(user_id, secret, instante=None):
+    """Retorna ``(codigo, segundos_restantes)`` para a janela de ``instante``."""
+    instante = instante or timezone.now()
+    janela = _totp(secret).timecode(instante)
+    intervalo = _intervalo()
+    restante = intervalo - int(instante.timestamp()) % intervalo
+    return f'{PREFIXO}{user_id:x}.{janela:x}.{_assinar(secret, user_id, janela)}', restante
+
+
+def ler_codigo_dinamico(codigo):
+    """
+    Separa ``(user_id, janela, assinatura)`` de um código dinâmico.
+    Levanta ``ValueError`` se o formato for inválido.
+    """
+    partes = str(codigo).strip()[len(PREFIXO):].split('.')
+    if len(partes) != 3 or len(partes[2]) != TAMANHO_ASSINATURA:
+        raise ValueError(f'Código dinâmico inválido: {codigo}')
+    return int(partes[0], 16), int(partes[1], 16), partes[2].lower()
+
+
+def formatar_codigo(codigo):
+    """
+    Forma canônica do código para os registros de validação.
+    Levanta ``ValueError`` se o código não estiver em nenhum dos formatos.
+    """
+    if eh_dinamico(codigo):
+        ler_codigo_dinamico(codigo)
+        return str(codigo).strip()
+    return str(normalizar_codigo(codigo))
+
+
+def resolver_codigo(codigo, instante=None):
+    """
+    Retorna a ``EntradaPasse`` do código lido ou ``None`` se ele não
+    pertencer a nenhum passe (ou tiver expirado). Levanta ``ValueError`` se o
+    código estiver malformado.
+
+    Códigos dinâmicos são sempre aceitos; códigos UUID apenas no modo ``uuid``,
+    já que no modo ``totp`` o UUID do passe nunca muda.
+    """
+    if not eh_dinamico(codigo):
+        if modo_codigo() == MODO_TOTP:
+            normalizar_codigo(codigo)
+            return None
+        return get_indice().buscar(codigo)
+
+    user_id, janela, assinatura = ler_codigo_dinamico(codigo)
+    entrada = get_indice().buscar_usuario(user_id)
+    if entrada is None or not entrada.secret_totp:
+        return None
+
+    atual = _totp(entrada.secret_totp).timecode(instante or timezone.now())
+    if not atual - TOLERANCIA_JANELAS <= janela <= atual:
+        return None
+    if not hmac.compare_digest(_assinar(entrada.secret_totp, user_id, janela), assinatura):
+        return None
+    return entrada
+
+
+def codigo_exibido(passe, instante=None):
+    """
+    Código a ser exibido no QR Code do passe e segundos até a próxima troca.
+
+    No modo ``totp`` o segredo é criado na primeira chamada (única escrita);
+    depois disso a rotação não toca no banco.
+    """
+    if modo_codigo() != MODO_TOTP:
+        return str(passe.codigo).replace('-', ''), passe.tempo_restante
+
+    if not passe.secret_totp:
+        passe.secret_totp = pyotp.random_base32()
+        passe.ultima_geracao = timezone.now()
+        passe.save(update_fields=['secret_totp', 'ultima_geracao', 'data_atualizacao'])
+    return gerar_codigo_dinamico(passe.user_id, passe.secret_totp, instante)
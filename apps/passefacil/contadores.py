@@ -0,0 +1,176 @@
+# apps/passefacil/contadores.py
+"""
+Contadores de validações por dia/hora usados pelos painéis do Passe Fácil.
+
+Em vez de ``count()`` e ``GROUP BY`` sobre ``ValidacaoQRCode`` a cada
+carregamento do painel, cada gravação de validações incrementa
+``ContadorValidacoes`` (uma linha por hora local). Um dia tem no máximo 24
+linhas, então os totais do painel custam o mesmo com 10 ou 10 milhões de
+validações.
+
+Todo código que grava ``ValidacaoQRCode`` em lote deve passar por
+``gravar_validacoes``; gravações avulsas chamam ``incrementar`` depois do
+``save()``. Para apagar validações, use ``apagar_validacoes``, que desconta
+os totais com uma consulta agregada (``descontar``) antes do ``DELETE``; a
+exclusão de um ``PasseFacil`` (e do usuário) desconta as suas validações
+por um sinal ``pre_delete`` do passe, e o ``DELETE`` em cascata continua
+sem carregar as validações. ``recalcular`` refaz os contadores a partir da
+tabela de validações, para corrigir divergências: roda pelo comando
+``recalcular_contadores`` e diariamente pela tarefa
+``recalcular_contadores_validacao``.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractHour, Greatest, TruncDate
+from django.utils import timezone
+
+from .models import ContadorValidacoes, ValidacaoQRCode
+
+
+def _chave(data_validacao):
+    local = timezone.localtime(data_validacao) if timezone.is_aware(data_validacao) else data_validacao
+    return local.date(), local.hour
+
+
+def _totais_por_hora(validacoes):
+    """``{(data, hora): (validas, invalidas)}`` das validações."""
+    totais = Counter()
+    for validacao in validacoes:
+        chave = _chave(validacao.data_validacao)
+        totais[chave + (bool(validacao.valido),)] += 1
+
+    por_hora = {}
+    for (data, hora, valido), quantidade in totais.items():
+        validas, invalidas = por_hora.get((data, hora), (0, 0))
+        if valido:
+            validas += quantidade
+        else:
+            invalidas += quantidade
+        por_hora[(data, hora)] = (validas, invalidas)
+    return por_hora
+
+
+def _totais_no_banco(validacoes):
+    """``{(data, hora): (validas, invalidas)}`` de um queryset, agregado no banco (hora local)."""
+    linhas = (
+        validacoes.order_by()
+        .annotate(dia=TruncDate('data_validacao'), hora_local=ExtractHour('data_validacao'))
+        .values('dia', 'hora_local')
+        .annotate(validas=Count('id', filter=Q(valido=True)), invalidas=Count('id', filter=Q(valido=False)))
+    )
+    return {(l['dia'], l['hora_local']): (l['validas'], l['invalidas']) for l in linhas}
+
+
+def incrementar(validacoes):
+    """Soma as validações (instâncias já gravadas) aos contadores de cada hora."""
+    for (data, hora), (validas, invalidas) in _totais_por_hora(validacoes).items():
+        _somar(data, hora, validas, invalidas)
+
+
+def _subtrair(totais):
+    for (data, hora), (validas, invalidas) in totais.items():
+        ContadorValidacoes.objects.filter(data=data, hora=hora).update(
+            validas=Greatest(F('validas') - validas, 0),
+            invalidas=Greatest(F('invalidas') - invalidas, 0),
+        )
+
+
+def descontar(queryset):
+    """Subtrai dos contadores as validações do queryset, que serão apagadas."""
+    _subtrair(_totais_no_banco(queryset))
+
+
+def apagar_validacoes(queryset):
+    """Desconta e apaga as validações do queryset na mesma transação. Retorna o ``delete()``."""
+    with transaction.atomic():
+        descontar(queryset)
+        return queryset.delete()
+
+
+def _somar(data, hora, validas, invalidas):
+    campos = {'validas': F('validas') + validas, 'invalidas': F('invalidas') + invalidas}
+    if ContadorValidacoes.objects.filter(data=data, hora=hora).update(**campos):
+        return
+    try:
+        with transaction.atomic():
+            ContadorValidacoes.objects.create(data=data, hora=hora, validas=validas, invalidas=invalidas)
+    except IntegrityError:
+        # Outro processo criou a linha da hora entre o UPDATE e o INSERT
+        ContadorValidacoes.objects.filter(data=data, hora=hora).update(**campos)
+
+
+def gravar_validacoes(validacoes, batch_size=None):
+    """``bulk_create`` das validações e incremento dos contadores na mesma transação."""
+    with transaction.atomic():
+        criadas = ValidacaoQRCode.objects.bulk_create(validacoes, batch_size=batch_size)
+        incrementar(criadas)
+    return criadas
+
+
+def resumo_dia(data=None):
+    """Totais de um dia (hoje, por padrão): ``{'total', 'validas', 'invalidas'}``."""
+    data = data or timezone.localdate()
+    somas = ContadorValidacoes.objects.filter(data=data).aggregate(
+        validas=Sum('validas'), invalidas=Sum('invalidas')
+    )
+    validas = somas['validas'] or 0
+    invalidas = somas['invalidas'] or 0
+    return {'total': validas + invalidas, 'validas': validas, 'invalidas': invalidas}
+
+
+def por_dia(inicio, fim):
+    """Totais por dia entre ``inicio`` e ``fim`` (inclusive), com zeros nos dias sem validações."""
+    linhas = {
+        linha['data']: linha
+        for linha in ContadorValidacoes.objects.filter(data__gte=inicio, data__lte=fim)
+        .values('data').annotate(validas=Sum('validas'), invalidas=Sum('invalidas'))
+    }
+    resultado = []
+    for i in range((fim - inicio).days + 1):
+        data = inicio + timedelta(days=i)
+        linha = linhas.get(data, {})
+        validas = linha.get('validas') or 0
+        invalidas = linha.get('invalidas') or 0
+        resultado.append({'data': data, 'total': validas + invalidas, 'validas': validas, 'invalidas': invalidas})
+    return resultado
+
+
+def por_hora(data=None):
+    """Lista de 24 itens com os totais de cada hora do dia."""
+    data = data or timezone.localdate()
+    linhas = {c.hora: c for c in ContadorValidacoes.objects.filter(data=data)}
+    return [
+        {
+            'hora': hora,
+            'validas': linhas[hora].validas if hora in linhas else 0,
+            'invalidas': linhas[hora].invalidas if hora in linhas else 0,
+        }
+        for hora in range(24)
+    ]
+
+
+def primeiro_dia():
+    """Data da validação mais antiga contabilizada, ou ``None``."""
+    return ContadorValidacoes.objects.order_by('data').values_list('data', flat=True).first()
+
+
+def recalcular():
+    """Apaga e refaz todos os contadores a partir de ``ValidacaoQRCode``."""
+    with transaction.atomic():
+        # Trava os contadores antes de ler as validações: gravações simultâneas
+        # esperam o commit para incrementar. No SQLite o DELETE já segura a
+        # escrita no banco até o fim da transação.
+        list(ContadorValidacoes.objects.select_for_update().values_list('pk', flat=True))
+        ContadorValidacoes.objects.all().delete()
+        totais = _totais_no_banco(ValidacaoQRCode.objects.all())
+        ContadorValidacoes.objects.bulk_create(
+            [
+                ContadorValidacoes(data=data, hora=hora, validas=validas, invalidas=invalidas)
+                for (data, hora), (validas, invalidas) in totais.items()
+            ],
+            batch_size=500,
+        )
+    return len(totais)
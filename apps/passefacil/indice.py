@@ -0,0 +1,398 @@
+# apps/passefacil/indice.py
+"""
+Índice em memória código -> passe usado na validação dos QR Codes.
+
+Cada leitura na catraca precisa apenas do id do passe, de um resumo do
+usuário e do status ``ativo``. O índice guarda essas informações por código
+e é mantido coerente pelos sinais de ``PasseFacil`` (ver ``signals.py``),
+de modo que uma validação vira uma consulta a dicionário mais um INSERT.
+
+O backend é configurável via ``settings.PASSEFACIL_INDICE_BACKEND``:
+
+- ``apps.passefacil.indice.MemoriaIndiceBackend`` (padrão): dicionário local
+  ao processo; a leitura é só uma consulta ao dicionário. Cada usuário tem
+  uma versão (resumo do conteúdo da entrada) publicada no cache do Django
+  (``settings.PASSEFACIL_INDICE_CACHE``) e conferida no máximo a cada
+  ``PASSEFACIL_INDICE_VERIFICACAO`` segundos por entrada. Rotacionar ou
+  desativar um passe troca a versão apenas desse usuário, e os demais
+  workers descartam a entrada antiga na conferência seguinte.
+
+  A invalidação entre processos exige um backend compartilhado em
+  ``CACHES`` (Redis/Memcached). Com o cache local padrão (LocMem), cada
+  processo só enxerga as próprias alterações, e os outros ficam com a
+  entrada antiga por até ``PASSEFACIL_INDICE_TTL`` segundos.
+- ``apps.passefacil.indice.CacheIndiceBackend``: usa o cache do Django
+  (``settings.PASSEFACIL_INDICE_CACHE``), compartilhado entre workers quando
+  o cache for Redis/Memcached.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from dataclasses import dataclass, asdict, astuple, field
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = 'apps.passefacil.indice.MemoriaIndiceBackend'
+
+# Tempo máximo (em segundos) que uma entrada permanece no índice sem ser
+# revalidada no banco. Igual ao intervalo de rotação do QR Code.
+DEFAULT_TTL = 60
+
+# Intervalo (em segundos) entre conferências da versão de uma entrada no
+# cache compartilhado: a defasagem máxima entre workers após uma alteração.
+DEFAULT_VERIFICACAO = 5
+
+
+@dataclass(frozen=True)
+class EntradaPasse:
+    """Resumo de um Passe Fácil suficiente para responder a uma validação."""
+    passe_id: int
+    user_id: int
+    nome: str
+    email: str
+    first_name: str
+    last_name: str
+    ativo: bool
+    username: str = ''
+    # Usado apenas no modo de códigos dinâmicos (ver ``codigos.py``)
+    secret_totp: str = field(default='', repr=False)
+
+    @classmethod
+    def from_passe(cls, passe):
+        user = passe.user
+        nome = (getattr(user, 'nome', '') or user.get_full_name() or '').strip() or user.email
+        return cls(
+            passe_id=passe.pk,
+            user_id=user.pk,
+            nome=nome,
+            email=user.email,
+            first_name=user.first_name or '',
+            last_name=user.last_name or '',
+            ativo=passe.ativo,
+            username=getattr(user, 'username', '') or '',
+            secret_totp=passe.secret_totp or '',
+        )
+
+
+def normalizar_codigo(codigo):
+    """
+    Converte o código lido (com ou sem hífens) em ``uuid.UUID``.
+    Levanta ``ValueError`` se o código não for um UUID válido.
+    """
+    if isinstance(codigo, uuid.UUID):
+        return codigo
+    codigo = str(codigo).strip()
+    try:
+        return uuid.UUID(codigo)
+    except ValueError:
+        return uuid.UUID(hex=codigo.replace('-', ''))
+
+
+class BaseIndiceBackend:
+    """Interface dos backends do índice de códigos."""
+
+    def get(self, codigo):
+        """Retorna a ``EntradaPasse`` do código (``uuid.UUID``) ou ``None``."""
+        raise NotImplementedError
+
+    def set(self, codigo, entrada):
+        """Associa o código à entrada, substituindo o código anterior do usuário."""
+        raise NotImplementedError
+
+    def get_usuario(self, user_id):
+        """Retorna a ``EntradaPasse`` do usuário pelo id ou ``None``."""
+        raise NotImplementedError
+
+    def get_varios(self, codigos):
+        """Retorna ``{codigo: EntradaPasse}`` dos códigos presentes no backend."""
+        encontrados = {}
+        for codigo in codigos:
+            entrada = self.get(codigo)
+            if entrada is not None:
+                encontrados[codigo] = entrada
+        return encontrados
+
+    def atualizar(self, codigo, entrada):
+        """Grava a entrada após uma alteração do passe (invalida as cópias de outros processos)."""
+        self.set(codigo, entrada)
+
+    def remover_usuario(self, user_id):
+        """Remove a entrada do usuário, qualquer que seja o código atual."""
+        raise NotImplementedError
+
+    def limpar(self):
+        raise NotImplementedError
+
+
+class MemoriaIndiceBackend(BaseIndiceBackend):
+    """
+    Backend em dicionário local ao processo, protegido por lock. A versão de
+    cada usuário, conferida no cache compartilhado no máximo a cada
+    ``verificacao`` segundos, é um resumo do conteúdo da entrada: salvar o
+    passe sem mudar o que o índice guarda não invalida os outros processos.
+    """
+
+    PREFIXO_VERSAO = 'passefacil:indice:versao'
+
+    def __init__(self, ttl=DEFAULT_TTL, alias=None, verificacao=None):
+        self.ttl = ttl
+        self.verificacao = (
+            verificacao if verificacao is not None
+            else getattr(settings, 'PASSEFACIL_INDICE_VERIFICACAO', DEFAULT_VERIFICACAO)
+        )
+        self.cache = caches[alias or getattr(settings, 'PASSEFACIL_INDICE_CACHE', 'default')]
+        self._lock = threading.Lock()
+        self._por_codigo = {}   # codigo -> (entrada, expira_em, versao, verificar_em)
+        self._por_usuario = {}  # user_id -> codigo
+
+    def _chave_versao(self, user_id):
+        return f'{self.PREFIXO_VERSAO}:{user_id}'
+
+    @staticmethod
+    def _versao(codigo, entrada):
+        return hashlib.sha1(repr((codigo.hex, astuple(entrada))).encode()).hexdigest()
+
+    def _descartar(self, codigo, item):
+        with self._lock:
+            if self._por_codigo.get(codigo) is item:
+                del self._por_codigo[codigo]
+                if self._por_usuario.get(item[0].user_id) == codigo:
+                    del self._por_usuario[item[0].user_id]
+
+    def _conferir(self, codigo, item, versao):
+        """Confirma a entrada com a ``versao`` lida do cache ou a descarta."""
+        if versao != item[2]:
+            self._descartar(codigo, item)
+            return None
+        with self._lock:
+            if self._por_codigo.get(codigo) is item:
+                self._por_codigo[codigo] = item[:3] + (time.monotonic() + self.verificacao,)
+        return item[0]
+
+    def _local(self, codigo, agora):
+        """``(entrada, precisa_conferir)`` do dicionário, ou ``(None, False)``."""
+        item = self._por_codigo.get(codigo)
+        if item is None:
+            return None, False
+        if item[1] < agora:
+            self._descartar(codigo, item)
+            return None, False
+        return item, item[3] < agora
+
+    def get(self, codigo):
+        item, conferir = self._local(codigo, time.monotonic())
+        if item is None:
+            return None
+        if not conferir:
+            return item[0]
+        return self._conferir(codigo, item, self.cache.get(self._chave_versao(item[0].user_id)))
+
+    def get_varios(self, codigos):
+        agora = time.monotonic()
+        encontrados = {}
+        pendentes = {}
+        for codigo in codigos:
+            item, conferir = self._local(codigo, agora)
+            if item is None:
+                continue
+            if conferir:
+                pendentes[codigo] = item
+            else:
+                encontrados[codigo] = item[0]
+        if pendentes:
+            versoes = self.cache.get_many([self._chave_versao(item[0].user_id) for item in pendentes.values()])
+            for codigo, item in pendentes.items():
+                entrada = self._conferir(codigo, item, versoes.get(self._chave_versao(item[0].user_id)))
+                if entrada is not None:
+                    encontrados[codigo] = entrada
+        return encontrados
+
+    def _guardar(self, codigo, entrada, versao):
+        agora = time.monotonic()
+        with self._lock:
+            anterior = self._por_usuario.get(entrada.user_id)
+            if anterior is not None and anterior != codigo:
+                self._por_codigo.pop(anterior, None)
+            self._por_codigo[codigo] = (entrada, agora + self.ttl, versao, agora + self.verificacao)
+            self._por_usuario[entrada.user_id] = codigo
+
+    def set(self, codigo, entrada):
+        # Carregada do banco: publica a versão só se ainda não houver uma; se a
+        # publicada for outra, a entrada é recarregada na próxima conferência
+        versao = self._versao(codigo, entrada)
+        self.cache.add(self._chave_versao(entrada.user_id), versao, self.ttl)
+        self._guardar(codigo, entrada, versao)
+
+    def atualizar(self, codigo, entrada):
+        versao = self._versao(codigo, entrada)
+        self.cache.set(self._chave_versao(entrada.user_id), versao, self.ttl)
+        self._guardar(codigo, entrada, versao)
+
+    def get_usuario(self, user_id):
+        codigo = self._por_usuario.get(user_id)
+        return self.get(codigo) if codigo is not None else None
+
+    def remover_usuario(self, user_id):
+        # Sem versão publicada, os outros processos descartam a entrada na próxima conferência
+        self.cache.delete(self._chave_versao(user_id))
+        with self._lock:
+            codigo = self._por_usuario.pop(user_id, None)
+            if codigo is not None:
+                self._por_codigo.pop(codigo, None)
+
+    def limpar(self):
+        with self._lock:
+            self._por_codigo.clear()
+            self._por_usuario.clear()
+
+
+class CacheIndiceBackend(BaseIndiceBackend):
+    """Backend sobre o cache do Django, compartilhado entre processos."""
+
+    PREFIXO = 'passefacil:indice'
+
+    def __init__(self, ttl=DEFAULT_TTL, alias=None):
+        self.ttl = ttl
+        self.cache = caches[alias or getattr(settings, 'PASSEFACIL_INDICE_CACHE', 'default')]
+
+    def _chave_codigo(self, codigo):
+        return f'{self.PREFIXO}:codigo:{codigo.hex}'
+
+    def _chave_usuario(self, user_id):
+        return f'{self.PREFIXO}:usuario:{user_id}'
+
+    def get(self, codigo):
+        dados = self.cache.get(self._chave_codigo(codigo))
+        return EntradaPasse(**dados) if dados else None
+
+    def set(self, codigo, entrada):
+        chave_usuario = self._chave_usuario(entrada.user_id)
+        anterior = self.cache.get(chave_usuario)
+        if anterior and anterior != codigo.hex:
+            self.cache.delete(f'{self.PREFIXO}:codigo:{anterior}')
+        self.cache.set_many({
+            self._chave_codigo(codigo): asdict(entrada),
+            chave_usuario: codigo.hex,
+        }, self.ttl)
+
+    def get_usuario(self, user_id):
+        anterior = self.cache.get(self._chave_usuario(user_id))
+        return self.get(uuid.UUID(hex=anterior)) if anterior else None
+
+    def remover_usuario(self, user_id):
+        chave_usuario = self._chave_usuario(user_id)
+        anterior = self.cache.get(chave_usuario)
+        chaves = [chave_usuario]
+        if anterior:
+            chaves.append(f'{self.PREFIXO}:codigo:{anterior}')
+        self.cache.delete_many(chaves)
+
+    def limpar(self):
+        # O cache pode ser compartilhado com outras aplicações; as entradas
+        # restantes expiram sozinhas pelo TTL.
+        pass
+
+
+class IndicePasseFacil:
+    """Fachada do índice: consulta o backend e recorre ao banco em caso de falta."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def buscar(self, codigo):
+        """
+        Retorna a ``EntradaPasse`` correspondente ao código ou ``None`` se o
+        código não pertencer a nenhum passe. Levanta ``ValueError`` se o
+        código não for um UUID.
+        """
+        codigo = normalizar_codigo(codigo)
+        entrada = self.backend.get(codigo)
+        if entrada is not None:
+            return entrada
+
+        from .models import PasseFacil
+        passe = PasseFacil.objects.select_related('user').filter(codigo=codigo).first()
+        if passe is None:
+            return None
+        entrada = EntradaPasse.from_passe(passe)
+        self.backend.set(codigo, entrada)
+        return entrada
+
+    def buscar_usuario(self, user_id):
+        """
+        Retorna a ``EntradaPasse`` do usuário, usada pelos códigos dinâmicos
+        que trazem o id do usuário em vez do código do passe.
+        """
+        entrada = self.backend.get_usuario(user_id)
+        if entrada is not None:
+            return entrada
+
+        from .models import PasseFacil
+        passe = PasseFacil.objects.select_related('user').filter(user_id=user_id).first()
+        if passe is None:
+            return None
+        entrada = EntradaPasse.from_passe(passe)
+        self.backend.set(normalizar_codigo(passe.codigo), entrada)
+        return entrada
+
+    def buscar_varios(self, codigos):
+        """
+        Resolve vários códigos de uma vez. Retorna ``{uuid.UUID: EntradaPasse}``
+        apenas para os códigos encontrados; os que faltam no backend são
+        carregados com uma única consulta ``codigo__in``. Códigos que não são
+        UUID são ignorados.
+        """
+        normalizados = set()
+        for codigo in codigos:
+            try:
+                normalizados.add(normalizar_codigo(codigo))
+            except ValueError:
+                continue
+        encontrados = self.backend.get_varios(normalizados)
+        faltantes = normalizados - encontrados.keys()
+
+        if faltantes:
+            from .models import PasseFacil
+            for passe in PasseFacil.objects.select_related('user').filter(codigo__in=faltantes):
+                entrada = EntradaPasse.from_passe(passe)
+                self.backend.set(passe.codigo, entrada)
+                encontrados[passe.codigo] = entrada
+        return encontrados
+
+    def registrar(self, passe):
+        """Atualiza o índice a partir de uma instância salva de ``PasseFacil``."""
+        from .models import PasseFacil
+        if not passe.codigo:
+            self.backend.remover_usuario(passe.user_id)
+            return
+        if not PasseFacil.user.is_cached(passe):
+            # Evita uma consulta extra só para aquecer o índice: a próxima
+            # leitura do código carrega a entrada do banco.
+            self.backend.remover_usuario(passe.user_id)
+            return
+        self.backend.atualizar(normalizar_codigo(passe.codigo), EntradaPasse.from_passe(passe))
+
+    def remover_usuario(self, user_id):
+        self.backend.remover_usuario(user_id)
+
+    def limpar(self):
+        self.backend.limpar()
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def get_indice():
+    """Retorna a instância (por processo) do índice configurado."""
+    global _indice
+    if _indice is None:
+        with _indice_lock:
+            if _indice is None:
+                backend_path = getattr(settings, 'PASSEFACIL_INDICE_BACKEND', DEFAULT_BACKEND)
+                ttl = getattr(settings, 'PASSEFACIL_INDICE_TTL', DEFAULT_TTL)
+                _indice = IndicePasseFacil(import_string(backend_path)(ttl=ttl))
+    return _indice
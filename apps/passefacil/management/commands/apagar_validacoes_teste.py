@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone
+from apps.passefacil.contadores import apagar_validacoes
 from apps.passefacil.models import ValidacaoQRCode
 
 class Command(BaseCommand):
@@ -73,7 +74,7 @@ class Command(BaseCommand):
                 validacoes_falha = queryset.filter(valido=False).count()
                 
                 # Apagar
-                apagadas, _ = queryset.delete()
+                apagadas, _ = apagar_validacoes(queryset)
                 
                 self.stdout.write(
                     self.style.SUCCESS(f'✅ {apagadas} validações apagadas com sucesso!')
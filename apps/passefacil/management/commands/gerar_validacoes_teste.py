@@ -5,6 +5,7 @@ from django.contrib.auth import get_user_model
 from django.db import transaction, models
 from django.utils import timezone
 from apps.passefacil.models import PasseFacil, ValidacaoQRCode
+from apps.passefacil.contadores import incrementar
 
 User = get_user_model()
 
@@ -135,6 +136,7 @@ class Command(BaseCommand):
                         valido=sucesso,
                         ip_address=ip_address
                     )
+                    incrementar([validacao])
                     
                     criadas += 1
                     
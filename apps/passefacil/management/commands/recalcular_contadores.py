@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.passefacil.contadores import recalcular
+
+
+class Command(BaseCommand):
+    help = 'Refaz os contadores de validações do painel a partir dos registros de ValidacaoQRCode'
+
+    def handle(self, *args, **options):
+        horas = recalcular()
+        self.stdout.write(self.style.SUCCESS(f'Contadores recalculados ({horas} horas com validações).'))
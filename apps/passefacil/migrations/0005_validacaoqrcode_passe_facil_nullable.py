@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passefacil', '0004_alter_validacaoqrcode_data_validacao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='validacaoqrcode',
+            name='passe_facil',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='validacoes', to='passefacil.passefacil'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:29
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def preencher_contadores(apps, schema_editor):
+    """Contabiliza as validações já existentes."""
+    ValidacaoQRCode = apps.get_model('passefacil', 'ValidacaoQRCode')
+    ContadorValidacoes = apps.get_model('passefacil', 'ContadorValidacoes')
+
+    totais = {}
+    for data_validacao, valido in ValidacaoQRCode.objects.values_list(
+        'data_validacao', 'valido'
+    ).iterator(chunk_size=5000):
+        local = timezone.localtime(data_validacao) if timezone.is_aware(data_validacao) else data_validacao
+        chave = (local.date(), local.hour)
+        validas, invalidas = totais.get(chave, (0, 0))
+        totais[chave] = (validas + 1, invalidas) if valido else (validas, invalidas + 1)
+
+    ContadorValidacoes.objects.bulk_create(
+        [
+            ContadorValidacoes(data=data, hora=hora, validas=validas, invalidas=invalidas)
+            for (data, hora), (validas, invalidas) in totais.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passefacil', '0005_validacaoqrcode_passe_facil_nullable'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorValidacoes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('hora', models.PositiveSmallIntegerField()),
+                ('validas', models.PositiveIntegerField(default=0)),
+                ('invalidas', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de validações',
+                'verbose_name_plural': 'Contadores de validações',
+                'ordering': ['data', 'hora'],
+                'constraints': [models.UniqueConstraint(fields=('data', 'hora'), name='contador_validacoes_data_hora_unico')],
+            },
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
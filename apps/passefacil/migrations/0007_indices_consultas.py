@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passefacil', '0006_contadorvalidacoes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='passefacil',
+            index=models.Index(fields=['codigo'], name='passefacil_codigo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='validacaoqrcode',
+            index=models.Index(fields=['-data_validacao'], name='validacao_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='validacaoqrcode',
+            index=models.Index(condition=models.Q(('valido', True)), fields=['-data_validacao'], name='validacao_valida_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='validacaoqrcode',
+            index=models.Index(fields=['passe_facil', '-data_validacao'], name='validacao_passe_data_idx'),
+        ),
+    ]
@@ -16,6 +16,12 @@ class PasseFacil(models.Model):
     tentativas_validacao = models.PositiveIntegerField(default=0, help_text='Número de tentativas de validação')
     ultima_tentativa = models.DateTimeField(null=True, blank=True, help_text='Data da última tentativa de validação')
 
+    class Meta:
+        indexes = [
+            # Leitura do QR Code na catraca
+            models.Index(fields=['codigo'], name='passefacil_codigo_idx'),
+        ]
+
     def __str__(self):
         return f"Passe Fácil - {self.user.get_full_name() or self.user.username}"
 
@@ -33,7 +39,8 @@ class PasseFacil(models.Model):
     def validar_codigo(self, codigo):
         if str(self.codigo) == str(codigo) and self.ativo:
             # Registrar a validação
-            ValidacaoQRCode.objects.create(
+            from .auditoria import registrar_validacao
+            registrar_validacao(
                 passe_facil=self,
                 codigo=codigo,
                 valido=True
@@ -42,7 +49,8 @@ class PasseFacil(models.Model):
         return False
 
 class ValidacaoQRCode(models.Model):
-    passe_facil = models.ForeignKey(PasseFacil, on_delete=models.CASCADE, related_name='validacoes')
+    # Nulo quando o código lido não pertence a nenhum passe
+    passe_facil = models.ForeignKey(PasseFacil, on_delete=models.CASCADE, related_name='validacoes', null=True, blank=True)
     codigo = models.CharField(max_length=36)
     data_validacao = models.DateTimeField(default=timezone.now)
     valido = models.BooleanField(default=False)
@@ -50,9 +58,47 @@ class ValidacaoQRCode(models.Model):
 
     class Meta:
         ordering = ['-data_validacao']
+        indexes = [
+            # Últimas validações e filtros por período nos painéis
+            models.Index(fields=['-data_validacao'], name='validacao_data_idx'),
+            # Parcial: o SQLite não usa um índice comum para "WHERE valido"
+            models.Index(
+                fields=['-data_validacao'],
+                condition=models.Q(valido=True),
+                name='validacao_valida_data_idx',
+            ),
+            # Última validação de cada passe
+            models.Index(fields=['passe_facil', '-data_validacao'], name='validacao_passe_data_idx'),
+        ]
         verbose_name = 'Validação de QR Code'
         verbose_name_plural = 'Validações de QR Code'
 
     def __str__(self):
         status = "Válido" if self.valido else "Inválido"
-        return f"Validação {self.id} - {self.passe_facil.user} - {status} - {self.data_validacao}"
\ No newline at end of file
+        usuario = self.passe_facil.user if self.passe_facil_id else 'Código desconhecido'
+        return f"Validação {self.id} - {usuario} - {status} - {self.data_validacao}"
+
+class ContadorValidacoes(models.Model):
+    """
+    Totais de validações por dia e hora (horário local), mantidos de forma
+    incremental a cada gravação de ``ValidacaoQRCode`` (ver ``contadores.py``).
+    """
+    data = models.DateField()
+    hora = models.PositiveSmallIntegerField()
+    validas = models.PositiveIntegerField(default=0)
+    invalidas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['data', 'hora']
+        constraints = [
+            models.UniqueConstraint(fields=['data', 'hora'], name='contador_validacoes_data_hora_unico'),
+        ]
+        verbose_name = 'Contador de validações'
+        verbose_name_plural = 'Contadores de validações'
+
+    @property
+    def total(self):
+        return self.validas + self.invalidas
+
+    def __str__(self):
+        return f"{self.data:%d/%m/%Y} {self.hora:02d}h - {self.validas} válidas / {self.invalidas} inválidas"
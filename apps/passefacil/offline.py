@@ -0,0 +1,210 @@
+# apps/passefacil/offline.py
+"""
+Validação offline do Passe Fácil nas estações de leitura.
+
+Só funciona com códigos dinâmicos (``PASSEFACIL_MODO_CODIGO = 'totp'``, ver
+``codigos.py``): no modo ``uuid`` o código muda no banco a cada rotação e a
+estação sem rede não tem como acompanhá-lo, então o pacote não é gerado.
+
+O servidor exporta um pacote assinado (``django.core.signing``, compactado)
+com os passes: para cada usuário, o segredo TOTP cifrado com a chave das
+estações, o nome de exibição e o status. As estações carregam o pacote com
+``ValidadorOffline``, aplicam deltas periódicos, recalculam a assinatura dos
+códigos lidos localmente quando a rede cai (a mesma derivação de
+``codigos._assinar``, com a janela atual e as ``tolerancia`` anteriores) e
+depois enviam os registros acumulados em lote para
+``/api/passefacil/offline/validacoes/``.
+
+O segredo vai cifrado com XOR sobre um fluxo ``HMAC-SHA256(chave, nonce)``,
+com um nonce por passe: o arquivo do pacote e o estado salvo pela estação
+não trazem os segredos em claro.
+
+Este módulo não importa modelos: pode ser usado pela estação apenas com o
+Django instalado, sem banco e sem ``settings`` configurado.
+
+Formato do pacote (antes da assinatura)::
+
+    {
+        "formato": 2,
+        "versao": "2025-11-10T12:00:00.123456+00:00",   # maior data_atualizacao
+        "desde": null | "<versao anterior>",            # preenchido nos deltas
+        "intervalo": 30,                                 # segundos por janela
+        "tolerancia": 1,                                 # janelas anteriores aceitas
+        "passes": [[user_id, nonce, segredo_cifrado, nome, ativo], ...]
+    }
+
+Passes excluídos não aparecem nos deltas; só saem da estação no próximo
+snapshot completo.
+"""
+import hashlib
+import hmac
+import json
+from datetime import datetime, timezone as dt_timezone
+
+from django.core import signing
+
+FORMATO = 2
+SALT = 'apps.passefacil.offline'
+# Formato dos códigos dinâmicos (``codigos.py``): T<user_id hex>.<janela hex>.<assinatura>
+PREFIXO_DINAMICO = 'T'
+TAMANHO_ASSINATURA = 16
+
+
+def _fluxo(chave, nonce, user_id, tamanho):
+    blocos = b''
+    contador = 0
+    while len(blocos) < tamanho:
+        mensagem = f'{SALT}:{nonce}:{user_id}:{contador}'.encode()
+        blocos += hmac.new(chave.encode(), mensagem, hashlib.sha256).digest()
+        contador += 1
+    return blocos[:tamanho]
+
+
+def cifrar_segredo(segredo, chave, user_id, nonce):
+    """Cifra o segredo TOTP (bytes) para o pacote. Retorna hex."""
+    return bytes(a ^ b for a, b in zip(segredo, _fluxo(chave, nonce, user_id, len(segredo)))).hex()
+
+
+def decifrar_segredo(cifrado, chave, user_id, nonce):
+    dados = bytes.fromhex(cifrado)
+    return bytes(a ^ b for a, b in zip(dados, _fluxo(chave, nonce, user_id, len(dados))))
+
+
+def assinar_pacote(dados, chave):
+    return signing.dumps(dados, key=chave, salt=SALT, compress=True)
+
+
+def abrir_pacote(pacote, chave, max_age=None):
+    """
+    Verifica a assinatura e retorna os dados do pacote.
+    Levanta ``django.core.signing.BadSignature`` se o pacote foi adulterado.
+    """
+    return signing.loads(pacote, key=chave, salt=SALT, max_age=max_age, fallback_keys=[])
+
+
+class ValidadorOffline:
+    """Validador local usado pelas estações de leitura sem conexão."""
+
+    def __init__(self, chave, max_age=None):
+        self.chave = chave
+        self.max_age = max_age
+        self.versao = None
+        self.intervalo = None
+        self.tolerancia = 0
+        self._passes = {}  # user_id -> (nonce, segredo_cifrado, nome)
+        self._validacoes = []
+
+    def carregar(self, pacote):
+        """Substitui o estado local por um snapshot completo."""
+        dados = abrir_pacote(pacote, self.chave, self.max_age)
+        self._verificar_formato(dados)
+        self._passes.clear()
+        self._aplicar(dados)
+
+    def aplicar_delta(self, pacote):
+        """Aplica as alterações publicadas desde a versão carregada."""
+        dados = abrir_pacote(pacote, self.chave, self.max_age)
+        self._verificar_formato(dados)
+        self._aplicar(dados)
+
+    def _verificar_formato(self, dados):
+        if dados.get('formato') != FORMATO:
+            raise ValueError(f"Formato de pacote não suportado: {dados.get('formato')}")
+
+    def _aplicar(self, dados):
+        for user_id, nonce, segredo, nome, ativo in dados['passes']:
+            if ativo and segredo:
+                self._passes[user_id] = (nonce, segredo, nome)
+            else:
+                self._passes.pop(user_id, None)
+        if dados.get('versao'):
+            self.versao = dados['versao']
+        if dados.get('intervalo'):
+            self.intervalo = dados['intervalo']
+            self.tolerancia = dados.get('tolerancia', 0)
+
+    def __len__(self):
+        return len(self._passes)
+
+    def _identificar(self, codigo, instante):
+        """``user_id`` do código dinâmico lido, se for válido em ``instante``."""
+        texto = str(codigo).strip()
+        if not texto.startswith(PREFIXO_DINAMICO) or not self.intervalo:
+            return None
+        partes = texto[len(PREFIXO_DINAMICO):].split('.')
+        if len(partes) != 3 or len(partes[2]) != TAMANHO_ASSINATURA:
+            return None
+        try:
+            user_id, janela = int(partes[0], 16), int(partes[1], 16)
+        except ValueError:
+            return None
+        item = self._passes.get(user_id)
+        if item is None:
+            return None
+
+        atual = int(instante.timestamp() // self.intervalo)
+        if not atual - self.tolerancia <= janela <= atual:
+            return None
+        nonce, cifrado, _ = item
+        segredo = decifrar_segredo(cifrado, self.chave, user_id, nonce)
+        esperada = hmac.new(segredo, f'{user_id}:{janela}'.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(esperada[:TAMANHO_ASSINATURA], partes[2].lower()):
+            return None
+        return user_id
+
+    def validar(self, codigo, data_validacao=None, ip_address=None):
+        """
+        Valida um código contra o snapshot e guarda o registro para envio
+        posterior. Retorna um dicionário no mesmo formato da API online.
+        """
+        data_validacao = data_validacao or datetime.now(dt_timezone.utc)
+        user_id = self._identificar(codigo, data_validacao)
+
+        self._validacoes.append({
+            'codigo': str(codigo)[:36],
+            'usuario_id': user_id,
+            'valido': user_id is not None,
+            'data_validacao': data_validacao.isoformat(),
+            'ip_address': ip_address,
+        })
+
+        if user_id is None:
+            return {'valido': False, 'mensagem': 'Código QR inválido ou expirado.'}
+        nome = self._passes[user_id][2]
+        return {
+            'valido': True,
+            'mensagem': f'Passe válido para {nome}',
+            'usuario': {'id': user_id, 'nome': nome},
+        }
+
+    def validacoes_pendentes(self):
+        return len(self._validacoes)
+
+    def exportar_validacoes(self, limpar=True):
+        """Retorna os registros acumulados no formato aceito pelo upload em lote."""
+        validacoes = list(self._validacoes)
+        if limpar:
+            self._validacoes.clear()
+        return {'validacoes': validacoes}
+
+    def salvar(self, caminho):
+        """Persiste o estado local (passes, ainda cifrados, e registros pendentes) em JSON."""
+        estado = {
+            'versao': self.versao,
+            'intervalo': self.intervalo,
+            'tolerancia': self.tolerancia,
+            'passes': [
+                [user_id, nonce, segredo, nome, True]
+                for user_id, (nonce, segredo, nome) in self._passes.items()
+            ],
+            'validacoes': self._validacoes,
+        }
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump(estado, arquivo, ensure_ascii=False)
+
+    def restaurar(self, caminho):
+        with open(caminho, encoding='utf-8') as arquivo:
+            estado = json.load(arquivo)
+        self._passes.clear()
+        self._aplicar(estado)
+        self._validacoes = estado.get('validacoes', [])
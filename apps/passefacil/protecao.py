@@ -0,0 +1,188 @@
+# apps/passefacil/protecao.py
+"""
+Proteção contra força bruta e reutilização de códigos na validação.
+
+Tudo fica no cache do Django (``PASSEFACIL_PROTECAO_CACHE``), sem consultas
+ao banco: com um backend compartilhado (Redis/Memcached) os limites valem
+para todos os workers; com o LocMem padrão, por processo.
+
+- Janela deslizante por IP (todas as leituras), por IP só com as leituras
+  inválidas (tentativas de adivinhar códigos) e por código. A janela é
+  aproximada com dois baldes fixos: o atual e o anterior, ponderado pela
+  fração da janela que ainda se sobrepõe.
+- Conjunto de códigos consumidos: um código aceito não é aceito de novo por
+  ``PASSEFACIL_REPLAY_SEGUNDOS`` (o mesmo QR Code apresentado duas vezes).
+
+As verificações rodam no ``ProtecaoValidacaoMiddleware``: os limites por IP
+antes da sessão e da autenticação; o limite por código e a reutilização só
+depois da autenticação e apenas para operadores autenticados (um anônimo não
+consome a cota de um código nem descobre que ele foi usado). As views apenas
+registram os resultados (``consumir`` e ``registrar_falha``).
+
+O IP vem do ``REMOTE_ADDR``; atrás de proxies, configure quantos são
+confiáveis em ``PASSEFACIL_PROXIES_CONFIAVEIS`` para usar o endereço que o
+proxy mais externo acrescentou ao ``X-Forwarded-For`` (os anteriores são
+enviados pelo cliente e não valem como identificação).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .codigos import formatar_codigo
+
+ESCOPO_IP = 'ip'
+ESCOPO_FALHAS_IP = 'falhas_ip'
+ESCOPO_CODIGO = 'codigo'
+
+DEFAULT_LIMITES = {
+    ESCOPO_IP: '120/min',
+    ESCOPO_FALHAS_IP: '30/min',
+    ESCOPO_CODIGO: '10/min',
+}
+DEFAULT_REPLAY_SEGUNDOS = 60
+
+DURACOES = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_limite(limite):
+    """``'120/min'`` -> ``(120, 60)``; ``None`` desativa o limite (mesmo formato do DRF)."""
+    if not limite:
+        return None
+    quantidade, periodo = limite.split('/')
+    return int(quantidade), DURACOES[periodo[0]]
+
+
+def ip_cliente(request):
+    """
+    IP do cliente: o ``REMOTE_ADDR`` ou, atrás de ``PASSEFACIL_PROXIES_CONFIAVEIS``
+    proxies, o endereço que o mais externo deles acrescentou ao ``X-Forwarded-For``.
+    """
+    proxies = getattr(settings, 'PASSEFACIL_PROXIES_CONFIAVEIS', 0)
+    if proxies:
+        enderecos = [e.strip() for e in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if e.strip()]
+        if len(enderecos) >= proxies:
+            return enderecos[-proxies]
+    return request.META.get('REMOTE_ADDR')
+
+
+def _cache():
+    return caches[getattr(settings, 'PASSEFACIL_PROTECAO_CACHE', 'default')]
+
+
+def _chave(*partes):
+    digest = hashlib.sha1(':'.join(str(p) for p in partes).encode()).hexdigest()
+    return f'passefacil:protecao:{digest}'
+
+
+def chave_codigo(codigo):
+    """Forma canônica do código usada nas chaves (a mesma gravada na validação)."""
+    try:
+        return formatar_codigo(codigo)
+    except ValueError:
+        return str(codigo).strip()[:64]
+
+
+class JanelaDeslizante:
+    """Contador de janela deslizante aproximada sobre o cache."""
+
+    def __init__(self, escopo, quantidade, janela):
+        self.escopo = escopo
+        self.quantidade = quantidade
+        self.janela = janela
+
+    def _baldes(self, identificador, agora):
+        balde = int(agora // self.janela)
+        return (
+            _chave(self.escopo, identificador, balde),
+            _chave(self.escopo, identificador, balde - 1),
+            (agora % self.janela) / self.janela,
+        )
+
+    def estimativa(self, identificador, agora=None):
+        agora = time.time() if agora is None else agora
+        atual, anterior, decorrido = self._baldes(identificador, agora)
+        valores = _cache().get_many([atual, anterior])
+        return valores.get(atual, 0) + valores.get(anterior, 0) * (1 - decorrido)
+
+    def excedido(self, identificador, agora=None):
+        return self.estimativa(identificador, agora) >= self.quantidade
+
+    def registrar(self, identificador, agora=None, quantidade=1):
+        agora = time.time() if agora is None else agora
+        atual, _, _ = self._baldes(identificador, agora)
+        cache = _cache()
+        cache.add(atual, 0, timeout=2 * self.janela)
+        try:
+            cache.incr(atual, quantidade)
+        except ValueError:
+            # A chave expirou entre o add e o incr
+            cache.set(atual, quantidade, timeout=2 * self.janela)
+
+    def segundos_restantes(self, agora=None):
+        agora = time.time() if agora is None else agora
+        return max(1, int(self.janela - agora % self.janela))
+
+
+def limitador(escopo):
+    """Limitador configurado em ``PASSEFACIL_LIMITES`` ou ``None`` se desativado."""
+    limites = {**DEFAULT_LIMITES, **getattr(settings, 'PASSEFACIL_LIMITES', {})}
+    limite = parse_limite(limites.get(escopo))
+    if limite is None:
+        return None
+    return JanelaDeslizante(escopo, *limite)
+
+
+def verificar(ip_address, codigo=None):
+    """
+    Verifica os limites da leitura e registra a tentativa.
+    Retorna ``None`` se a leitura pode seguir ou o número de segundos a
+    aguardar (``Retry-After``) se algum limite foi excedido.
+    """
+    agora = time.time()
+    contados = []
+    if ip_address:
+        contados.append((ESCOPO_IP, ip_address))
+    if codigo:
+        contados.append((ESCOPO_CODIGO, chave_codigo(codigo)))
+    verificados = contados + ([(ESCOPO_FALHAS_IP, ip_address)] if ip_address else [])
+
+    for escopo, identificador in verificados:
+        janela = limitador(escopo)
+        if janela is not None and janela.excedido(identificador, agora):
+            return janela.segundos_restantes(agora)
+
+    for escopo, identificador in contados:
+        janela = limitador(escopo)
+        if janela is not None:
+            janela.registrar(identificador, agora)
+    return None
+
+
+def registrar_falha(ip_address, quantidade=1):
+    """Conta leituras inválidas do IP (limite ``falhas_ip``)."""
+    janela = limitador(ESCOPO_FALHAS_IP)
+    if janela is not None and ip_address and quantidade:
+        janela.registrar(ip_address, quantidade=quantidade)
+
+
+def _replay_segundos():
+    return getattr(settings, 'PASSEFACIL_REPLAY_SEGUNDOS', DEFAULT_REPLAY_SEGUNDOS)
+
+
+def ja_utilizado(codigo):
+    if not _replay_segundos():
+        return False
+    return _cache().get(_chave('usado', chave_codigo(codigo))) is not None
+
+
+def consumir(codigo):
+    """
+    Marca o código como utilizado. Retorna ``False`` se ele já tinha sido
+    consumido (duas leituras simultâneas do mesmo QR Code).
+    """
+    segundos = _replay_segundos()
+    if not segundos:
+        return True
+    return _cache().add(_chave('usado', chave_codigo(codigo)), 1, timeout=segundos)
@@ -0,0 +1,165 @@
+# apps/passefacil/qr.py
+"""
+Renderização e cache das imagens de QR Code do Passe Fácil.
+
+O cliente recarrega o QR Code a cada minuto, mas o código só muda quando é
+rotacionado. As imagens ficam em um cache LRU por processo, indexado por
+(usuário, tipo, formato) e validado pelo conteúdo codificado: se o código
+mudou, a entrada é renderizada de novo; os sinais de ``PasseFacil`` removem as
+entradas do usuário na rotação. O ``ETag`` depende apenas do conteúdo, então
+as views respondem ``304`` sem renderizar nada.
+
+Formatos:
+
+- ``png``: imagem PIL, como antes;
+- ``svg``: caminho SVG montado direto da matriz, sem PIL;
+- ``matriz``: JSON com as linhas de módulos (``"0110..."``) para clientes que
+  desenham o QR Code por conta própria.
+"""
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict, namedtuple
+
+import qrcode
+from django.conf import settings
+
+FORMATOS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'matriz': 'application/json',
+}
+
+# Tipos de QR Code gerados por usuário
+TIPO_PASSE = 'passe'    # código UUID exibido na catraca
+TIPO_TOTP = 'totp'      # URI de provisionamento do autenticador
+TIPOS = (TIPO_PASSE, TIPO_TOTP)
+
+BOX_SIZE = 10
+BORDA = 4
+DEFAULT_MAX_ITENS = 5000
+
+QRRenderizado = namedtuple('QRRenderizado', ['conteudo', 'content_type', 'etag'])
+
+
+def etag_qr(dados, formato='png'):
+    """ETag forte derivado do conteúdo codificado e do formato."""
+    digest = hashlib.sha1(f'{formato}:{dados}'.encode()).hexdigest()[:24]
+    return f'"qr-{digest}"'
+
+
+def montar_matriz(dados):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=BOX_SIZE,
+        border=BORDA,
+    )
+    qr.add_data(dados)
+    qr.make(fit=True)
+    return qr
+
+
+def _png(qr):
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _svg(matriz):
+    tamanho = len(matriz)
+    partes = []
+    for y, linha in enumerate(matriz):
+        x = 0
+        while x < tamanho:
+            if linha[x]:
+                inicio = x
+                while x < tamanho and linha[x]:
+                    x += 1
+                largura = x - inicio
+                partes.append(f'M{inicio} {y}h{largura}v1h-{largura}z')
+            else:
+                x += 1
+    lado = tamanho * BOX_SIZE
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {tamanho} {tamanho}" '
+        f'width="{lado}" height="{lado}" shape-rendering="crispEdges">'
+        f'<rect width="{tamanho}" height="{tamanho}" fill="#fff"/>'
+        f'<path d="{"".join(partes)}" fill="#000"/></svg>'
+    ).encode()
+
+
+def _matriz_json(matriz):
+    return json.dumps({
+        'tamanho': len(matriz),
+        'borda': BORDA,
+        'linhas': [''.join('1' if modulo else '0' for modulo in linha) for linha in matriz],
+    }).encode()
+
+
+def renderizar(dados, formato='png'):
+    """Renderiza o QR Code sem passar pelo cache."""
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato de QR Code não suportado: {formato}')
+    qr = montar_matriz(dados)
+    if formato == 'png':
+        conteudo = _png(qr)
+    elif formato == 'svg':
+        conteudo = _svg(qr.get_matrix())
+    else:
+        conteudo = _matriz_json(qr.get_matrix())
+    return QRRenderizado(conteudo, FORMATOS[formato], etag_qr(dados, formato))
+
+
+class CacheQRCode:
+    """Cache LRU das imagens renderizadas, uma entrada por (usuário, tipo, formato)."""
+
+    def __init__(self, max_itens=DEFAULT_MAX_ITENS):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()  # (user_id, tipo, formato) -> (dados, QRRenderizado)
+        self._lock = threading.Lock()
+
+    def obter(self, user_id, tipo, dados, formato='png'):
+        chave = (user_id, tipo, formato)
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None and item[0] == dados:
+                self._itens.move_to_end(chave)
+                return item[1]
+
+        renderizado = renderizar(dados, formato)
+        with self._lock:
+            self._itens[chave] = (dados, renderizado)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+        return renderizado
+
+    def remover_usuario(self, user_id):
+        with self._lock:
+            for tipo in TIPOS:
+                for formato in FORMATOS:
+                    self._itens.pop((user_id, tipo, formato), None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache_qr():
+    """Retorna o cache de QR Codes do processo."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheQRCode(getattr(settings, 'PASSEFACIL_QR_CACHE_MAX', DEFAULT_MAX_ITENS))
+    return _cache
@@ -1,12 +1,20 @@
+import ipaddress
 import pyotp
-import qrcode
 import base64
 import logging
-from io import BytesIO
+import secrets
 from datetime import timedelta
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from .models import PasseFacil, ValidacaoQRCode
+from .auditoria import registrar_validacao
+from .contadores import gravar_validacoes
+from .indice import get_indice, normalizar_codigo
+from .codigos import MODO_TOTP, TOLERANCIA_JANELAS, eh_dinamico, modo_codigo, resolver_codigo
+from .qr import TIPO_TOTP, get_cache_qr
+from .offline import FORMATO as FORMATO_OFFLINE, assinar_pacote, cifrar_segredo
 
 logger = logging.getLogger(__name__)
 
@@ -61,33 +69,21 @@ class PasseFacilService:
             issuer_name=issuer_name
         )
         
-        # Gera o QR Code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(provisioning_uri)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Converte para base64 para exibição no template
-        buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        # O PNG fica em cache enquanto o segredo não mudar
+        qr = get_cache_qr().obter(user.id, TIPO_TOTP, provisioning_uri, 'png')
+        img_str = base64.b64encode(qr.conteudo).decode()
         
         return f"data:image/png;base64,{img_str}"
     
     @classmethod
-    def validar_codigo(cls, codigo, user):
-        """Valida um código TOTP para o usuário"""
+    def validar_codigo(cls, codigo, user, ip_address=None):
+        """Valida um código TOTP para o usuário e registra a tentativa"""
         try:
             passe = PasseFacil.objects.get(user=user)
             
             # Verifica se o passe está ativo
             if not passe.ativo:
+                registrar_validacao(passe_facil=passe, codigo=codigo[:36], valido=False, ip_address=ip_address)
                 return False, "Passe Fácil desativado"
                 
             # Verifica se o código é válido
@@ -95,10 +91,11 @@ class PasseFacilService:
             is_valid = totp.verify(codigo)
             
             # Registra a tentativa de validação
-            ValidacaoQRCode.objects.create(
+            registrar_validacao(
                 passe_facil=passe,
                 codigo=codigo,
-                valido=is_valid
+                valido=is_valid,
+                ip_address=ip_address
             )
             
             if is_valid:
@@ -106,7 +103,194 @@ class PasseFacilService:
             return False, "Código inválido ou expirado"
             
         except PasseFacil.DoesNotExist:
+            registrar_validacao(codigo=codigo[:36], valido=False, ip_address=ip_address)
             return False, "Passe Fácil não encontrado"
         except Exception as e:
             logger.error(f"Erro ao validar código: {str(e)}")
             return False, "Erro ao processar a validação"
+    
+    # Limite de códigos aceitos por chamada da validação em lote
+    LOTE_MAX_CODIGOS = 1000
+    
+    @classmethod
+    def validar_lote(cls, codigos, ip_address=None):
+        """
+        Valida vários códigos de uma vez (fila de leituras das estações).
+        
+        Os códigos UUID são resolvidos pelo índice com no máximo uma consulta
+        ``codigo__in``; os dinâmicos (modo ``totp``) são verificados um a um
+        contra o índice. Todas as validações são gravadas com um único
+        ``bulk_create``, junto com o contador da hora (``contadores.py``).
+        Retorna a lista de resultados na ordem recebida.
+        """
+        if modo_codigo() == MODO_TOTP:
+            estaticos = []
+        else:
+            estaticos = [c for c in codigos if not eh_dinamico(c)]
+        entradas = get_indice().buscar_varios(estaticos)
+        agora = timezone.now()
+        
+        resultados = []
+        validacoes = []
+        for codigo in codigos:
+            try:
+                if eh_dinamico(codigo):
+                    entrada = resolver_codigo(codigo, agora)
+                else:
+                    entrada = entradas.get(normalizar_codigo(codigo))
+            except ValueError:
+                entrada = None
+            
+            if entrada is None:
+                resultado = {'codigo': codigo, 'valido': False, 'mensagem': 'Código QR inválido ou expirado.'}
+            elif not entrada.ativo:
+                resultado = {'codigo': codigo, 'valido': False, 'mensagem': 'Passe Fácil não está ativo.'}
+            else:
+                resultado = {
+                    'codigo': codigo,
+                    'valido': True,
+                    'mensagem': f'Passe válido para {entrada.nome}',
+                    'usuario': {'id': entrada.user_id, 'nome': entrada.nome},
+                }
+            resultados.append(resultado)
+            validacoes.append(ValidacaoQRCode(
+                passe_facil_id=entrada.passe_id if entrada else None,
+                codigo=str(codigo)[:36],
+                data_validacao=agora,
+                valido=resultado['valido'],
+                ip_address=ip_address,
+            ))
+        
+        gravar_validacoes(validacoes)
+        return resultados
+    
+    # Limite de registros aceitos por envio das estações offline
+    OFFLINE_MAX_VALIDACOES = 5000
+    
+    @classmethod
+    def chave_offline(cls):
+        """
+        Chave compartilhada com as estações para assinar os pacotes offline.
+        
+        Precisa ser exclusiva (``PASSEFACIL_OFFLINE_CHAVE``): quem verifica o
+        pacote também pode assiná-lo, e a ``SECRET_KEY`` assina sessões e
+        tokens de senha. Levanta ``ImproperlyConfigured`` se não estiver definida.
+        """
+        chave = getattr(settings, 'PASSEFACIL_OFFLINE_CHAVE', '')
+        if not chave or chave == settings.SECRET_KEY:
+            raise ImproperlyConfigured('Defina PASSEFACIL_OFFLINE_CHAVE (diferente da SECRET_KEY) para exportar o pacote offline.')
+        return chave
+    
+    @classmethod
+    def gerar_pacote_offline(cls, desde=None):
+        """
+        Gera o pacote assinado para validação offline.
+        
+        Sem ``desde`` retorna o snapshot completo dos passes ativos; com
+        ``desde`` (a ``versao`` de um pacote anterior) retorna apenas os passes
+        alterados desde então, incluindo os desativados.
+        
+        Exige os códigos dinâmicos (modo ``totp``): a estação recalcula o código
+        de cada janela a partir do segredo. Levanta ``ImproperlyConfigured`` no
+        modo ``uuid`` ou sem ``PASSEFACIL_OFFLINE_CHAVE``.
+        """
+        if modo_codigo() != MODO_TOTP:
+            raise ImproperlyConfigured(
+                'A validação offline exige PASSEFACIL_MODO_CODIGO = "totp": no modo "uuid" o código '
+                'muda no banco a cada rotação e a estação não tem como acompanhá-lo.'
+            )
+        chave = cls.chave_offline()
+        passes = PasseFacil.objects.select_related('user').only(
+            'id', 'secret_totp', 'ativo', 'data_atualizacao',
+            'user__id', 'user__nome', 'user__first_name', 'user__last_name', 'user__email',
+        ).order_by('data_atualizacao')
+        if desde:
+            passes = passes.filter(data_atualizacao__gte=desde)
+        else:
+            passes = passes.filter(ativo=True)
+        
+        itens = []
+        versao = desde
+        for passe in passes.iterator(chunk_size=2000):
+            user = passe.user
+            nome = (getattr(user, 'nome', '') or user.get_full_name() or '').strip() or user.email
+            # Sem segredo o passe ainda não exibiu nenhum código; entra no delta ao exibir
+            nonce = secrets.token_hex(8)
+            segredo = (
+                cifrar_segredo(pyotp.TOTP(passe.secret_totp).byte_secret(), chave, user.id, nonce)
+                if passe.secret_totp else ''
+            )
+            itens.append([user.id, nonce, segredo, nome, passe.ativo])
+            versao = passe.data_atualizacao
+        
+        dados = {
+            'formato': FORMATO_OFFLINE,
+            'versao': versao.isoformat() if hasattr(versao, 'isoformat') else versao,
+            'desde': desde.isoformat() if hasattr(desde, 'isoformat') else desde,
+            'intervalo': cls.TOTP_INTERVAL,
+            'tolerancia': TOLERANCIA_JANELAS,
+            'passes': itens,
+        }
+        return dados, assinar_pacote(dados, chave)
+    
+    @staticmethod
+    def _ip_valido(ip_address):
+        try:
+            return str(ipaddress.ip_address(ip_address)) if ip_address else None
+        except ValueError:
+            return None
+    
+    @classmethod
+    def importar_validacoes_offline(cls, registros):
+        """
+        Grava em lote as validações feitas offline pelas estações.
+        Retorna ``(gravados, erros)``, onde ``erros`` lista ``{'indice', 'erro'}``.
+        """
+        erros = []
+        validos = []
+        for indice, registro in enumerate(registros):
+            if not isinstance(registro, dict) or not registro.get('codigo'):
+                erros.append({'indice': indice, 'erro': 'Código não fornecido'})
+                continue
+            usuario_id = registro.get('usuario_id')
+            if usuario_id not in (None, ''):
+                try:
+                    # bool é int, mas True/False não identificam um usuário
+                    if isinstance(usuario_id, (bool, float)):
+                        raise TypeError
+                    usuario_id = int(usuario_id)
+                except (TypeError, ValueError):
+                    erros.append({'indice': indice, 'erro': 'usuario_id inválido'})
+                    continue
+            else:
+                usuario_id = None
+            try:
+                # Formato válido com data impossível (31/02) levanta ValueError
+                data_validacao = parse_datetime(str(registro.get('data_validacao') or ''))
+            except ValueError:
+                data_validacao = None
+            if data_validacao is None:
+                erros.append({'indice': indice, 'erro': 'data_validacao inválida'})
+                continue
+            if timezone.is_naive(data_validacao):
+                data_validacao = timezone.make_aware(data_validacao)
+            validos.append((registro, usuario_id, data_validacao))
+        
+        # Resolve os passes de todos os usuários do lote em uma única consulta
+        usuarios = {usuario_id for _, usuario_id, _ in validos if usuario_id is not None}
+        passes = dict(
+            PasseFacil.objects.filter(user_id__in=usuarios).values_list('user_id', 'id')
+        ) if usuarios else {}
+        
+        validacoes = [
+            ValidacaoQRCode(
+                passe_facil_id=passes.get(usuario_id),
+                codigo=str(registro['codigo'])[:36],
+                data_validacao=data_validacao,
+                valido=bool(registro.get('valido')) and usuario_id in passes,
+                ip_address=cls._ip_valido(registro.get('ip_address')),
+            )
+            for registro, usuario_id, data_validacao in validos
+        ]
+        gravar_validacoes(validacoes, batch_size=500)
+        return len(validacoes), erros
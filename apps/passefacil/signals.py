@@ -0,0 +1,41 @@
+# apps/passefacil/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from . import contadores
+from .indice import get_indice
+from .models import PasseFacil, ValidacaoQRCode
+from .qr import get_cache_qr
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=PasseFacil)
+def atualizar_indice_passe(sender, instance, **kwargs):
+    """Mantém o índice de códigos coerente após criar/rotacionar/desativar um passe."""
+    get_indice().registrar(instance)
+    get_cache_qr().remover_usuario(instance.user_id)
+
+
+@receiver(post_delete, sender=PasseFacil)
+def remover_indice_passe(sender, instance, **kwargs):
+    get_indice().remover_usuario(instance.user_id)
+    get_cache_qr().remover_usuario(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidar_indice_usuario(sender, instance, update_fields=None, **kwargs):
+    """Nome/email fazem parte da entrada do índice; recarrega na próxima leitura."""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    get_indice().remover_usuario(instance.pk)
+
+
+@receiver(pre_delete, sender=PasseFacil)
+def descontar_validacoes_do_passe(sender, instance, **kwargs):
+    """
+    Desconta dos contadores as validações que o passe leva em cascata, com uma
+    consulta agregada; as validações continuam apagadas sem serem carregadas.
+    """
+    contadores.descontar(ValidacaoQRCode.objects.filter(passe_facil_id=instance.pk))
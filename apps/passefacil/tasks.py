@@ -0,0 +1,51 @@
+# apps/passefacil/tasks.py
+"""
+Efeitos colaterais da validação do Passe Fácil, executados fora da
+requisição da catraca (ver ``apps/core/tarefas.py``).
+"""
+import logging
+
+from celery import shared_task
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.notificacoes.models import Notificacao
+from apps.notificacoes.push import send_push_to_user
+from apps.notificacoes.tempo_real import publicar_notificacao, publicar_validacao
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def notificar_validacao(user_id, ip_address=None, operador_id=None, data_validacao=None):
+    """Cria a notificação de validação para o usuário e envia o push."""
+    data = parse_datetime(data_validacao) if data_validacao else None
+    horario = timezone.localtime(data or timezone.now()).strftime("%d/%m/%Y %H:%M")
+
+    notificacao = Notificacao.objects.create(
+        titulo='Passe Fácil Validado',
+        mensagem=f'Seu código foi validado em {horario} (IP: {ip_address})',
+        tipo='success',
+        criado_por_id=operador_id
+    )
+    notificacao.usuarios.add(user_id)
+    publicar_notificacao(notificacao, [user_id])
+    publicar_validacao(user_id, (data or notificacao.criada_em).isoformat(), ip_address)
+
+    try:
+        send_push_to_user(
+            user_external_id=str(user_id),
+            title='Passe Fácil Validado',
+            message=f'Seu código foi validado em {horario}'
+        )
+    except Exception as push_error:
+        logger.warning(f"Erro ao enviar notificação push: {push_error}")
+    return notificacao.id
+
+
+@shared_task(ignore_result=True)
+def recalcular_contadores_validacao():
+    """Refaz os contadores do painel a partir das validações (corrige divergências)."""
+    from .contadores import recalcular
+
+    return recalcular()
@@ -1,3 +1,715 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+import pyotp
+
+from apps.notificacoes.models import Notificacao
+
+from . import contadores
+from .auditoria import RegistroValidacoes, registrar_validacao
+from .codigos import codigo_exibido, gerar_codigo_dinamico, ler_codigo_dinamico, resolver_codigo
+from .indice import IndicePasseFacil, MemoriaIndiceBackend, get_indice
+from .offline import ValidadorOffline
+from .protecao import JanelaDeslizante
+from .qr import get_cache_qr
+from .models import ContadorValidacoes, PasseFacil, ValidacaoQRCode
+from .services import PasseFacilService
+
+User = get_user_model()
+
+
+def _comandos(consultas):
+    """Comandos SQL executados, sem os SAVEPOINTs das transações aninhadas"""
+    return [
+        q['sql'].split()[0] for q in consultas.captured_queries
+        if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+    ]
+
+
+class IndicePasseFacilTest(TestCase):
+    def setUp(self):
+        get_indice().limpar()
+        self.user = User.objects.create_user(
+            email='participante@teste.com',
+            password='senha12345',
+            nome='Participante Teste'
+        )
+        self.passe = PasseFacil.objects.create(user=self.user)
+
+    def test_busca_carrega_do_banco_e_depois_usa_memoria(self):
+        """A primeira busca consulta o banco; as seguintes não"""
+        get_indice().limpar()
+        with self.assertNumQueries(1):
+            entrada = get_indice().buscar(self.passe.codigo)
+        self.assertEqual(entrada.passe_id, self.passe.id)
+        self.assertEqual(entrada.nome, 'Participante Teste')
+
+        with self.assertNumQueries(0):
+            entrada = get_indice().buscar(self.passe.codigo.hex)
+        self.assertEqual(entrada.user_id, self.user.id)
+
+    def test_rotacao_invalida_codigo_anterior(self):
+        """Gerar um novo código remove o antigo do índice"""
+        codigo_antigo = self.passe.codigo
+        get_indice().buscar(codigo_antigo)
+
+        codigo_novo = self.passe.gerar_novo_codigo()
+
+        self.assertIsNone(get_indice().buscar(codigo_antigo))
+        self.assertEqual(get_indice().buscar(codigo_novo).passe_id, self.passe.id)
+
+    def test_desativacao_e_exclusao_refletem_no_indice(self):
+        """Desativar ou excluir o passe atualiza o índice"""
+        codigo = self.passe.codigo
+        get_indice().buscar(codigo)
+
+        self.passe.ativo = False
+        self.passe.save()
+        self.assertFalse(get_indice().buscar(codigo).ativo)
+
+        self.passe.delete()
+        self.assertIsNone(get_indice().buscar(codigo))
+
+    def test_mudancas_invalidam_indice_de_outros_processos(self):
+        """Outro worker descarta a entrada após rotação ou desativação"""
+        outro = IndicePasseFacil(MemoriaIndiceBackend(verificacao=0))
+        codigo_antigo = self.passe.codigo
+        self.assertEqual(outro.buscar(codigo_antigo).passe_id, self.passe.id)
+
+        # Salvar sem mudar o conteúdo da entrada não invalida os outros processos
+        self.passe.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(outro.buscar(codigo_antigo).passe_id, self.passe.id)
+
+        codigo_novo = self.passe.gerar_novo_codigo()
+        self.assertIsNone(outro.buscar(codigo_antigo))
+
+        self.assertTrue(outro.buscar(codigo_novo).ativo)
+        self.passe.ativo = False
+        self.passe.save()
+        self.assertFalse(outro.buscar(codigo_novo).ativo)
+
+    def test_versao_conferida_a_cada_intervalo(self):
+        """Dentro do intervalo de conferência a leitura não consulta o cache"""
+        backend = MemoriaIndiceBackend(verificacao=60)
+        outro = IndicePasseFacil(backend)
+        outro.buscar(self.passe.codigo)
+        with mock.patch.object(backend.cache, 'get') as get:
+            self.assertEqual(outro.buscar(self.passe.codigo).passe_id, self.passe.id)
+        get.assert_not_called()
+
+    def test_alteracao_do_usuario_atualiza_resumo(self):
+        """Alterar o nome do usuário invalida a entrada"""
+        get_indice().buscar(self.passe.codigo)
+        self.user.nome = 'Nome Alterado'
+        self.user.save()
+        self.assertEqual(get_indice().buscar(self.passe.codigo).nome, 'Nome Alterado')
+
+
+@override_settings(PASSEFACIL_AUDITORIA_ASSINCRONA=False)
+class ValidarQRCodeViewTest(TestCase):
+    def setUp(self):
+        get_indice().limpar()
+        cache.clear()
+        self.operador = User.objects.create_user(
+            email='operador@teste.com',
+            password='senha12345',
+            nome='Operador'
+        )
+        self.user = User.objects.create_user(
+            email='participante@teste.com',
+            password='senha12345',
+            nome='Participante Teste'
+        )
+        self.passe = PasseFacil.objects.create(user=self.user)
+        self.client.force_login(self.operador)
+        self.url = reverse('passefacil:api_validar_qr_code')
+
+    def test_codigo_valido(self):
+        """Um código válido retorna os dados do usuário e registra a validação"""
+        response = self.client.get(self.url, {'codigo': self.passe.codigo.hex})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['valido'])
+        self.assertEqual(data['usuario']['id'], self.user.id)
+        self.assertTrue(ValidacaoQRCode.objects.filter(passe_facil=self.passe, valido=True).exists())
+
+    @override_settings(TAREFAS_MODO='sincrono')
+    def test_notificacao_enviada_apos_o_commit(self):
+        """A notificação é criada pela tarefa despachada, fora da resposta"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.get(self.url, {'codigo': self.passe.codigo.hex})
+        self.assertTrue(response.json()['valido'])
+        self.assertIsNone(response.json()['notificacao_id'])
+        self.assertFalse(Notificacao.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        notificacao = Notificacao.objects.get()
+        self.assertEqual(list(notificacao.usuarios.all()), [self.user])
+        self.assertEqual(notificacao.criado_por, self.operador)
+
+    def test_codigo_desconhecido(self):
+        """Um código inexistente é registrado como tentativa inválida"""
+        response = self.client.get(self.url, {'codigo': 'codigo-invalido'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['valido'])
+        self.assertTrue(ValidacaoQRCode.objects.filter(passe_facil__isnull=True, valido=False).exists())
+
+    def test_passe_inativo(self):
+        """Um passe desativado não é aceito"""
+        self.passe.ativo = False
+        self.passe.save()
+        response = self.client.get(self.url, {'codigo': str(self.passe.codigo)})
+        self.assertFalse(response.json()['valido'])
+
+
+@override_settings(PASSEFACIL_AUDITORIA_ASSINCRONA=False)
+class ProtecaoValidacaoTest(TestCase):
+    def setUp(self):
+        get_indice().limpar()
+        cache.clear()
+        self.operador = User.objects.create_user(
+            email='operador@teste.com',
+            password='senha12345',
+            nome='Operador'
+        )
+        self.user = User.objects.create_user(
+            email='participante@teste.com',
+            password='senha12345',
+            nome='Participante Teste'
+        )
+        self.passe = PasseFacil.objects.create(user=self.user)
+        self.client.force_login(self.operador)
+        self.url = reverse('passefacil:api_validar_qr_code')
+
+    def test_codigo_reapresentado_rejeitado(self):
+        """O mesmo código não é aceito duas vezes e a segunda leitura não chega à view"""
+        response = self.client.get(self.url, {'codigo': self.passe.codigo.hex})
+        self.assertTrue(response.json()['valido'])
+
+        response = self.client.get(self.url, {'codigo': str(self.passe.codigo)})
+        self.assertFalse(response.json()['valido'])
+        self.assertEqual(response.json()['mensagem'], 'Código já utilizado.')
+        self.assertEqual(ValidacaoQRCode.objects.count(), 1)
+
+    @override_settings(PASSEFACIL_LIMITES={'codigo': '1/min'})
+    def test_anonimo_nao_consome_cota_nem_ve_reutilizacao(self):
+        """Leituras anônimas vão para o login sem afetar o código da estação"""
+        self.client.logout()
+        for _ in range(3):
+            response = self.client.get(self.url, {'codigo': self.passe.codigo.hex})
+            self.assertEqual(response.status_code, 302)
+
+        self.client.force_login(self.operador)
+        response = self.client.get(self.url, {'codigo': self.passe.codigo.hex})
+        self.assertTrue(response.json()['valido'])
+
+    @override_settings(PASSEFACIL_LIMITES={'ip': '2/min'})
+    def test_x_forwarded_for_nao_contorna_o_limite(self):
+        """Sem proxies confiáveis o IP é o REMOTE_ADDR, não o X-Forwarded-For"""
+        for i in range(2):
+            self.client.get(self.url, {'codigo': 'x'}, HTTP_X_FORWARDED_FOR=f'10.9.9.{i}')
+        response = self.client.get(self.url, {'codigo': 'x'}, HTTP_X_FORWARDED_FOR='10.9.9.99')
+        self.assertEqual(response.status_code, 429)
+
+        with self.settings(PASSEFACIL_PROXIES_CONFIAVEIS=1):
+            response = self.client.get(self.url, {'codigo': 'x'}, HTTP_X_FORWARDED_FOR='1.2.3.4, 10.9.9.99')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(PASSEFACIL_LIMITES={'ip': '3/min'})
+    def test_limite_por_ip(self):
+        """Acima do limite a estação recebe 429 com Retry-After, sem consultas"""
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.url, {'codigo': 'x'}).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'codigo': self.passe.codigo.hex})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+        response = self.client.get(self.url, {'codigo': 'x'}, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(PASSEFACIL_LIMITES={'falhas_ip': '2/min'})
+    def test_limite_de_leituras_invalidas(self):
+        """Depois de muitos códigos inválidos o IP é bloqueado até para códigos válidos"""
+        self.client.get(self.url, {'codigo': 'chute-1'})
+        self.client.get(self.url, {'codigo': 'chute-2'})
+        response = self.client.get(self.url, {'codigo': self.passe.codigo.hex})
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(PASSEFACIL_LIMITES={'falhas_ip': '2/min'})
+    def test_falhas_contadas_pelo_ip_real(self):
+        """Trocar o X-Forwarded-For não zera as falhas, e a auditoria grava o IP real"""
+        url_lote = reverse('passefacil_api:validar_lote')
+        for i in range(2):
+            self.client.post(
+                url_lote, {'codigos': [f'chute-{i}']}, content_type='application/json',
+                HTTP_X_FORWARDED_FOR=f'10.9.9.{i}',
+            )
+        response = self.client.get(self.url, {'codigo': self.passe.codigo.hex}, HTTP_X_FORWARDED_FOR='10.9.9.99')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(set(ValidacaoQRCode.objects.values_list('ip_address', flat=True)), {'127.0.0.1'})
+
+    def test_janela_deslizante_pondera_o_balde_anterior(self):
+        """A estimativa soma o balde atual e a fração restante do anterior"""
+        janela = JanelaDeslizante('teste', 10, 60)
+        inicio = 6000.0  # início de um balde
+        for _ in range(8):
+            janela.registrar('estacao', inicio + 30)
+        janela.registrar('estacao', inicio + 75)
+
+        self.assertEqual(janela.estimativa('estacao', inicio + 75), 1 + 8 * 0.75)
+        self.assertFalse(janela.excedido('estacao', inicio + 75))
+        janela.registrar('estacao', inicio + 75, quantidade=3)
+        self.assertTrue(janela.excedido('estacao', inicio + 75))
+
+
+class RegistroValidacoesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='participante@teste.com',
+            password='senha12345',
+            nome='Participante Teste'
+        )
+        self.passe = PasseFacil.objects.create(user=self.user)
+        self.registro = RegistroValidacoes(tamanho_lote=50, intervalo=60)
+        # Sem thread de fundo: o teste controla quando o lote é gravado
+        self.registro._garantir_thread = lambda: None
+
+    @override_settings(PASSEFACIL_AUDITORIA_ASSINCRONA=True)
+    def test_registros_acumulados_ate_o_flush(self):
+        """No modo assíncrono nada é gravado até o flush: um INSERT e o UPDATE do contador"""
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                self.registro.registrar(passe_facil=self.passe, codigo=str(self.passe.codigo), valido=True)
+        self.assertEqual(self.registro.pendentes(), 10)
+        self.assertEqual(ValidacaoQRCode.objects.count(), 0)
+
+        agora = timezone.localtime()
+        ContadorValidacoes.objects.create(data=agora.date(), hora=agora.hour)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.registro.flush(), 10)
+        self.assertEqual(_comandos(consultas), ['INSERT', 'UPDATE'])
+        self.assertEqual(ValidacaoQRCode.objects.filter(valido=True).count(), 10)
+        self.assertEqual(self.registro.pendentes(), 0)
+
+    @override_settings(PASSEFACIL_AUDITORIA_ASSINCRONA=True)
+    def test_buffer_cheio_grava_sincronamente(self):
+        """Acima do limite de pendentes a gravação volta a ser síncrona"""
+        self.registro.max_pendentes = 2
+        for _ in range(3):
+            self.registro.registrar(codigo='x', valido=False)
+        self.assertEqual(self.registro.pendentes(), 2)
+        self.assertEqual(ValidacaoQRCode.objects.count(), 1)
+
+    @override_settings(PASSEFACIL_AUDITORIA_ASSINCRONA=True)
+    def test_gravacao_sincrona_sob_demanda(self):
+        """Mesmo no modo assíncrono, sincrono=True grava na hora (o admin devolve o id)"""
+        validacao = self.registro.registrar(sincrono=True, passe_facil=self.passe, codigo='x', valido=True)
+        self.assertIsNotNone(validacao.pk)
+        self.assertEqual(self.registro.pendentes(), 0)
+
+    @override_settings(PASSEFACIL_AUDITORIA_ASSINCRONA=False)
+    def test_modo_sincrono(self):
+        """Com o modo assíncrono desligado cada registro é gravado na hora"""
+        validacao = self.registro.registrar(codigo='x', valido=False)
+        self.assertIsNotNone(validacao.pk)
+        self.assertEqual(self.registro.pendentes(), 0)
+
+
+@override_settings(PASSEFACIL_OFFLINE_CHAVE='chave-das-estacoes', PASSEFACIL_MODO_CODIGO='totp')
+class ValidacaoOfflineTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@teste.com',
+            password='senha12345',
+            nome='Admin'
+        )
+        self.user = User.objects.create_user(
+            email='participante@teste.com',
+            password='senha12345',
+            nome='Participante Teste'
+        )
+        self.passe = PasseFacil.objects.create(user=self.user)
+        # O segredo é criado ao exibir o primeiro código
+        self.codigo, _ = codigo_exibido(self.passe)
+        self.client.force_login(self.admin)
+
+    def _validador(self):
+        response = self.client.get(reverse('passefacil_api:pacote_offline'))
+        self.assertEqual(response.status_code, 200)
+        validador = ValidadorOffline(PasseFacilService.chave_offline())
+        validador.carregar(response.json()['pacote'])
+        return validador
+
+    def test_snapshot_valida_codigo_dinamico_localmente(self):
+        """O snapshot permite validar o código exibido no modo totp sem acesso ao servidor"""
+        validador = self._validador()
+        resultado = validador.validar(self.codigo)
+        self.assertTrue(resultado['valido'])
+        self.assertEqual(resultado['usuario']['id'], self.user.id)
+
+        # Assinatura adulterada, UUID do passe e código de janela expirada
+        self.assertFalse(validador.validar(self.codigo[:-1] + ('0' if self.codigo[-1] != '0' else '1'))['valido'])
+        self.assertFalse(validador.validar(self.passe.codigo.hex)['valido'])
+        depois = timezone.now() + timedelta(seconds=3 * PasseFacilService.TOTP_INTERVAL)
+        self.assertFalse(validador.validar(self.codigo, data_validacao=depois)['valido'])
+        # Código da próxima janela gerado pelo servidor também é reconhecido
+        proximo, _ = gerar_codigo_dinamico(self.user.id, self.passe.secret_totp, depois)
+        self.assertTrue(validador.validar(proximo, data_validacao=depois)['valido'])
+
+    def test_pacote_nao_traz_segredo_em_claro(self):
+        """O segredo TOTP vai cifrado no pacote"""
+        dados, _ = PasseFacilService.gerar_pacote_offline()
+        self.assertNotIn(self.passe.secret_totp, json.dumps(dados))
+        self.assertNotIn(pyotp.TOTP(self.passe.secret_totp).byte_secret().hex(), json.dumps(dados))
+
+    @override_settings(PASSEFACIL_MODO_CODIGO='uuid')
+    def test_modo_uuid_nao_exporta(self):
+        """No modo uuid o código muda a cada rotação: o pacote não é gerado"""
+        response = self.client.get(reverse('passefacil_api:pacote_offline'))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('totp', response.json()['detalhe'])
+
+    def test_pacote_adulterado_e_rejeitado(self):
+        """Um pacote com assinatura inválida não é carregado"""
+        _, pacote = PasseFacilService.gerar_pacote_offline()
+        validador = ValidadorOffline('outra-chave')
+        with self.assertRaises(signing.BadSignature):
+            validador.carregar(pacote)
+
+    def test_delta_aplica_rotacao_e_desativacao(self):
+        """O delta substitui o segredo trocado e remove passes desativados"""
+        validador = self._validador()
+        self.passe.secret_totp = pyotp.random_base32()
+        self.passe.save()
+        codigo_novo, _ = codigo_exibido(self.passe)
+
+        response = self.client.get(reverse('passefacil_api:pacote_offline'), {'desde': validador.versao})
+        validador.aplicar_delta(response.json()['pacote'])
+        self.assertFalse(validador.validar(self.codigo)['valido'])
+        self.assertTrue(validador.validar(codigo_novo)['valido'])
+
+        self.passe.ativo = False
+        self.passe.save()
+        response = self.client.get(reverse('passefacil_api:pacote_offline'), {'desde': validador.versao})
+        validador.aplicar_delta(response.json()['pacote'])
+        self.assertEqual(len(validador), 0)
+
+    def test_envio_das_validacoes_em_lote(self):
+        """As validações feitas offline são gravadas em um único envio"""
+        validador = self._validador()
+        validador.validar(self.codigo)
+        validador.validar('invalido')
+        corpo = validador.exportar_validacoes()
+        corpo['validacoes'].append({'codigo': 'x'})
+
+        response = self.client.post(
+            reverse('passefacil_api:validacoes_offline'), corpo, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['gravadas'], 2)
+        self.assertEqual(data['erros'][0]['indice'], 2)
+        self.assertEqual(ValidacaoQRCode.objects.filter(passe_facil=self.passe, valido=True).count(), 1)
+        self.assertEqual(validador.validacoes_pendentes(), 0)
+
+    def test_registros_malformados_viram_erros_da_linha(self):
+        """Data impossível ou usuario_id não escalar não derrubam o lote"""
+        corpo = {'validacoes': [
+            {'codigo': 'a', 'usuario_id': self.user.id, 'valido': True, 'data_validacao': '2030-02-30T10:00:00'},
+            {'codigo': 'b', 'usuario_id': [self.user.id], 'valido': True, 'data_validacao': '2030-02-01T10:00:00'},
+            {'codigo': 'c', 'usuario_id': self.user.id, 'valido': True, 'data_validacao': '2030-02-01T10:00:00'},
+        ]}
+        response = self.client.post(
+            reverse('passefacil_api:validacoes_offline'), corpo, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['gravadas'], 1)
+        self.assertEqual([e['indice'] for e in response.json()['erros']], [0, 1])
+
+    def test_usuario_id_em_texto(self):
+        """usuario_id numérico em texto encontra o passe; texto não numérico é erro da linha"""
+        corpo = {'validacoes': [
+            {'codigo': 'a', 'usuario_id': str(self.user.id), 'valido': True, 'data_validacao': '2030-02-01T10:00:00'},
+            {'codigo': 'b', 'usuario_id': 'abc', 'valido': True, 'data_validacao': '2030-02-01T10:00:00'},
+        ]}
+        response = self.client.post(
+            reverse('passefacil_api:validacoes_offline'), corpo, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['gravadas'], 1)
+        self.assertEqual(response.json()['erros'], [{'indice': 1, 'erro': 'usuario_id inválido'}])
+        validacao = ValidacaoQRCode.objects.get(codigo='a')
+        self.assertTrue(validacao.valido)
+        self.assertEqual(validacao.passe_facil, self.passe)
+
+    @override_settings(PASSEFACIL_OFFLINE_CHAVE='')
+    def test_sem_chave_dedicada_nao_exporta(self):
+        """Sem PASSEFACIL_OFFLINE_CHAVE o pacote não é exportado (nunca com a SECRET_KEY)"""
+        response = self.client.get(reverse('passefacil_api:pacote_offline'))
+        self.assertEqual(response.status_code, 503)
+
+    def test_exige_staff(self):
+        """Usuários comuns não podem baixar o pacote"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('passefacil_api:pacote_offline'))
+        self.assertEqual(response.status_code, 403)
+
+
+class ValidarLoteAPITest(TestCase):
+    def setUp(self):
+        get_indice().limpar()
+        cache.clear()
+        self.operador = User.objects.create_user(
+            email='operador@teste.com',
+            password='senha12345',
+            nome='Operador'
+        )
+        self.passes = [
+            PasseFacil.objects.create(user=User.objects.create_user(
+                email=f'participante{i}@teste.com',
+                password='senha12345',
+                nome=f'Participante {i}'
+            ))
+            for i in range(5)
+        ]
+        self.passes[4].ativo = False
+        self.passes[4].save()
+        self.client.force_login(self.operador)
+        self.url = reverse('passefacil_api:validar_lote')
+
+    def test_lote_resolvido_com_uma_consulta_e_um_insert(self):
+        """O serviço resolve o lote com um SELECT codigo__in, um bulk INSERT e o UPDATE do contador"""
+        get_indice().limpar()
+        agora = timezone.localtime()
+        ContadorValidacoes.objects.create(data=agora.date(), hora=agora.hour)
+        codigos = [p.codigo.hex for p in self.passes]
+        with CaptureQueriesContext(connection) as consultas:
+            resultados = PasseFacilService.validar_lote(codigos)
+        self.assertEqual(_comandos(consultas), ['SELECT', 'INSERT', 'UPDATE'])
+        self.assertEqual(sum(r['valido'] for r in resultados), 4)
+
+    def test_resultados_por_codigo(self):
+        """A API retorna um resultado por código, na ordem enviada"""
+        codigos = [p.codigo.hex for p in self.passes] + ['invalido', str(self.passes[0].codigo)]
+        response = self.client.post(self.url, {'codigos': codigos}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        resultados = response.json()['resultados']
+        self.assertEqual([r['valido'] for r in resultados], [True, True, True, True, False, False, True])
+        self.assertEqual(resultados[1]['usuario']['id'], self.passes[1].user_id)
+        self.assertEqual(ValidacaoQRCode.objects.count(), len(codigos))
+        self.assertEqual(ValidacaoQRCode.objects.filter(valido=True).count(), 5)
+
+    def test_lote_vazio_ou_grande_demais(self):
+        """O corpo precisa ter entre 1 e LOTE_MAX_CODIGOS códigos"""
+        response = self.client.post(self.url, {'codigos': []}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        codigos = ['x'] * (PasseFacilService.LOTE_MAX_CODIGOS + 1)
+        response = self.client.post(self.url, {'codigos': codigos}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class QRCodeCacheTest(TestCase):
+    def setUp(self):
+        get_cache_qr().limpar()
+        self.user = User.objects.create_user(
+            email='participante@teste.com',
+            password='senha12345',
+            nome='Participante Teste'
+        )
+        self.passe = PasseFacil.objects.create(user=self.user)
+        self.client.force_login(self.user)
+        self.url = reverse('passefacil:gerar_qr_code_dinamico')
+
+    def test_imagem_renderizada_uma_vez(self):
+        """Requisições seguidas reaproveitam o PNG em cache"""
+        primeira = self.client.get(self.url)
+        self.assertEqual(primeira.status_code, 200)
+        self.assertEqual(primeira['Content-Type'], 'image/png')
+        self.assertEqual(len(get_cache_qr()), 1)
+
+        segunda = self.client.get(self.url)
+        self.assertEqual(segunda.content, primeira.content)
+        self.assertEqual(segunda['ETag'], primeira['ETag'])
+        self.assertEqual(len(get_cache_qr()), 1)
+
+    def test_if_none_match_retorna_304(self):
+        """Com o ETag atual o servidor responde 304 sem corpo"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_rotacao_muda_etag_e_limpa_cache(self):
+        """Rotacionar o código remove a imagem do cache e muda o ETag"""
+        etag = self.client.get(self.url)['ETag']
+        self.passe.gerar_novo_codigo()
+        self.assertEqual(len(get_cache_qr()), 0)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_formatos_sem_pil(self):
+        """Os formatos SVG e matriz são servidos sem gerar PNG"""
+        svg = self.client.get(self.url, {'formato': 'svg'})
+        self.assertEqual(svg['Content-Type'], 'image/svg+xml')
+        self.assertTrue(svg.content.startswith(b'<svg'))
+
+        matriz = self.client.get(self.url, {'formato': 'matriz'}).json()
+        self.assertEqual(len(matriz['linhas']), matriz['tamanho'])
+
+        self.assertEqual(self.client.get(self.url, {'formato': 'gif'}).status_code, 400)
+
+
+@override_settings(PASSEFACIL_MODO_CODIGO='totp', PASSEFACIL_AUDITORIA_ASSINCRONA=False)
+class CodigoDinamicoTest(TestCase):
+    def setUp(self):
+        get_indice().limpar()
+        get_cache_qr().limpar()
+        self.user = User.objects.create_user(
+            email='participante@teste.com',
+            password='senha12345',
+            nome='Participante Teste'
+        )
+        self.passe = PasseFacil.objects.create(user=self.user)
+        self.client.force_login(self.user)
+
+    def test_rotacao_sem_escrita_no_banco(self):
+        """Depois de criado o segredo, atualizar o QR Code não grava nada"""
+        codigo_exibido(self.passe)
+        self.passe.refresh_from_db()
+        with self.assertNumQueries(0):
+            codigo_exibido(self.passe)
+
+        response = self.client.post(reverse('passefacil:atualizar_qr_code'))
+        self.assertEqual(resolver_codigo(response.json()['novo_codigo']).user_id, self.user.id)
+        atual = PasseFacil.objects.get(pk=self.passe.pk)
+        self.assertEqual(atual.codigo, self.passe.codigo)
+        self.assertEqual(atual.data_atualizacao, self.passe.data_atualizacao)
+
+    def test_validacao_recalcula_o_codigo(self):
+        """O código da janela atual e da anterior são aceitos; os mais antigos não"""
+        codigo_exibido(self.passe)
+        self.passe.refresh_from_db()
+        agora = timezone.now()
+        intervalo = PasseFacilService.TOTP_INTERVAL
+
+        atual, _ = gerar_codigo_dinamico(self.user.id, self.passe.secret_totp, agora)
+        anterior, _ = gerar_codigo_dinamico(self.user.id, self.passe.secret_totp, agora - timedelta(seconds=intervalo))
+        antigo, _ = gerar_codigo_dinamico(self.user.id, self.passe.secret_totp, agora - timedelta(seconds=3 * intervalo))
+
+        self.assertEqual(resolver_codigo(atual, agora).user_id, self.user.id)
+        self.assertIsNotNone(resolver_codigo(anterior, agora))
+        self.assertIsNone(resolver_codigo(antigo, agora))
+
+    def test_assinatura_adulterada_e_uuid_estatico_rejeitados(self):
+        """Outro usuário na mesma janela ou o UUID do passe não são aceitos"""
+        codigo, _ = codigo_exibido(self.passe)
+        user_id, janela, assinatura = ler_codigo_dinamico(codigo)
+        outro = User.objects.create_user(email='outro@teste.com', password='senha12345', nome='Outro')
+        PasseFacil.objects.create(user=outro, secret_totp=self.passe.secret_totp)
+
+        self.assertIsNone(resolver_codigo(f'T{outro.id:x}.{janela:x}.{assinatura}'))
+        self.assertIsNone(resolver_codigo(self.passe.codigo.hex))
+
+        response = self.client.get(reverse('passefacil:api_validar_qr_code'), {'codigo': codigo})
+        self.assertTrue(response.json()['valido'])
+        self.assertTrue(ValidacaoQRCode.objects.filter(codigo=codigo, valido=True).exists())
+
+
+@override_settings(PASSEFACIL_AUDITORIA_ASSINCRONA=False)
+class ContadorValidacoesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='participante@teste.com',
+            password='senha12345',
+            nome='Participante Teste'
+        )
+        self.passe = PasseFacil.objects.create(user=self.user)
+
+    def test_gravacoes_incrementam_contadores(self):
+        """Registros avulsos e em lote são somados ao contador da hora"""
+        registrar_validacao(passe_facil=self.passe, codigo=str(self.passe.codigo), valido=True)
+        registrar_validacao(codigo='x', valido=False)
+        PasseFacilService.validar_lote([self.passe.codigo.hex, 'invalido', 'outro'])
+
+        self.assertEqual(contadores.resumo_dia(), {'total': 5, 'validas': 2, 'invalidas': 3})
+        hora = timezone.localtime().hour
+        self.assertEqual(contadores.por_hora()[hora], {'hora': hora, 'validas': 2, 'invalidas': 3})
+
+    def test_painel_le_os_contadores(self):
+        """O resumo do dia custa uma consulta, independente do volume"""
+        PasseFacilService.validar_lote([self.passe.codigo.hex] * 50)
+        with self.assertNumQueries(1):
+            resumo = contadores.resumo_dia()
+        self.assertEqual(resumo['validas'], 50)
+
+    def test_recalcular_reproduz_os_contadores(self):
+        """Recalcular a partir das validações chega aos mesmos totais"""
+        ontem = timezone.now() - timedelta(days=1)
+        contadores.gravar_validacoes([
+            ValidacaoQRCode(codigo='a', valido=True, data_validacao=ontem),
+            ValidacaoQRCode(codigo='b', valido=False),
+        ])
+        antes = list(ContadorValidacoes.objects.values_list('data', 'hora', 'validas', 'invalidas'))
+        contadores.recalcular()
+        depois = list(ContadorValidacoes.objects.values_list('data', 'hora', 'validas', 'invalidas'))
+        self.assertEqual(antes, depois)
+        self.assertEqual(contadores.por_dia(timezone.localdate(ontem), timezone.localdate())[0]['validas'], 1)
+
+    def test_estatisticas_da_validacao_no_admin(self):
+        """A resposta AJAX do admin traz os totais do dia a partir dos contadores"""
+        admin = User.objects.create_superuser(email='admin@teste.com', password='senha12345', nome='Admin')
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:passefacil_validar_qr_code'),
+            {'codigo': self.passe.codigo.hex},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['estatisticas'], {'total': 1, 'validas': 1, 'invalidas': 0})
+
+    @override_settings(PASSEFACIL_AUDITORIA_ASSINCRONA=True)
+    def test_estatisticas_do_admin_com_auditoria_assincrona(self):
+        """Com a auditoria assíncrona, a validação do admin já entra nos totais"""
+        self.test_estatisticas_da_validacao_no_admin()
+
+    def test_apagar_validacoes_desconta_dos_contadores(self):
+        """Validações apagadas, inclusive em cascata, saem dos contadores sem serem carregadas"""
+        ontem = timezone.now() - timedelta(days=1)
+        registrar_validacao(passe_facil=self.passe, codigo=str(self.passe.codigo), valido=True)
+        registrar_validacao(passe_facil=self.passe, codigo=str(self.passe.codigo), valido=True)
+        contadores.gravar_validacoes([ValidacaoQRCode(passe_facil=self.passe, codigo='a', valido=True, data_validacao=ontem)])
+        registrar_validacao(codigo='x', valido=False)
+
+        contadores.apagar_validacoes(ValidacaoQRCode.objects.filter(valido=False))
+        self.assertEqual(contadores.resumo_dia(), {'total': 2, 'validas': 2, 'invalidas': 0})
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.user.delete()
+        # A cascata apaga as validações com um único DELETE, sem SELECT por linha
+        self.assertFalse([q for q in consultas.captured_queries if q['sql'].startswith('SELECT "passefacil_validacaoqrcode"')])
+        self.assertEqual(contadores.resumo_dia(), {'total': 0, 'validas': 0, 'invalidas': 0})
+        self.assertEqual(contadores.resumo_dia(timezone.localdate(ontem))['total'], 0)
+
+    def test_comando_recalcular_contadores(self):
+        """O comando refaz os contadores divergentes"""
+        registrar_validacao(codigo='x', valido=False)
+        ContadorValidacoes.objects.update(invalidas=10)
+        call_command('recalcular_contadores', stdout=StringIO())
+        self.assertEqual(contadores.resumo_dia(), {'total': 1, 'validas': 0, 'invalidas': 1})
@@ -6,13 +6,16 @@ from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from .models import PasseFacil, ValidacaoQRCode
-from apps.notificacoes.models import Notificacao
-from apps.notificacoes.push import send_push_to_user
+from .codigos import MODO_TOTP, codigo_exibido, formatar_codigo, modo_codigo, resolver_codigo
+from .auditoria import registrar_validacao
+from . import protecao
+from .tasks import notificar_validacao
+from .qr import FORMATOS, TIPO_PASSE, etag_qr, get_cache_qr
+from apps.core.tarefas import despachar
 import logging
-import io
 import uuid
-import qrcode
 import json
 
 logger = logging.getLogger(__name__)
@@ -21,7 +24,7 @@ logger = logging.getLogger(__name__)
 @require_http_methods(["GET"])
 def validar_qr_code(request):
     codigo = request.GET.get('codigo', '')
-    ip_address = request.META.get('HTTP_X_FORWARDED_FOR') or request.META.get('REMOTE_ADDR')
+    ip_address = protecao.ip_cliente(request)
 
     # Validação básica de entrada
     if not codigo:
@@ -31,77 +34,75 @@ def validar_qr_code(request):
         }, status=400)
 
     try:
-        # Aceita código com ou sem hífens
+        # Aceita UUID (com ou sem hífens) ou código dinâmico; a consulta vai ao
+        # índice em memória e só recorre ao banco quando o passe ainda não foi
+        # carregado
         try:
-            codigo_uuid = uuid.UUID(codigo)
+            entrada = resolver_codigo(codigo)
         except ValueError:
-            codigo_uuid = uuid.UUID(hex=codigo.replace('-', ''))
+            entrada = None
+        if entrada is None:
+            raise PasseFacil.DoesNotExist
+        codigo_lido = formatar_codigo(codigo)
 
-        passe = PasseFacil.objects.get(codigo=codigo_uuid)
-        
         # Verifica se o passe está ativo
-        if not passe.ativo:
+        if not entrada.ativo:
             return JsonResponse({
                 'valido': False,
                 'mensagem': 'Passe Fácil não está ativo.'
             })
             
+        # Duas leituras simultâneas do mesmo QR Code: só a primeira é aceita
+        if not protecao.consumir(codigo_lido):
+            registrar_validacao(codigo=codigo_lido, valido=False, ip_address=ip_address)
+            return JsonResponse({
+                'valido': False,
+                'mensagem': 'Código já utilizado.'
+            })
+
         # Dados do usuário (preferindo campo "nome" do usuário customizado)
-        user = passe.user
-        nome_preferido = (getattr(user, 'nome', '') or user.get_full_name() or '').strip() or user.email
+        nome_preferido = entrada.nome
 
-        # Registra a validação
-        validacao = ValidacaoQRCode(
-            passe_facil=passe,
-            codigo=str(codigo_uuid),
+        # Registra a validação (gravação em lote, fora do caminho da resposta)
+        registrar_validacao(
+            passe_facil_id=entrada.passe_id,
+            codigo=codigo_lido,
             valido=True,
             ip_address=ip_address
         )
-        validacao.save()
         
-        # Cria notificação para o usuário
-        try:
-            notificacao = Notificacao.objects.create(
-                titulo='Passe Fácil Validado',
-                mensagem=f'Seu código foi validado em {timezone.localtime().strftime("%d/%m/%Y %H:%M")} (IP: {ip_address})',
-                tipo='success',
-                criado_por=request.user if request.user.is_authenticated else None
-            )
-            
-            # Adiciona o usuário à notificação
-            notificacao.usuarios.add(user)
-            
-            # Envia notificação push se o usuário estiver online
-            try:
-                send_push_to_user(
-                    user_external_id=str(user.id),
-                    title='Passe Fácil Validado',
-                    message=f'Seu código foi validado em {timezone.localtime().strftime("%d/%m/%Y %H:%M")}'
-                )
-            except Exception as push_error:
-                logger.warning(f"Erro ao enviar notificação push: {push_error}")
-        except Exception as notif_error:
-            logger.warning(f"Erro ao criar notificação: {notif_error}")
+        # Notificação e push saem da requisição: a resposta da catraca não
+        # espera pelo OneSignal
+        despachar(
+            notificar_validacao,
+            entrada.user_id,
+            ip_address=ip_address,
+            operador_id=request.user.id if request.user.is_authenticated else None,
+            data_validacao=timezone.now().isoformat(),
+        )
         
         return JsonResponse({
             'valido': True,
             'mensagem': f'Passe válido para {nome_preferido}',
             'usuario': {
-                'id': user.id,
+                'id': entrada.user_id,
                 'nome': nome_preferido,
-                'email': user.email,
+                'email': entrada.email,
             },
-            'codigo': str(codigo_uuid),
-            'notificacao_id': notificacao.id
+            'codigo': codigo_lido,
+            # A notificação só é criada após o commit, fora da requisição;
+            # a chave continua na resposta para os clientes existentes
+            'notificacao_id': None,
         })
         
     except PasseFacil.DoesNotExist:
         # Registra tentativa de validação inválida
-        ValidacaoQRCode.objects.create(
-            codigo=str(codigo),
+        registrar_validacao(
+            codigo=str(codigo)[:36],
             valido=False,
             ip_address=ip_address
         )
+        protecao.registrar_falha(ip_address)
         return JsonResponse({
             'valido': False,
             'mensagem': 'Código QR inválido ou expirado.'
@@ -116,9 +117,6 @@ def validar_qr_code(request):
 @login_required
 def gerar_qr_code_dinamico(request):
     try:
-        print("\n=== Iniciando geração de QR Code ===")
-        print(f"Usuário: {getattr(request.user, 'email', 'sem-email')} (ID: {request.user.id})")
-        
         # Verifica se é uma requisição AJAX para mostrar loading
         is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
         
@@ -129,61 +127,48 @@ def gerar_qr_code_dinamico(request):
                 ativo=True,
                 codigo=uuid.uuid4()
             )
-            print(f"Novo PasseFacil criado com código: {passe_facil.codigo}")
+            logger.debug(f"Novo PasseFacil criado com código: {passe_facil.codigo}")
             
             # Adiciona mensagem de sucesso
             if not is_ajax:
                 messages.success(request, "Seu Passe Fácil foi criado com sucesso!")
         else:
             passe_facil = request.user.passe_facil
-            print(f"PasseFacil existente encontrado. Código: {passe_facil.codigo}")
+            logger.debug(f"PasseFacil existente encontrado. Código: {passe_facil.codigo}")
             
             # Se não tiver código, gera um novo
             if not passe_facil.codigo:
                 passe_facil.codigo = uuid.uuid4()
                 passe_facil.save()
-                print(f"Código gerado para PasseFacil existente: {passe_facil.codigo}")
+                logger.debug(f"Código gerado para PasseFacil existente: {passe_facil.codigo}")
         
         if not passe_facil.ativo:
-            print("ERRO: Passe Fácil está inativo")
+            logger.debug(f"Passe Fácil inativo (usuário {request.user.id})")
             return HttpResponse("Passe inativo", status=403)
 
-        # Converte o UUID para string e remove hífens para garantir consistência
-        codigo_str = str(passe_facil.codigo).replace('-', '')
-        print(f"Gerando QR Code para o código: {codigo_str}")
-        
-        # Cria o QR Code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(codigo_str)
-        qr.make(fit=True)
+        formato = request.GET.get('formato', 'png')
+        if formato not in FORMATOS:
+            return HttpResponse("Formato inválido", status=400)
 
-        print("Criando imagem do QR Code...")
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        print("Preparando resposta...")
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-
-        print("Enviando resposta...\n")
-        response = HttpResponse(buffer, content_type='image/png')
-        response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response['Pragma'] = 'no-cache'
-        response['Expires'] = '0'
+        # UUID sem hífens ou, no modo totp, o código da janela de tempo atual
+        codigo_str, _ = codigo_exibido(passe_facil)
+
+        # O ETag depende só do código: enquanto ele não rotacionar, o
+        # navegador revalida e recebe 304 sem que a imagem seja renderizada.
+        etag = etag_qr(codigo_str, formato)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            qr = get_cache_qr().obter(request.user.id, TIPO_PASSE, codigo_str, formato)
+            response = HttpResponse(qr.conteudo, content_type=qr.content_type)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
         return response
 
     except PasseFacil.DoesNotExist:
-        print("Erro: Passe Fácil não encontrado")
+        logger.warning("Passe Fácil não encontrado")
         return HttpResponse("Passe Fácil não encontrado.", status=404)
     except Exception as e:
-        print(f"Erro inesperado ao gerar QR Code: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Erro inesperado ao gerar QR Code: {str(e)}")
         return HttpResponse(f"Erro ao gerar QR Code: {str(e)}", status=500)
 
 @login_required
@@ -219,6 +204,15 @@ def atualizar_qr_code(request):
         else:
             passe = request.user.passe_facil
 
+        # No modo totp o código é derivado da janela de tempo: nada a gravar
+        if modo_codigo() == MODO_TOTP:
+            codigo, tempo_restante = codigo_exibido(passe)
+            return JsonResponse({
+                'status': 'success',
+                'novo_codigo': codigo,
+                'tempo_restante': tempo_restante,
+            })
+
         # Gera novo código
         passe.codigo = uuid.uuid4()
         passe.data_atualizacao = timezone.now()
@@ -0,0 +1,16 @@
+"""
+Aplicação Celery do projeto.
+
+Só é usada quando ``CELERY_BROKER_URL`` está configurado; sem broker as
+tarefas rodam no pool de threads do processo (ver ``apps/core/tarefas.py``).
+Worker: ``celery -A sga_cop_30 worker -l info``.
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sga_cop_30.settings')
+
+app = Celery('sga_cop_30')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -1,8 +1,12 @@
 import re
+import time
+
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
 from django.shortcuts import redirect
 from django.urls import resolve, reverse
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 
 class LoginRequiredMiddleware:
     def __init__(self, get_response):
@@ -53,4 +57,112 @@ class LoginRequiredMiddleware:
         if request.path != redirect_url:
             return HttpResponseRedirect(redirect_url)
             
-        return None
\ No newline at end of file
+        return None
+
+class PerfilamentoMiddleware:
+    """
+    Mede consultas SQL, tempo de banco, de template e total de cada requisição.
+
+    Desativado por padrão (``PERFILAMENTO_ATIVO``). As medições ficam no
+    buffer de ``apps.core.perfilamento`` e podem ser consultadas em
+    ``admin_personalizado:perfilamento``; com ``PERFILAMENTO_SERVER_TIMING``
+    (desligado por padrão) as respostas para a equipe (``is_staff``) também
+    levam o cabeçalho ``Server-Timing``, que não é exposto aos demais usuários.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFILAMENTO_ATIVO', False):
+            raise MiddlewareNotUsed
+        from apps.core import perfilamento
+
+        self.get_response = get_response
+        self.perfilamento = perfilamento
+        self.server_timing = getattr(settings, 'PERFILAMENTO_SERVER_TIMING', False)
+        perfilamento.instrumentar_templates()
+
+    def __call__(self, request):
+        medicao, token = self.perfilamento.iniciar(request)
+        inicio = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self.perfilamento.MedidorConsultas()):
+                response = self.get_response(request)
+        finally:
+            self.perfilamento.finalizar(token)
+        medicao.tempo_total = (time.perf_counter() - inicio) * 1000
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        medicao.view = resolver_match.view_name if resolver_match else ''
+        medicao.status = response.status_code
+        self.perfilamento.get_buffer().adicionar(medicao)
+
+        usuario = getattr(request, 'user', None)
+        if self.server_timing and usuario is not None and usuario.is_staff:
+            response['Server-Timing'] = medicao.server_timing()
+        return response
+
+
+class ProtecaoValidacaoMiddleware:
+    """
+    Rejeita leituras abusivas nos endpoints de validação do Passe Fácil: os
+    limites por IP antes da sessão, da autenticação e de qualquer consulta ao
+    banco; o limite por código e a reutilização depois da autenticação, apenas
+    para operadores autenticados.
+
+    Os limites e o conjunto de códigos consumidos ficam no cache
+    (``apps.passefacil.protecao``). Limite excedido responde ``429`` com
+    ``Retry-After``; código reapresentado responde como leitura inválida.
+    """
+
+    # Rota -> (limita por código, rejeita reutilização)
+    ROTAS = {
+        'passefacil:api_validar_qr_code': (True, True),
+        'passefacil_api:validar_qr': (False, False),
+        'passefacil_api:validar_lote': (False, False),
+    }
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._caminhos = None
+
+    def caminhos(self):
+        if self._caminhos is None:
+            self._caminhos = {reverse(nome): opcoes for nome, opcoes in self.ROTAS.items()}
+        return self._caminhos
+
+    @staticmethod
+    def _limite_excedido(aguardar):
+        response = JsonResponse({
+            'valido': False,
+            'mensagem': f'Muitas tentativas de validação. Tente novamente em {aguardar} segundos.',
+        }, status=429)
+        response['Retry-After'] = str(aguardar)
+        return response
+
+    def __call__(self, request):
+        if request.path_info not in self.caminhos():
+            return self.get_response(request)
+
+        # Limites por IP: antes da sessão, valem também para anônimos
+        from apps.passefacil import protecao
+        aguardar = protecao.verificar(protecao.ip_cliente(request))
+        if aguardar is not None:
+            return self._limite_excedido(aguardar)
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Limite por código e reutilização: só para operadores autenticados
+        # (process_view roda depois da autenticação; anônimos seguem para o login)
+        opcoes = self.caminhos().get(request.path_info)
+        if opcoes is None or not opcoes[0] or not request.user.is_authenticated:
+            return None
+
+        from apps.passefacil import protecao
+        codigo = request.GET.get('codigo', '')
+        if not codigo:
+            return None
+        aguardar = protecao.verificar(None, codigo)
+        if aguardar is not None:
+            return self._limite_excedido(aguardar)
+        if opcoes[1] and protecao.ja_utilizado(codigo):
+            return JsonResponse({'valido': False, 'mensagem': 'Código já utilizado.'})
+        return None
@@ -64,6 +64,7 @@ LOGOUT_REDIRECT_URL = 'home'  # Página para redirecionar após o logout
 LOGIN_EXEMPT_URLS = [
     r'^$',  # Página inicial
     r'^agenda/$',  # Página da agenda oficial
+    r'^agenda/calendario',  # Calendários .ics (o pessoal é protegido pelo token)
     r'^usuarios/login/$',  # Página de login
     r'^usuarios/registrar/$',  # Página de registro
     r'^usuarios/password_reset/',  # URLs de redefinição de senha
@@ -95,6 +96,7 @@ REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
         'user': '1000/day',
+        'qr_validation': '60/min',
     }
 }
 
@@ -140,12 +142,96 @@ EMAIL_SUBJECT_PREFIX = '[SGA COP 30] '  # Prefixo para assuntos de email
 # OneSignal / Push settings (configure via environment variables on PythonAnywhere)
 ONESIGNAL_APP_ID = os.environ.get('ONESIGNAL_APP_ID', '')
 ONESIGNAL_REST_API_KEY = os.environ.get('ONESIGNAL_REST_API_KEY', '')
+ONESIGNAL_MAX_DESTINATARIOS = 2000  # external_ids por requisição (limite da API: 20.000)
+ONESIGNAL_WORKERS = 4                # requisições simultâneas por envio em lote
+ONESIGNAL_MAX_TENTATIVAS = 3         # novas tentativas em 429/5xx e erros de conexão
+ONESIGNAL_BACKOFF = 0.5              # segundos; dobra a cada nova tentativa
+# Destinatários de notificações pessoais gravados por bulk_create (apps/notificacoes/publico.py)
+NOTIFICACOES_LOTE_DESTINATARIOS = 1000
+# Notificações em tempo real via SSE (apps/notificacoes/tempo_real.py). Só ative
+# com a aplicação servida via ASGI (uvicorn/daphne): sob WSGI o endpoint responde
+# 204 e as páginas continuam consultando periodicamente. Sem URL do Redis o pub/sub
+# é local ao processo; com vários processos ou Celery, use o Redis.
+NOTIFICACOES_TEMPO_REAL_ATIVO = os.environ.get('NOTIFICACOES_TEMPO_REAL_ATIVO', '') == '1'
+NOTIFICACOES_TEMPO_REAL_REDIS_URL = os.environ.get('NOTIFICACOES_TEMPO_REAL_REDIS_URL', '')
+NOTIFICACOES_STREAM_HEARTBEAT = 25   # segundos entre mensagens de manutenção
+NOTIFICACOES_STREAM_DURACAO = 300    # segundos por conexão (o navegador reconecta)
 # Public base URL of the site (used to build absolute links in push notifications)
 SITE_URL = os.environ.get('SITE_URL', 'https://SEU-DOMINIO.pythonanywhere.com')
 
+# Passe Fácil: gravação em lote dos registros de validação (apps/passefacil/auditoria.py).
+# Desligada por padrão: no modo assíncrono os pendentes se perdem se o processo for morto
+PASSEFACIL_AUDITORIA_ASSINCRONA = os.environ.get('PASSEFACIL_AUDITORIA_ASSINCRONA', '') == '1'
+PASSEFACIL_AUDITORIA_LOTE = 100         # registros por bulk_create
+PASSEFACIL_AUDITORIA_INTERVALO = 2.0    # segundos entre gravações
+# Chave compartilhada com as estações de leitura offline (apps/passefacil/offline.py).
+# Obrigatória para exportar o pacote (que também exige PASSEFACIL_MODO_CODIGO='totp'); nunca use a SECRET_KEY
+PASSEFACIL_OFFLINE_CHAVE = os.environ.get('PASSEFACIL_OFFLINE_CHAVE', '')
+# Códigos do QR Code: 'uuid' (grava um novo UUID a cada rotação) ou 'totp'
+# (derivado do segredo do passe e da janela de tempo, sem escrita; apps/passefacil/codigos.py)
+PASSEFACIL_MODO_CODIGO = os.environ.get('PASSEFACIL_MODO_CODIGO', 'uuid')
+# Limites das leituras (apps/passefacil/protecao.py), no formato das taxas do DRF.
+# Use um cache compartilhado (Redis) em PASSEFACIL_PROTECAO_CACHE para valer entre workers
+PASSEFACIL_PROTECAO_CACHE = 'default'
+PASSEFACIL_LIMITES = {
+    'ip': '120/min',         # leituras por estação
+    'falhas_ip': '30/min',   # leituras inválidas por estação
+    'codigo': '10/min',      # tentativas com o mesmo código
+}
+PASSEFACIL_REPLAY_SEGUNDOS = 60  # um código aceito não é aceito de novo nesse intervalo
+# Índice de códigos em memória (apps/passefacil/indice.py): cada worker confere a
+# versão das entradas no cache a cada PASSEFACIL_INDICE_VERIFICACAO segundos. A
+# invalidação entre workers exige um backend compartilhado (Redis) em CACHES
+PASSEFACIL_INDICE_CACHE = 'default'
+PASSEFACIL_INDICE_VERIFICACAO = 5
+# Proxies reversos confiáveis à frente da aplicação. 0 = IP do REMOTE_ADDR; com N,
+# usa o N-ésimo endereço a partir do fim do X-Forwarded-For (o cliente controla o início)
+PASSEFACIL_PROXIES_CONFIAVEIS = int(os.environ.get('PASSEFACIL_PROXIES_CONFIAVEIS', '0'))
+
+# Tarefas em segundo plano (apps/core/tarefas.py): com broker configurado usa
+# o Celery; sem broker, um pool de threads no próprio processo
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', '')
+CELERY_TIMEZONE = "America/Sao_Paulo"
+CELERY_TASK_IGNORE_RESULT = True
+TAREFAS_MODO = os.environ.get('TAREFAS_MODO', 'auto')  # auto | celery | thread | sincrono
+TAREFAS_WORKERS = 4
+
+# Tarefas periódicas (celery -A sga_cop_30 beat). Sem broker, agende os
+# comandos equivalentes no cron (ex.: ``manage.py limpar_agendas``)
+CELERY_BEAT_SCHEDULE = {
+    'limpar-agendas-pessoais': {
+        'task': 'apps.agenda.tasks.limpar_agendas_pessoais',
+        'schedule': 3600,  # segundos
+    },
+    'enviar-lembretes-eventos': {
+        'task': 'apps.agenda.tasks.enviar_lembretes_eventos',
+        'schedule': 900,
+    },
+    'recalcular-contadores-validacao': {
+        'task': 'apps.passefacil.tasks.recalcular_contadores_validacao',
+        'schedule': 86400,
+    },
+}
+AGENDA_LIMPEZA_LOTE = 1000  # linhas de UserAgenda removidas por transação
+AGENDA_IMPORTACAO_LOTE = 500  # eventos gravados por transação na importação em massa
+AGENDA_CONFLITOS_TIMEOUT = 3600  # segundos que a agenda de cada usuário fica em cache para detectar conflitos
+AGENDA_LEMBRETE_HORAS = 24  # antecedência dos lembretes de evento
+AGENDA_LEMBRETE_LOTE = 5000  # lembretes gravados por transação
+
+# Perfilamento por requisição (consultas, tempo de banco/template/total)
+PERFILAMENTO_ATIVO = os.environ.get('PERFILAMENTO_ATIVO', '') == '1'
+PERFILAMENTO_TAMANHO = 500           # requisições mantidas em memória por processo
+PERFILAMENTO_SERVER_TIMING = False   # envia o cabeçalho Server-Timing (só para a equipe)
+
+# Paginação por cursor (apps/core/paginacao.py)
+PAGINACAO_TAMANHO_MAXIMO = 100       # itens por página aceitos da API
+PAGINACAO_CONTAGEM_TIMEOUT = 60      # segundos de cache da contagem aproximada
+
 MIDDLEWARE = [
+    "sga_cop_30.middleware.PerfilamentoMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "sga_cop_30.middleware.ProtecaoValidacaoMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -175,6 +261,7 @@ TEMPLATES = [
                 'apps.core.context_processors.onesignal',
                 # Avisos ativos para templates
                 'apps.notificacoes.context_processors.avisos_ativos',
+                'apps.notificacoes.context_processors.tempo_real',
                 # Configurações do site para templates
                 'apps.admin_personalizado.views.site_config',
             ],
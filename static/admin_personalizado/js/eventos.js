@@ -296,12 +296,12 @@ const init = () => {
 
             // Busca paginada da API e agrega todos os resultados para DataTables client-side
             const eventos = [];
-            let page = 1;
-            const perPage = 100; // traz 100 por página para reduzir requisições
-            let totalPages = 1;
+            const perPage = 100; // traz 100 por página (máximo aceito pela API)
+            let cursor = null;
 
             do {
-                const url = `/meu-admin/api/eventos/?page=${page}&per_page=${perPage}`;
+                let url = `/meu-admin/api/eventos/?per_page=${perPage}`;
+                if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
                 const response = await fetch(url);
                 if (!response.ok) {
                     const errorText = await response.text();
@@ -313,9 +313,8 @@ const init = () => {
                 } else if (Array.isArray(data)) {
                     eventos.push(...data);
                 }
-                totalPages = Number(data?.num_pages) || 1;
-                page += 1;
-            } while (page <= totalPages);
+                cursor = data?.next_cursor || null;
+            } while (cursor);
 
             console.log(`Eventos agregados: ${eventos.length}`);
             
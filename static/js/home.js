@@ -466,6 +466,15 @@ document.addEventListener('DOMContentLoaded', () => {
     // Carrega as notificações ao carregar a página
     carregarNotificacoes();
 
+    // Recarrega quando o servidor avisa de uma notificação nova (SSE) e a cada
+    // reconexão do stream, cobrindo o que chegou enquanto estava desconectado
+    let streamConectado = false;
+    document.addEventListener('notificacoes:notificacao', carregarNotificacoes);
+    document.addEventListener('notificacoes:conectado', () => {
+        if (streamConectado) carregarNotificacoes();
+        streamConectado = true;
+    });
+
     // =======================================================================
     // === LÓGICA DO FOOTER (APARECE AO ROLAR) ===
     // =======================================================================
@@ -0,0 +1,36 @@
+// Conexão única (Server-Sent Events) com as notificações e validações do usuário.
+// As mensagens são repassadas como eventos do documento:
+//   'notificacoes:conectado'    - conexão (re)aberta: recarregue o estado
+//   'notificacoes:notificacao'  - nova notificação
+//   'notificacoes:validacao'    - Passe Fácil validado
+//   'notificacoes:indisponivel' - sem stream; os scripts voltam a consultar periodicamente
+(function () {
+    const emitir = (tipo, detail) => {
+        document.dispatchEvent(new CustomEvent(`notificacoes:${tipo}`, { detail }));
+    };
+
+    window.notificacoesTempoReal = { ativo: false };
+
+    if (!('EventSource' in window)) {
+        document.addEventListener('DOMContentLoaded', () => emitir('indisponivel'));
+        return;
+    }
+
+    const fonte = new EventSource('/notificacoes/stream/');
+    window.notificacoesTempoReal.ativo = true;
+
+    ['conectado', 'notificacao', 'validacao'].forEach(tipo => {
+        fonte.addEventListener(tipo, (event) => emitir(tipo, JSON.parse(event.data)));
+    });
+
+    // Erros temporários são reconectados pelo próprio EventSource; CLOSED
+    // significa que o servidor recusou o stream
+    fonte.addEventListener('error', () => {
+        if (fonte.readyState === EventSource.CLOSED) {
+            window.notificacoesTempoReal.ativo = false;
+            emitir('indisponivel');
+        }
+    });
+
+    window.addEventListener('pagehide', () => fonte.close());
+})();
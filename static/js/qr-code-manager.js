@@ -200,9 +200,30 @@ function loadQRCode(qrCodeUrl, force = false) {
         };
     }
     
-    // Adiciona um timestamp para evitar cache e carrega a imagem
-    const timestamp = Date.now();
-    qrImage.src = `${qrCodeUrl}?t=${timestamp}`;
+    // Revalida pelo ETag: enquanto o código não rotacionar o servidor
+    // responde 304 e o navegador reaproveita a imagem do próprio cache
+    fetch(qrCodeUrl, { cache: 'no-cache', credentials: 'same-origin' })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            return response.blob();
+        })
+        .then(blob => {
+            const anterior = qrImage.dataset.objectUrl;
+            const objectUrl = URL.createObjectURL(blob);
+            qrImage.dataset.objectUrl = objectUrl;
+            qrImage.src = objectUrl;
+            if (anterior) {
+                URL.revokeObjectURL(anterior);
+            }
+            lastQRUpdate = Date.now();
+        })
+        .catch(error => {
+            if (qrImage.onerror) {
+                qrImage.onerror(error);
+            }
+        });
 }
 
 // Função para mostrar o loading
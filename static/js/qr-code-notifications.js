@@ -97,8 +97,14 @@ function startValidationChecks() {
     validationCheckTimer = setInterval(() => checkForValidations(false), 30000);
 }
 
-// Verifica por validações quando a página é carregada
-document.addEventListener('DOMContentLoaded', function() {
+// As validações chegam pelo stream de notificações (notificacoes-stream.js);
+// a consulta periódica fica só para quando o stream não está disponível
+function usaStreamTempoReal() {
+    return Boolean(window.notificacoesTempoReal && window.notificacoesTempoReal.ativo);
+}
+
+// Inicia a consulta periódica (sem stream)
+function startPolling() {
     console.log('Inicializando verificação de validações...');
     
     // Marca a verificação inicial, mas não dispara notificações
@@ -116,9 +122,38 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Inicia a verificação periódica
     setTimeout(startValidationChecks, 5000);
+}
+
+// Verifica por validações quando a página é carregada
+document.addEventListener('DOMContentLoaded', function() {
+    if (!usaStreamTempoReal()) {
+        startPolling();
+    }
+    
+    // Validação recebida pelo stream
+    document.addEventListener('notificacoes:validacao', function(event) {
+        if (!document.getElementById('qrStatus')) return;
+        const validacao = event.detail;
+        document.dispatchEvent(new CustomEvent('qrCodeValidated', {
+            detail: {
+                valid: validacao.valido,
+                timestamp: validacao.data_validacao,
+                location: validacao.ip_address || 'Local desconhecido',
+                isNew: true
+            }
+        }));
+    });
+    
+    // Stream recusado pelo servidor: volta a consultar periodicamente
+    document.addEventListener('notificacoes:indisponivel', function() {
+        if (!validationCheckTimer) {
+            startPolling();
+        }
+    });
     
     // Pausa as verificações quando a aba não está visível
     document.addEventListener('visibilitychange', function() {
+        if (usaStreamTempoReal()) return;
         if (document.hidden) {
             if (validationCheckTimer) {
                 clearInterval(validationCheckTimer);